@@ -0,0 +1,36 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiling import profiler
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need X-Admin-Token to match PROFILING_TOKEN (and are off while it is unset)"""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+@router.get("/profiles")
+async def list_profiles():
+    """Recent request profiles (route, status, duration, samples, threads), newest last"""
+    profiles = profiler.list()
+    return {"profiles": profiles, "count": len(profiles)}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """
+    Folded call stacks of one profile ("thread;outer;...;inner count" per line)
+    Feed to flamegraph.pl, inferno-flamegraph or speedscope to render a flame graph
+    """
+    folded = profiler.read(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return PlainTextResponse(folded)
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from app.core.http_metrics import FastJSONResponse
 from app.services.market_service import market_service
+from app.services.quote_stream import Subscription, quote_hub
 
 router = APIRouter()
 
 @router.get("/stock/{symbol}")
 async def get_stock(symbol: str):
     """Get current price and info for a single stock"""
-    data = market_service.get_stock_price(symbol)
+    data = await market_service.get_stock_price_async(symbol)
     if not data:
         raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
     return data
@@ -16,38 +21,138 @@ async def get_stock(symbol: str):
 async def get_stocks(symbols: str = Query(..., description="Comma-separated stock symbols")):
     """Get current prices for multiple stocks"""
     symbol_list = [s.strip() for s in symbols.split(",")]
-    return market_service.get_multiple_stocks(symbol_list)
+    return await market_service.get_multiple_stocks_async(symbol_list)
 
 @router.get("/indices")
 async def get_indices():
     """Get major market indices (S&P 500, NASDAQ, DOW)"""
-    return market_service.get_market_indices()
+    return await market_service.get_market_indices_async()
 
 @router.get("/trending")
 async def get_trending(limit: int = Query(10, ge=1, le=20)):
     """Get trending stocks"""
-    return market_service.get_trending_stocks(limit)
+    return await market_service.get_trending_stocks_async(limit)
 
 @router.get("/movers")
 async def get_movers():
     """Get top gainers and losers"""
-    return market_service.get_top_gainers_losers()
+    return await market_service.get_top_gainers_losers_async()
 
 @router.get("/history/{symbol}")
 async def get_history(
     symbol: str,
-    period: str = Query("1mo", description="Period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max")
+    period: str = Query("1mo", description="Period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max"),
+    format: str = Query("rows", pattern="^(rows|columns)$",
+                        description="rows: one object per bar, columns: one array per field (dates, open, ...)"),
+    max_points: Optional[int] = Query(None, ge=3, le=100000, description="Downsample to at most this many bars"),
+    method: str = Query("lttb", pattern="^(lttb|ohlc)$",
+                        description="lttb: keep the bars that shape the close line, ohlc: merge bars into candles")
 ):
     """Get historical price data for a stock"""
-    history = market_service.get_stock_history(symbol, period)
+    history = await market_service.get_stock_history_async(symbol, period, format, max_points, method)
     if not history:
         raise HTTPException(status_code=404, detail=f"No history found for {symbol}")
-    return history
+    return FastJSONResponse(history)
 
 @router.get("/search")
-async def search_stocks(q: str = Query(..., min_length=1)):
-    """Search for stocks by symbol or name"""
-    results = market_service.search_stocks(q)
+async def search_stocks(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(15, ge=1, le=50),
+    quotes: str = Query("cache", pattern="^(cache|fetch|none)$",
+                        description="cache: cached quotes only, fetch: fetch quotes for matches, none: names only")
+):
+    """Search for stocks by symbol or name, best matches first"""
+    results = await market_service.search_stocks_async(q, limit=limit, quotes=quotes)
     if not results:
         return {"message": "No stocks found", "results": []}
     return {"results": results}
+
+@router.websocket("/stream")
+async def stream_quotes(websocket: WebSocket, symbols: Optional[str] = None):
+    """
+    Push quote updates for a set of symbols over a WebSocket
+    Subscribe with ?symbols=AAPL,MSFT or by sending
+    {"action": "subscribe" | "unsubscribe", "symbols": [...]}.
+    Each update is {"type": "quotes", "quotes": [{"symbol": ..., <changed fields>}]}.
+    """
+    await websocket.accept()
+    subscription = quote_hub.connect()
+    try:
+        if symbols:
+            await _apply_command(websocket, subscription, {"action": "subscribe", "symbols": symbols.split(",")})
+        tasks = [
+            asyncio.create_task(_send_quotes(websocket, subscription)),
+            asyncio.create_task(_receive_commands(websocket, subscription))
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await subscription.close()
+
+async def _send_quotes(websocket: WebSocket, subscription: Subscription):
+    while True:
+        await websocket.send_json({"type": "quotes", "quotes": await subscription.next()})
+
+async def _receive_commands(websocket: WebSocket, subscription: Subscription):
+    while True:
+        try:
+            message = json.loads(await websocket.receive_text())
+        except ValueError:
+            await websocket.send_json({"type": "error", "detail": "Messages must be JSON"})
+            continue
+        await _apply_command(websocket, subscription, message)
+
+async def _apply_command(websocket: WebSocket, subscription: Subscription, message: dict):
+    """Handle one subscribe/unsubscribe message and acknowledge the resulting symbol set"""
+    action = message.get("action") if isinstance(message, dict) else None
+    symbols = message.get("symbols", []) if isinstance(message, dict) else []
+    if action not in ("subscribe", "unsubscribe") or not isinstance(symbols, list):
+        await websocket.send_json({
+            "type": "error",
+            "detail": 'Expected {"action": "subscribe" | "unsubscribe", "symbols": [...]}'
+        })
+        return
+    try:
+        if action == "subscribe":
+            await subscription.subscribe(str(symbol) for symbol in symbols)
+        else:
+            await subscription.unsubscribe(str(symbol) for symbol in symbols)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        return
+    await websocket.send_json({"type": "subscribed", "symbols": sorted(subscription.symbols)})
+
+@router.get("/stream/sse")
+async def stream_quotes_sse(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated stock symbols")
+):
+    """
+    Push quote updates as Server-Sent Events
+    Each event's data is a JSON list of {"symbol": ..., <changed fields>}.
+    """
+    subscription = quote_hub.connect()
+    try:
+        await subscription.subscribe(symbols.split(","))
+    except ValueError as e:
+        await subscription.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    quotes = await asyncio.wait_for(subscription.next(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(quotes)}\n\n"
+        finally:
+            await subscription.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -1,20 +1,45 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from typing import List, Optional
-from app.ml.predictor import ml_predictor
+import json
+from app.core.config import settings
+from app.core.executors import ml_executor, prefetch_executor, run_in_executor
+from app.core.profiling import profiler
+from app.ml.backtest import METHODS, BacktestConfig, backtest_jobs
+from app.ml.batch import BatchAnalyzer
+from app.ml.jobs import JobConflict, training_jobs
+from app.ml.runtime import get_predictor
+from app.services.market_service import COMMON_STOCKS
 
 router = APIRouter()
 
+async def _predictor():
+    """The shared predictor; the first call imports the ML stack off the event loop"""
+    return await run_in_executor(ml_executor, get_predictor)
+
+def _submit_job(submit, *args, **kwargs):
+    """Queue a training job; 409 with the active job's id if the symbol already has one"""
+    try:
+        return submit(*args, **kwargs)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id,
+                                                     "status": e.job.status})
+
 @router.get("/predict/{symbol}")
 async def predict_stock(
     symbol: str,
-    days: int = Query(7, ge=1, le=30, description="Number of days to predict")
+    days: int = Query(7, ge=1, le=30, description="Number of days to predict"),
+    model: Optional[str] = Query(None, pattern="^(auto|symbol|global)$",
+                                 description="Per-symbol model, shared global model, or auto (defaults to ML_MODEL_SCOPE)")
 ):
     """
     Get ML-based price predictions for a stock
     Uses LSTM neural network trained on historical data
     """
     try:
-        result = ml_predictor.predict_next_days(symbol.upper(), days)
+        ml_predictor = await _predictor()
+        result = await run_in_executor(ml_executor, ml_predictor.predict_next_days, symbol.upper(), days, model)
         if not result:
             raise HTTPException(status_code=404, detail=f"Unable to generate predictions for {symbol}")
         return result
@@ -28,58 +53,239 @@ async def analyze_stock_ml(symbol: str):
     Includes 7-day price prediction, trend analysis, and action recommendation
     """
     try:
-        result = ml_predictor.analyze_stock_ml(symbol.upper())
+        ml_predictor = await _predictor()
+        result = await run_in_executor(ml_executor, ml_predictor.analyze_stock_ml, symbol.upper())
         if not result:
             raise HTTPException(status_code=404, detail=f"Unable to analyze {symbol}")
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/train/{symbol}")
+@router.post("/train/{symbol}", status_code=202)
 async def train_model(
     symbol: str,
     epochs: int = Query(50, ge=10, le=200, description="Number of training epochs")
 ):
     """
-    Train the LSTM model for a specific stock
-    This endpoint allows custom training for better predictions
+    Queue LSTM training for a specific stock
+    Training runs in a background process; poll /ml/jobs/{job_id} for progress
     """
-    try:
-        success = ml_predictor.train_model(symbol.upper(), epochs=epochs)
-        if not success:
-            raise HTTPException(status_code=500, detail=f"Failed to train model for {symbol}")
-        return {
-            "message": f"Model successfully trained for {symbol}",
-            "symbol": symbol,
-            "epochs": epochs
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = _submit_job(training_jobs.submit, symbol, epochs=epochs)
+    return {
+        "message": f"Training queued for {symbol.upper()}",
+        "job_id": job.id,
+        "symbol": job.symbol,
+        "epochs": epochs,
+        "status": job.status
+    }
+
+@router.post("/train-global", status_code=202)
+async def train_global_model(
+    symbols: Optional[str] = Query(None, description="Comma-separated training universe (defaults to the common stocks)"),
+    epochs: int = Query(30, ge=1, le=200, description="Number of training epochs"),
+    embedding_dim: Optional[int] = Query(None, ge=0, le=64,
+                                         description="Symbol embedding size, 0 for none (defaults to ML_GLOBAL_EMBEDDING_DIM)")
+):
+    """
+    Queue training of one shared LSTM over many symbols
+    Serves every symbol without its own model (or all symbols with model=global)
+    """
+    if symbols:
+        symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    else:
+        symbol_list = list(COMMON_STOCKS)
+    if len(symbol_list) > settings.ML_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ML_BATCH_MAX_SYMBOLS} symbols can be trained together"
+        )
+    
+    job = _submit_job(training_jobs.submit_global, symbol_list, epochs=epochs, embedding_dim=embedding_dim)
+    return {
+        "message": f"Shared model training queued for {len(symbol_list)} symbols",
+        "job_id": job.id,
+        "symbols": symbol_list,
+        "epochs": epochs,
+        "status": job.status
+    }
+
+@router.post("/update/{symbol}", status_code=202)
+async def update_model(
+    symbol: str,
+    epochs: int = Query(None, ge=1, le=50, description="Fine-tuning epochs (defaults to ML_UPDATE_EPOCHS)")
+):
+    """
+    Queue a warm-start update of a trained model with the daily bars added since it was trained
+    Falls back to a full retrain when the model is missing or drift is detected;
+    the finished job's detail says which happened
+    """
+    job = _submit_job(training_jobs.submit_update, symbol, epochs=epochs)
+    return {
+        "message": f"Update queued for {symbol.upper()}",
+        "job_id": job.id,
+        "symbol": job.symbol,
+        "epochs": job.epochs,
+        "status": job.status
+    }
+
+@router.post("/update", status_code=202)
+async def update_models(
+    symbols: Optional[str] = Query(None, description="Comma-separated stock symbols (defaults to every trained model)")
+):
+    """
+    Queue warm-start updates for a watchlist, one job per symbol
+    Symbols that already have a queued or running job are reported with that job instead
+    """
+    if symbols:
+        symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    else:
+        ml_predictor = await _predictor()
+        symbol_list = ml_predictor.registry.list_symbols()
+    if len(symbol_list) > settings.ML_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ML_BATCH_MAX_SYMBOLS} symbols can be updated per request"
+        )
+    
+    jobs, busy = [], []
+    for symbol in symbol_list:
+        try:
+            jobs.append(training_jobs.submit_update(symbol))
+        except JobConflict as e:
+            busy.append(e.job)
+    return {
+        "message": f"Update queued for {len(jobs)} symbols",
+        "jobs": [{"job_id": job.id, "symbol": job.symbol, "status": job.status} for job in jobs],
+        "count": len(jobs),
+        "already_active": [{"job_id": job.id, "symbol": job.symbol, "kind": job.kind, "status": job.status}
+                           for job in busy]
+    }
+
+@router.get("/jobs")
+async def list_jobs():
+    """List recent training and update jobs, newest last"""
+    return {"jobs": [job.to_dict() for job in training_jobs.list()]}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status and progress (epoch, loss, val_loss) of a training job"""
+    job = training_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running training job"""
+    job = training_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@router.post("/backtest", status_code=202)
+async def run_backtest(
+    symbols: str = Query(..., description="Comma-separated stock symbols"),
+    methods: str = Query(",".join(METHODS), description="Comma-separated: lstm, trend (the fallback method)"),
+    train_days: int = Query(504, ge=120, le=5000, description="Bars in each training window"),
+    test_days: int = Query(63, ge=5, le=504, description="Bars traded per fold"),
+    expanding: bool = Query(False, description="Train on all earlier bars instead of a rolling window"),
+    max_folds: int = Query(8, ge=0, le=200, description="Most recent folds to run, 0 for the whole history"),
+    epochs: int = Query(10, ge=1, le=100, description="LSTM epochs per fold"),
+    cost_bps: float = Query(5.0, ge=0, le=100, description="Transaction cost per position change, in basis points"),
+    long_only: bool = Query(False, description="Treat Sell signals as flat instead of short")
+):
+    """
+    Queue a walk-forward backtest of the analyze Buy/Sell signals
+    Poll /ml/backtest/{job_id} for progress and the report
+    """
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    method_list = list(dict.fromkeys(m.strip().lower() for m in methods.split(",") if m.strip()))
+    if not symbol_list or len(symbol_list) > settings.ML_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Between 1 and {settings.ML_BATCH_MAX_SYMBOLS} symbols can be backtested together"
+        )
+    if not method_list or set(method_list) - set(METHODS):
+        raise HTTPException(status_code=400, detail=f"methods must be a subset of {', '.join(METHODS)}")
+    
+    job = backtest_jobs.submit(BacktestConfig(
+        symbols=symbol_list,
+        methods=method_list,
+        train_days=train_days,
+        test_days=test_days,
+        expanding=expanding,
+        max_folds=max_folds or None,
+        epochs=epochs,
+        cost_bps=cost_bps,
+        long_only=long_only
+    ))
+    return {
+        "message": f"Backtest queued for {len(symbol_list)} symbols",
+        "job_id": job.id,
+        "symbols": symbol_list,
+        "methods": method_list,
+        "status": job.status
+    }
+
+@router.get("/backtest")
+async def list_backtests():
+    """List recent backtest jobs without their reports, newest last"""
+    return {"jobs": [job.to_dict(include_result=False) for job in backtest_jobs.list()]}
+
+@router.get("/backtest/{job_id}")
+async def get_backtest(job_id: str):
+    """Get progress of a backtest job and, once completed, its report"""
+    job = backtest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Backtest {job_id} not found")
+    return job.to_dict()
+
+@router.get("/models")
+async def list_models():
+    """List symbols with a trained model on disk, plus the shared model if there is one"""
+    ml_predictor = await _predictor()
+    models = ml_predictor.registry.describe()
+    return {"models": models, "count": len(models), "global": ml_predictor.registry.describe_global()}
 
 @router.get("/batch-analyze")
-async def batch_analyze(symbols: str = Query(..., description="Comma-separated stock symbols")):
+async def batch_analyze(
+    symbols: str = Query(..., description="Comma-separated stock symbols"),
+    stream: bool = Query(False, description="Stream results as NDJSON lines as they complete")
+):
     """
     Analyze multiple stocks at once
     Returns ML predictions and recommendations for each
     """
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if len(symbol_list) > settings.ML_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ML_BATCH_MAX_SYMBOLS} symbols can be analyzed per request"
+        )
+    
+    analyzer = BatchAnalyzer(await _predictor(), prefetch_executor, ml_executor,
+                             prefetch_timeout=settings.ML_BATCH_PREFETCH_TIMEOUT)
+    
+    if stream:
+        def ndjson_lines():
+            for analysis in analyzer.run(symbol_list):
+                yield json.dumps(analysis) + "\n"
+        return StreamingResponse(iterate_in_threadpool(profiler.bind_iter(ndjson_lines())),
+                                 media_type="application/x-ndjson")
+    
     try:
-        symbol_list = [s.strip().upper() for s in symbols.split(",")]
-        results = []
-        
-        for symbol in symbol_list[:10]:  # Limit to 10 stocks
-            analysis = ml_predictor.analyze_stock_ml(symbol)
-            if analysis:
-                results.append(analysis)
-        
-        if not results:
-            raise HTTPException(status_code=404, detail="Unable to analyze any of the provided symbols")
-        
-        # Sort by confidence score
-        results.sort(key=lambda x: x['confidence'], reverse=True)
-        
-        return {
-            "results": results,
-            "count": len(results)
-        }
+        # The pipeline waits on the bounded pools, so it runs on the generic threadpool
+        results = await run_in_threadpool(profiler.bind(lambda: list(analyzer.run(symbol_list))))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not results:
+        raise HTTPException(status_code=404, detail="Unable to analyze any of the provided symbols")
+    
+    # Sort by confidence score
+    results.sort(key=lambda x: x['confidence'], reverse=True)
+    
+    return {
+        "results": results,
+        "count": len(results)
+    }
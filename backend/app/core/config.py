@@ -1,12 +1,59 @@
 from pydantic_settings import BaseSettings
 from typing import List
 import json
+import logging
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = "a_very_secret_key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DATABASE_URL: str = "sqlite:///./test.db"
+    LOG_LEVEL: str = "INFO"  # Level of the app.* loggers (DEBUG also logs every fetched quote)
+    ML_MODEL_DIR: str = "./ml_models"  # Per-symbol trained LSTM models
+    HISTORY_DIR: str = "./market_data"  # Local columnar daily OHLCV store
+    HISTORY_SYNC_INTERVAL: float = 900  # Seconds between upstream checks for a symbol still missing the last session's bar
+    MARKET_DATA_PROVIDER: str = "alphavantage"  # "alphavantage" (live) or "replay" (local files)
+    MARKET_DATA_REPLAY_DIR: str = "./market_replay"  # Recorded responses for the replay provider
+    MARKET_DATA_REPLAY_LATENCY: float = 0.0  # Seconds added to every replayed call
+    MARKET_DATA_REPLAY_ERROR_RATE: float = 0.0  # Fraction of replayed calls that fail
+    MARKET_DATA_REPLAY_SYNTHETIC: bool = True  # Generate bars for symbols with no recording
+    MARKET_DATA_RECORD: bool = False  # Save live responses to MARKET_DATA_REPLAY_DIR
+    ALPHA_VANTAGE_CALLS_PER_MINUTE: int = 5  # Per-process quota for all upstream calls; free tier, raise to the plan's limit for premium keys
+    ALPHA_VANTAGE_BURST: int = 5  # Calls allowed back to back before the per-minute pacing applies
+    QUOTE_RATE_LIMIT_WAIT: float = 3.0  # Longest a quote waits for a rate-limit token; quotes not fetched in time are left out
+    QUOTE_FETCH_WORKERS: int = 8
+    QUOTE_CACHE_SIZE: int = 2048
+    SYMBOL_LISTING_FILE: str = ""  # Optional CSV or pipe-delimited symbol/name listing for search
+    QUOTE_STREAM_INTERVAL: float = 15.0  # Seconds between polls of each streamed symbol
+    QUOTE_STREAM_MAX_SYMBOLS: int = 50  # Symbols one streaming client may subscribe to
+    IO_WORKERS: int = 8  # Blocking upstream calls made on behalf of async endpoints
+    ML_INFERENCE_WORKERS: int = 4
+    ML_TRAINING_WORKERS: int = 1  # Concurrent training processes
+    ML_TRAINING_THREADS: int = 2  # TensorFlow threads per training process
+    ML_BATCH_MAX_SYMBOLS: int = 500
+    ML_BATCH_PREFETCH_WORKERS: int = 4  # History downloads in flight for batch analysis (own pool, not IO_WORKERS)
+    ML_BATCH_PREFETCH_TIMEOUT: float = 60.0  # Seconds a batch waits for histories; symbols not fetched by then are skipped
+    ML_BACKTEST_WORKERS: int = 2  # Processes training walk-forward backtest folds in parallel
+    ML_UPDATE_EPOCHS: int = 5  # Fine-tuning epochs when a model is updated with new bars
+    ML_UPDATE_WINDOWS: int = 64  # Most recent training windows used for fine-tuning
+    ML_UPDATE_LEARNING_RATE: float = 1e-4
+    ML_UPDATE_MAX_NEW_BARS: int = 30  # More new bars than this triggers a full retrain
+    ML_DRIFT_LOSS_RATIO: float = 3.0  # Recent loss above this multiple of val_loss triggers a full retrain
+    ML_DRIFT_PRICE_MARGIN: float = 0.1  # Scaled Close this far outside [0, 1] triggers a full retrain
+    ML_INFERENCE_BACKEND: str = "numpy"  # "numpy" serves exported weights without TensorFlow; "keras" loads Keras models
+    ML_WEIGHT_PRECISION: str = "float32"  # Exported weights: "float32", "float16" or "int8" (per-tensor scale)
+    ML_PRECISION_MAX_MSE_INCREASE: float = 0.05  # Held-out MSE increase allowed before keeping float32
+    ML_AUTO_TRAIN: bool = True  # Queue a training job for a symbol predicted without a model
+    ML_MODEL_SCOPE: str = "auto"  # "symbol" models, the shared "global" model, or "auto" (symbol model, else global)
+    ML_GLOBAL_EMBEDDING_DIM: int = 8  # Symbol embedding size of the shared model (0 trains it without one)
+    ML_GLOBAL_BATCH_SIZE: int = 256
+    ML_PREDICTION_CACHE_SIZE: int = 2048  # Memoized forecasts (per symbol, last bar and model version); 0 disables
+    ML_WARMUP_ON_STARTUP: bool = True  # Load TensorFlow and the predictor in the background at startup
+    PROFILING_TOKEN: str = ""  # Enables the X-Profile header / ?profile= flag and /admin endpoints when set
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of all requests profiled without being asked
+    PROFILING_INTERVAL_MS: float = 5.0  # Stack sampling interval while a request is profiled
+    PROFILING_DIR: str = "./profiles"  # Folded-stack output of recent profiles
+    PROFILING_MAX_PROFILES: int = 50  # Profiles kept on disk
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000", 
         "http://127.0.0.1:3000",
@@ -26,3 +73,13 @@ class Settings(BaseSettings):
                 self.BACKEND_CORS_ORIGINS = [self.BACKEND_CORS_ORIGINS]
 
 settings = Settings()
+
+
+def configure_logging():
+    """Send app.* log records to stderr at LOG_LEVEL (the API process and training workers)"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("app")
+    if not logger.handlers:
+        logger.addHandler(handler)
+    logger.setLevel(settings.LOG_LEVEL.upper())
@@ -0,0 +1,27 @@
+"""
+Bounded executors for blocking work called from async endpoints
+Work submitted while handling a profiled request is sampled into its profile.
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor
+
+from app.core.config import settings
+from app.core.profiling import ProfiledThreadPoolExecutor
+
+# Blocking upstream I/O (market data provider calls, history store syncs)
+io_executor = ProfiledThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="io")
+
+# History downloads for batch analysis, kept apart so a large watchlist
+# waiting on the rate limiter cannot occupy every I/O worker
+prefetch_executor = ProfiledThreadPoolExecutor(max_workers=settings.ML_BATCH_PREFETCH_WORKERS,
+                                               thread_name_prefix="prefetch")
+
+# ML inference: predictions and analysis
+ml_executor = ProfiledThreadPoolExecutor(max_workers=settings.ML_INFERENCE_WORKERS, thread_name_prefix="ml-infer")
+
+
+async def run_in_executor(executor: Executor, fn, *args, **kwargs):
+    """Run a blocking callable on an executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
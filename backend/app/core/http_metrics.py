@@ -0,0 +1,76 @@
+"""
+HTTP-side instrumentation: request latency per route and response encoding time
+"""
+import json
+import time
+
+from fastapi.responses import JSONResponse
+
+from app.core.metrics import HTTP_REQUEST_SECONDS, STAGE_SECONDS
+
+try:
+    import orjson
+except ImportError:  # Optional; FastJSONResponse falls back to the json module
+    orjson = None
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records how long encoding the body took (stage "serialize")"""
+
+    def render(self, content) -> bytes:
+        with STAGE_SECONDS.time(stage="serialize"):
+            return super().render(content)
+
+
+def _array_to_list(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(TimedJSONResponse):
+    """
+    JSON response for large array payloads, encoded with orjson
+    NumPy arrays are written natively, without a per-element Python list.
+    Return it from the endpoint (not as response_class) so FastAPI skips
+    jsonable_encoder. Without orjson the json module encodes arrays via tolist().
+    """
+
+    def render(self, content) -> bytes:
+        with STAGE_SECONDS.time(stage="serialize"):
+            if orjson is not None:
+                return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+            return json.dumps(content, ensure_ascii=False, separators=(",", ":"),
+                              default=_array_to_list).encode("utf-8")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Templates like /api/v1/ml/analyze/{symbol} keep the label set bounded
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status[0])
+            )
@@ -0,0 +1,382 @@
+"""
+On-demand sampling profiler for individual requests
+
+A request is profiled when it carries the admin header
+(X-Profile: <PROFILING_TOKEN>) or query flag (?profile=<PROFILING_TOKEN>),
+or is picked at PROFILING_SAMPLE_RATE. While at least one profile is
+active a background thread samples the call stacks of the threads
+working for it every PROFILING_INTERVAL_MS:
+
+- the event loop thread, only while the request's task (or a task it
+  created, e.g. through asyncio.gather) is running on it
+- executor threads running work submitted on the request's behalf
+  (ProfiledThreadPoolExecutor, or callables wrapped with bind)
+
+Ticks where none of them is running are counted as "(waiting)", so sample
+counts add up to wall time. Profiles are written to PROFILING_DIR as
+folded stacks ("thread;outer;...;inner count" lines), the input format of
+flamegraph.pl, inferno and speedscope, and listed by /admin/profiles.
+Nothing runs while no request is being profiled.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+EVENT_LOOP_THREAD = "event-loop"
+WAITING = "(waiting)"
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled in this context, if it is profiled
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """Stack samples of one request, by collapsed stack"""
+
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.trigger = trigger  # header, query or sample
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = datetime.now().isoformat()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.samples: Counter = Counter()
+        self.thread_names = set()
+        # Event loop and tasks serving the request (the loop is sampled only while one of them runs)
+        self.loop = None
+        self.tasks = set()
+        self.loop_thread: Optional[int] = None
+        # Worker thread id -> [thread name, nesting depth]
+        self._threads: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def attach_thread(self):
+        tid = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(tid)
+            if entry is None:
+                self._threads[tid] = [threading.current_thread().name, 1]
+            else:
+                entry[1] += 1
+
+    def detach_thread(self):
+        tid = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(tid)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._threads[tid]
+
+    def threads(self) -> List[tuple]:
+        """(thread id, name) of every thread currently working for the request"""
+        with self._lock:
+            threads = [(tid, entry[0]) for tid, entry in self._threads.items()]
+        if self.loop is not None and asyncio.current_task(self.loop) in self.tasks:
+            threads.append((self.loop_thread, EVENT_LOOP_THREAD))
+        return threads
+
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1e3, 2) if self.duration is not None else None,
+            "samples": sum(self.samples.values()),
+            "threads": sorted(self.thread_names),
+        }
+
+
+class Profiler:
+    """Samples active request profiles from one background thread and keeps the recent ones on disk"""
+
+    def __init__(self, directory: str = None, interval: float = None, max_profiles: int = None):
+        self.directory = directory or settings.PROFILING_DIR
+        self.interval = interval if interval is not None else settings.PROFILING_INTERVAL_MS / 1000
+        self.max_profiles = max_profiles or settings.PROFILING_MAX_PROFILES
+        self._active: Dict[str, RequestProfile] = {}
+        self._finished: List[RequestProfile] = []
+        self._recent: Optional["OrderedDict[str, Dict]"] = None  # Loaded from disk on first use
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def select(self, scope) -> Optional[str]:
+        """How a request asks to be profiled (header, query or sample), or None"""
+        token = settings.PROFILING_TOKEN
+        if token:
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER:
+                    if secrets.compare_digest(value.decode("latin-1"), token):
+                        return "header"
+                    break
+            for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+                name, _, value = pair.partition("=")
+                if name == PROFILE_QUERY and secrets.compare_digest(value, token):
+                    return "query"
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    def start(self, method: str, path: str, trigger: str) -> RequestProfile:
+        """Start profiling the request running in the current task"""
+        profile = RequestProfile(method, path, trigger)
+        profile.loop = asyncio.get_running_loop()
+        profile.tasks.add(asyncio.current_task())
+        profile.loop_thread = threading.get_ident()
+        _install_task_factory(profile.loop)
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+        return profile
+
+    def stop(self, profile: RequestProfile):
+        """Stop sampling a profile; it is written to disk by the sampler thread"""
+        profile.duration = time.perf_counter() - profile.started
+        with self._lock:
+            self._active.pop(profile.id, None)
+            self._finished.append(profile)
+
+    def list(self) -> List[Dict]:
+        """Metadata of the recent profiles, newest last"""
+        with self._lock:
+            return list(self._index().values())
+
+    def read(self, profile_id: str) -> Optional[str]:
+        """Folded stacks of a recent profile, or None if unknown"""
+        with self._lock:
+            if profile_id not in self._index():
+                return None
+        try:
+            with open(self._path(profile_id)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def bind(self, fn):
+        """Wrap fn so that, run on any thread, it is sampled as part of the current request's profile"""
+        profile = current_profile.get()
+        if profile is None:
+            return fn
+        return functools.partial(_run_attached, profile, fn)
+
+    def bind_iter(self, iterator: Iterator) -> Iterator:
+        """Iterator whose items are produced as part of the current request's profile, on whichever thread"""
+        profile = current_profile.get()
+        if profile is None:
+            return iterator
+        return _AttachedIterator(profile, iterator)
+
+    def _path(self, profile_id: str, extension: str = "folded") -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def _index(self) -> "OrderedDict[str, Dict]":
+        """Recent profile metadata, read from the profile directory the first time (lock held)"""
+        if self._recent is None:
+            saved = []
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith(".json"):
+                        try:
+                            with open(os.path.join(self.directory, name)) as f:
+                                saved.append(json.load(f))
+                        except (OSError, ValueError):
+                            pass
+            saved.sort(key=lambda meta: meta.get("started_at", ""))
+            self._recent = OrderedDict((meta["id"], meta) for meta in saved if "id" in meta)
+        return self._recent
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.values())
+                finished, self._finished = self._finished, []
+            if active:
+                frames = sys._current_frames()
+                for profile in active:
+                    self._sample(profile, frames)
+            for profile in finished:
+                self._save(profile)
+            with self._lock:
+                if not self._active and not self._finished:
+                    self._sampler = None
+                    return
+
+    def _sample(self, profile: RequestProfile, frames: Dict):
+        sampled = False
+        for tid, name in profile.threads():
+            frame = frames.get(tid)
+            if frame is None:
+                continue
+            profile.samples[name + ";" + self._collapse(frame)] += 1
+            profile.thread_names.add(name)
+            sampled = True
+        if not sampled:
+            profile.samples[WAITING] += 1
+
+    def _collapse(self, frame) -> str:
+        """Stack as 'outermost;...;innermost' function labels"""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _save(self, profile: RequestProfile):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile.id), "w") as f:
+                for stack, count in profile.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(self._path(profile.id, "json"), "w") as f:
+                json.dump(profile.describe(), f)
+        except OSError as e:
+            logger.error("Error saving profile %s: %s", profile.id, e)
+            return
+
+        with self._lock:
+            recent = self._index()
+            recent[profile.id] = profile.describe()
+            expired = []
+            while len(recent) > self.max_profiles:
+                expired.append(recent.popitem(last=False)[0])
+        for profile_id in expired:
+            for path in (self._path(profile_id), self._path(profile_id, "json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker >= 0:
+        filename = filename[marker + len("site-packages") + 1:]
+    elif filename.startswith(os.getcwd()):
+        filename = os.path.relpath(filename)
+    # Folded stacks are split on ";" and on the last space of each line
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _install_task_factory(loop):
+    """Make tasks created while handling a profiled request count as part of it (once per loop)"""
+    previous = loop.get_task_factory()
+    if getattr(previous, "tracks_profiles", False):
+        return
+
+    def task_factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        profile = context.get(current_profile) if context is not None else current_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+            task.add_done_callback(profile.tasks.discard)
+        return task
+
+    task_factory.tracks_profiles = True
+    loop.set_task_factory(task_factory)
+
+
+def _run_attached(profile: RequestProfile, fn, *args, **kwargs):
+    profile.attach_thread()
+    token = current_profile.set(profile)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        current_profile.reset(token)
+        profile.detach_thread()
+
+
+class _AttachedIterator:
+    def __init__(self, profile: RequestProfile, iterator: Iterator):
+        self.profile = profile
+        self.iterator = iter(iterator)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _run_attached(self.profile, next, self.iterator)
+
+
+class ProfiledThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks are sampled as part of the profile of the request that submitted them"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is not None:
+            return super().submit(_run_attached, profile, fn, *args, **kwargs)
+        return super().submit(fn, *args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware starting and stopping request profiles; adds X-Profile-Id to profiled responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        trigger = profiler.select(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.start(scope["method"], scope["path"], trigger)
+        token = current_profile.set(profile)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", None)
+            profiler.stop(profile)
+
+
+# Shared profiler used by the middleware, executors and admin endpoints
+profiler = Profiler()
@@ -1,14 +1,30 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
-from app.core.config import settings
+from app.core.config import configure_logging, settings
+from app.core.executors import io_executor
+from app.core.http_metrics import MetricsMiddleware, TimedJSONResponse
+from app.core.metrics import CONTENT_TYPE, metrics
+from app.core.profiling import ProfilingMiddleware
+from app.ml.backtest import backtest_jobs
+from app.ml.jobs import training_jobs
+from app.ml.runtime import readiness, start_warm_up
+from app.services.market_service import market_service
+from app.services.quote_stream import quote_hub
+
+configure_logging()
 
 app = FastAPI(
     title="AI Financial Tracker",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=TimedJSONResponse
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -21,8 +37,37 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def warm_up_ml():
+    """Load the ML stack in the background; /health answers meanwhile"""
+    if settings.ML_WARMUP_ON_STARTUP:
+        start_warm_up()
+
+@app.on_event("startup")
+async def build_search_index():
+    """Build the symbol search index off the event loop so the first search does not wait for it"""
+    io_executor.submit(market_service.symbol_index)
+
+@app.on_event("shutdown")
+async def close_clients():
+    """Stop quote pollers, release pooled upstream connections and stop training and backtest workers"""
+    await quote_hub.close()
+    await market_service.aclose()
+    training_jobs.shutdown()
+    backtest_jobs.shutdown()
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint that doesn't call external APIs"""
     return {"status": "healthy", "service": "AI Financial Tracker"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage timings, upstream/fallback counters and cache hit ratios"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness of the ML stack: 503 until the predictor and TensorFlow have loaded"""
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
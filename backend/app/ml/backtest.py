@@ -0,0 +1,508 @@
+"""
+Walk-forward backtesting of the predictor's trading signals
+
+History is split into consecutive test blocks, each preceded by a
+training window that ends where the block starts, so every signal comes
+from a model that has only seen earlier bars. Each test day's forecast
+is turned into the action analyze_stock_ml would give (ACTION_THRESHOLDS)
+and the action into a position held over the next day. Two methods are
+scored on the same folds:
+
+- "lstm": a fresh build_lstm_model network per fold, with a scaler fitted
+  on the fold's training window only. Folds of every symbol train in
+  parallel in a spawn process pool; each fold then forecasts all of its
+  test days in one batched autoregressive call.
+- "trend": the _fallback_prediction linear trend over the previous 30
+  closes, computed for every test day at once.
+
+PnL (net of transaction costs), hit rate, drawdown and the buy-and-hold
+baseline are computed vectorized over the whole test series.
+
+Run from the backend directory:
+    MARKET_DATA_PROVIDER=replay python -m app.ml.backtest --symbols AAPL,MSFT --methods trend
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.preprocessing import MinMaxScaler
+
+from app.core.config import settings
+from app.ml.jobs import COMPLETED, FAILED, MAX_FINISHED_JOBS, QUEUED, RUNNING, _init_worker
+from app.ml.sequences import make_sequences
+
+METHODS = ("lstm", "trend")
+TREND_WINDOW = 30  # Closes in the _trend_prediction regression
+TRADING_DAYS = 252
+
+# Position taken on each action; long-only runs drop the shorts
+ACTION_POSITIONS = {'Strong Buy': 1.0, 'Buy': 1.0, 'Hold': 0.0, 'Sell': -1.0, 'Strong Sell': -1.0}
+
+
+@dataclass
+class Fold:
+    """One walk-forward split: train on rows [train_start, train_end), trade rows [test_start, test_end)"""
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+@dataclass
+class BacktestConfig:
+    """What to backtest and how the history is split and traded"""
+    symbols: List[str]
+    methods: List[str] = field(default_factory=lambda: list(METHODS))
+    train_days: int = 504  # Bars in each training window
+    test_days: int = 63  # Bars traded per fold
+    expanding: bool = False  # Train on all earlier bars instead of a rolling window
+    max_folds: Optional[int] = 8  # Most recent folds kept (None for the whole history)
+    horizon: int = 7  # Forecast day the action is based on (the thresholds assume 7)
+    epochs: int = 10  # LSTM epochs per fold, with early stopping
+    cost_bps: float = 5.0  # Transaction cost per unit of position change, in basis points
+    long_only: bool = False
+    seed: int = 0
+
+
+def walk_forward_folds(n_rows: int, train_days: int, test_days: int, expanding: bool = False,
+                       max_folds: Optional[int] = None) -> List[Fold]:
+    """
+    Consecutive, non-overlapping test blocks after the first train_days rows
+    max_folds keeps only the most recent blocks.
+    """
+    folds = [
+        Fold(0 if expanding else test_start - train_days, test_start, test_start, min(test_start + test_days, n_rows))
+        for test_start in range(train_days, n_rows, test_days)
+    ]
+    if max_folds:
+        folds = folds[-max_folds:]
+    return folds
+
+
+def trend_forecasts(close: np.ndarray, rows: np.ndarray, horizon: int) -> np.ndarray:
+    """_trend_prediction's day-`horizon` price from the TREND_WINDOW closes ending at each of rows"""
+    windows = sliding_window_view(close, TREND_WINDOW)[rows - TREND_WINDOW + 1]
+    x = np.arange(TREND_WINDOW, dtype=np.float64)
+    x_centered = x - x.mean()
+    slope = (windows - windows.mean(axis=1, keepdims=True)) @ x_centered / (x_centered ** 2).sum()
+    intercept = windows.mean(axis=1) - slope * x.mean()
+    # Same offset as _trend_prediction: day i ahead sits at x = len(window) + i
+    return intercept + slope * (TREND_WINDOW + horizon)
+
+
+def _lstm_fold(features: np.ndarray, fold: Fold, sequence_length: int, horizon: int, epochs: int,
+               seed: int) -> np.ndarray:
+    """Worker entry point: train a fresh LSTM on the fold's window and forecast each test day"""
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    from app.ml.inference import AutoregressiveForecaster
+    from app.ml.predictor import ml_predictor
+
+    tf.keras.utils.set_random_seed(seed)
+    train = features[fold.train_start:fold.train_end]
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(train)
+    X, y = make_sequences(scaler.transform(train), sequence_length)
+    model = ml_predictor.build_lstm_model((sequence_length, features.shape[1]))
+    model.fit(X, y, epochs=epochs, batch_size=32, validation_split=0.1, verbose=0,
+              callbacks=[EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)])
+
+    # One window ending at (and including) each test day, scaled with the training scaler
+    scaled = scaler.transform(features[fold.test_start - sequence_length + 1:fold.test_end])
+    windows = np.ascontiguousarray(sliding_window_view(scaled, sequence_length, axis=0).transpose(0, 2, 1))
+    scaled_close = AutoregressiveForecaster(model).forecast(windows, horizon)[:, -1]
+    # Close is feature 0
+    return (scaled_close - scaler.min_[0]) / scaler.scale_[0]
+
+
+def signal_actions(change_pct: np.ndarray) -> np.ndarray:
+    """Index into ACTION_THRESHOLDS of the action _score_analysis gives each predicted change"""
+    from app.ml.predictor import ACTION_THRESHOLDS
+
+    conditions = [change_pct > threshold for threshold, _, _ in ACTION_THRESHOLDS]
+    return np.select(conditions, np.arange(len(ACTION_THRESHOLDS)), default=len(ACTION_THRESHOLDS) - 1)
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    """Largest peak-to-trough loss of the compounded returns (0 to -1)"""
+    if not len(returns):
+        return 0.0
+    equity = np.cumprod(1 + returns)
+    peaks = np.maximum.accumulate(np.maximum(equity, 1.0))
+    return float((equity / peaks - 1).min())
+
+
+def score_signals(close: np.ndarray, rows: np.ndarray, predicted: np.ndarray, horizon: int,
+                  cost_bps: float = 0.0, long_only: bool = False) -> Dict:
+    """
+    Trade the action signals of forecasts made at the close of each of rows
+
+    A position is taken at the close of its day and held to the next close;
+    changing position costs cost_bps per unit. The hit rate is the share of
+    non-Hold signals whose direction matched the move over the horizon.
+    """
+    from app.ml.predictor import ACTION_THRESHOLDS
+
+    names = [action for _, action, _ in ACTION_THRESHOLDS]
+    change_pct = (predicted - close[rows]) / close[rows] * 100
+    actions = signal_actions(change_pct)
+    positions = np.array([ACTION_POSITIONS[name] for name in names])[actions]
+    if long_only:
+        positions = np.maximum(positions, 0.0)
+
+    # The newest bar has no next close to trade into
+    tradable = rows + 1 < len(close)
+    rows, positions, actions, change_pct, predicted = (
+        a[tradable] for a in (rows, positions, actions, change_pct, predicted))
+    next_returns = close[rows + 1] / close[rows] - 1
+    turnover = np.abs(np.diff(positions, prepend=0.0))
+    returns = positions * next_returns - turnover * cost_bps / 1e4
+
+    days = len(returns)
+    total = float(np.prod(1 + returns) - 1) if days else 0.0
+    volatility = returns.std() if days > 1 else 0.0
+
+    ahead = rows + horizon < len(close)
+    realized = close[rows[ahead] + horizon] / close[rows[ahead]] - 1
+    traded = positions[ahead] != 0
+    hits = np.sign(positions[ahead][traded]) == np.sign(realized[traded])
+
+    return {
+        "days": days,
+        "total_return": total,
+        "annualized_return": float((1 + total) ** (TRADING_DAYS / days) - 1) if days else None,
+        "sharpe": float(returns.mean() / volatility * np.sqrt(TRADING_DAYS)) if volatility > 0 else None,
+        "max_drawdown": max_drawdown(returns),
+        "hit_rate": float(hits.mean()) if len(hits) else None,
+        "direction_accuracy": float(np.mean(np.sign(change_pct[ahead]) == np.sign(realized)))
+        if ahead.any() else None,
+        "forecast_mape": float(np.mean(np.abs(predicted[ahead] / close[rows[ahead] + horizon] - 1)) * 100)
+        if ahead.any() else None,
+        "trades": int(np.count_nonzero(turnover)),
+        "exposure": float(np.abs(positions).mean()) if days else 0.0,
+        "signals": {name: int(count) for name, count in zip(names, np.bincount(actions, minlength=len(names)))},
+        "buy_and_hold_return": float(np.prod(1 + next_returns) - 1) if days else 0.0,
+        "buy_and_hold_max_drawdown": max_drawdown(next_returns),
+        "_returns": returns,
+        "_rows": rows,
+    }
+
+
+def _fold_returns(df, folds: List[Fold], close: np.ndarray, scored: Dict) -> List[Dict]:
+    """Compounded strategy and buy-and-hold return of each fold's test block"""
+    rows, returns = scored.pop("_rows"), scored.pop("_returns")
+    starts = np.array([fold.test_start for fold in folds])
+    fold_index = np.searchsorted(starts, rows, side="right") - 1
+    strategy = np.expm1(np.bincount(fold_index, weights=np.log1p(returns), minlength=len(folds)))
+    market = np.expm1(np.bincount(fold_index, weights=np.log(close[rows + 1] / close[rows]), minlength=len(folds)))
+    return [
+        {
+            "train_start": df.index[fold.train_start].date().isoformat(),
+            "test_start": df.index[fold.test_start].date().isoformat(),
+            "test_end": df.index[fold.test_end - 1].date().isoformat(),
+            "return": float(strategy[i]),
+            "buy_and_hold_return": float(market[i]),
+        }
+        for i, fold in enumerate(folds)
+    ]
+
+
+def _summarize(results: List[Dict]) -> Dict:
+    """Mean of each metric per method over the symbols that produced results"""
+    keys = ("total_return", "annualized_return", "sharpe", "max_drawdown", "hit_rate",
+            "direction_accuracy", "buy_and_hold_return")
+    summary = {}
+    for method in METHODS:
+        scored = [r for r in results if r["method"] == method and "error" not in r]
+        if not scored:
+            continue
+        summary[method] = {"symbols": len(scored)}
+        for key in keys:
+            values = [r[key] for r in scored if r[key] is not None]
+            summary[method][key] = float(np.mean(values)) if values else None
+    return summary
+
+
+class Backtester:
+    """
+    Runs walk-forward backtests over the predictor's cached history
+
+    History is read once per symbol in this process and each LSTM fold is
+    shipped to a worker with only the rows it needs, so workers never touch
+    the market data provider or the history store.
+    """
+
+    def __init__(self, predictor, max_workers: int = None):
+        self.predictor = predictor
+        self.max_workers = max_workers or settings.ML_BACKTEST_WORKERS
+        self._pool = None
+
+    def run(self, config: BacktestConfig, progress: Callable[[int, int], None] = None) -> Dict:
+        """Backtest every configured symbol and method; progress(done, total) is called per fold"""
+        from app.ml.predictor import FEATURES
+
+        started = time.perf_counter()
+        sequence_length = self.predictor.sequence_length
+        if config.train_days < max(2 * sequence_length, TREND_WINDOW):
+            raise ValueError(f"train_days must be at least {max(2 * sequence_length, TREND_WINDOW)}")
+        unknown = set(config.methods) - set(METHODS)
+        if unknown:
+            raise ValueError(f"Unknown methods: {', '.join(sorted(unknown))}")
+
+        results, errors, plans = [], [], {}
+        for symbol in config.symbols:
+            df = self.predictor.fetch_historical_data(symbol, period="full")
+            folds = walk_forward_folds(len(df), config.train_days, config.test_days,
+                                       config.expanding, config.max_folds)
+            if not folds:
+                errors.extend({"symbol": symbol, "method": method, "error": "Not enough history"}
+                              for method in config.methods)
+                continue
+            plans[symbol] = (df, folds)
+
+        lstm = "lstm" in config.methods
+        if lstm and importlib.util.find_spec("tensorflow") is None:
+            errors.extend({"symbol": symbol, "method": "lstm", "error": "TensorFlow not available"}
+                          for symbol in plans)
+            lstm = False
+
+        total = sum(len(folds) for _, folds in plans.values()) * (int(lstm) + int("trend" in config.methods))
+        done = 0
+
+        def advance(folds: int):
+            nonlocal done
+            done += folds
+            if progress is not None:
+                progress(done, total)
+
+        if "trend" in config.methods:
+            for symbol, (df, folds) in plans.items():
+                close = df['Close'].to_numpy(dtype=np.float64)
+                rows = np.concatenate([np.arange(fold.test_start, fold.test_end) for fold in folds])
+                results.append(self._result(symbol, "trend", df, folds, close, rows,
+                                            trend_forecasts(close, rows, config.horizon), config))
+                advance(len(folds))
+
+        if lstm:
+            predictions = {symbol: [None] * len(folds) for symbol, (_, folds) in plans.items()}
+            failed = {}
+            context = multiprocessing.get_context("spawn")  # Never fork a process with TensorFlow loaded
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(settings.ML_TRAINING_THREADS,)) as pool:
+                self._pool = pool
+                futures = {}
+                for symbol, (df, folds) in plans.items():
+                    features = df[FEATURES].to_numpy(dtype=np.float32)
+                    for i, fold in enumerate(folds):
+                        # Ship only the fold's rows, re-based to start at 0
+                        offset = fold.train_start
+                        local = Fold(0, fold.train_end - offset, fold.test_start - offset, fold.test_end - offset)
+                        future = pool.submit(_lstm_fold, features[offset:fold.test_end], local, sequence_length,
+                                             config.horizon, config.epochs, config.seed + i)
+                        futures[future] = (symbol, i)
+                for future in as_completed(futures):
+                    symbol, i = futures[future]
+                    try:
+                        predictions[symbol][i] = future.result()
+                    except Exception as e:
+                        failed.setdefault(symbol, str(e))
+                    advance(1)
+            self._pool = None
+
+            for symbol, (df, folds) in plans.items():
+                if symbol in failed:
+                    errors.append({"symbol": symbol, "method": "lstm", "error": failed[symbol]})
+                    continue
+                close = df['Close'].to_numpy(dtype=np.float64)
+                rows = np.concatenate([np.arange(fold.test_start, fold.test_end) for fold in folds])
+                results.append(self._result(symbol, "lstm", df, folds, close, rows,
+                                            np.concatenate(predictions[symbol]).astype(np.float64), config))
+
+        results.sort(key=lambda r: (config.symbols.index(r["symbol"]), config.methods.index(r["method"])))
+        return {
+            "config": asdict(config),
+            "results": results,
+            "errors": errors,
+            "summary": _summarize(results),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _result(self, symbol: str, method: str, df, folds: List[Fold], close: np.ndarray, rows: np.ndarray,
+                predicted: np.ndarray, config: BacktestConfig) -> Dict:
+        scored = score_signals(close, rows, predicted, config.horizon, config.cost_bps, config.long_only)
+        fold_returns = _fold_returns(df, folds, close, scored)
+        return {
+            "symbol": symbol,
+            "method": method,
+            "folds": len(folds),
+            "start": df.index[folds[0].test_start].date().isoformat(),
+            "end": df.index[folds[-1].test_end - 1].date().isoformat(),
+            **scored,
+            "fold_returns": fold_returns,
+        }
+
+    def close(self):
+        """Stop the fold workers of a run in progress"""
+        pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class BacktestJob:
+    """Status, progress and report of one backtest run"""
+    id: str
+    symbols: List[str]
+    methods: List[str]
+    status: str = QUEUED
+    folds_done: int = 0
+    folds_total: int = 0
+    submitted_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        job = asdict(self)
+        if not include_result:
+            job.pop("result")
+        return job
+
+
+class BacktestJobQueue:
+    """
+    Runs backtests one at a time on a background thread
+
+    The thread only coordinates: fold training happens in the Backtester's
+    process pool, so a long backtest holds neither an HTTP request nor the
+    inference workers.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, BacktestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backtest")
+        self._backtester = None
+
+    def submit(self, config: BacktestConfig) -> BacktestJob:
+        job = BacktestJob(
+            id=uuid.uuid4().hex,
+            symbols=list(config.symbols),
+            methods=list(config.methods),
+            submitted_at=datetime.now().isoformat()
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, config)
+        return job
+
+    def get(self, job_id: str) -> Optional[BacktestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[BacktestJob]:
+        return list(self._jobs.values())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._backtester is not None:
+            self._backtester.close()
+
+    def _run(self, job: BacktestJob, config: BacktestConfig):
+        from app.ml.runtime import get_predictor
+
+        job.status = RUNNING
+        job.started_at = datetime.now().isoformat()
+
+        def progress(done: int, total: int):
+            job.folds_done, job.folds_total = done, total
+
+        try:
+            self._backtester = Backtester(get_predictor())
+            job.result = self._backtester.run(config, progress)
+            job.status = COMPLETED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            self._backtester = None
+            job.finished_at = datetime.now().isoformat()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (COMPLETED, FAILED)]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+# Global backtest job queue
+backtest_jobs = BacktestJobQueue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", required=True, help="comma-separated symbols")
+    parser.add_argument("--methods", default=",".join(METHODS), help="comma-separated: lstm, trend")
+    parser.add_argument("--train-days", type=int, default=504)
+    parser.add_argument("--test-days", type=int, default=63)
+    parser.add_argument("--expanding", action="store_true", help="train on all earlier bars")
+    parser.add_argument("--max-folds", type=int, default=8, help="most recent folds, 0 for all")
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--cost-bps", type=float, default=5.0)
+    parser.add_argument("--long-only", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="fold training processes")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    from app.ml.predictor import ml_predictor
+
+    config = BacktestConfig(
+        symbols=[s.strip().upper() for s in args.symbols.split(",") if s.strip()],
+        methods=[m.strip() for m in args.methods.split(",") if m.strip()],
+        train_days=args.train_days,
+        test_days=args.test_days,
+        expanding=args.expanding,
+        max_folds=args.max_folds or None,
+        horizon=args.horizon,
+        epochs=args.epochs,
+        cost_bps=args.cost_bps,
+        long_only=args.long_only,
+    )
+    report = Backtester(ml_predictor, max_workers=args.workers).run(
+        config, lambda done, total: print(f"\r{done}/{total} folds", end="", flush=True))
+    print()
+
+    def pct(value):
+        return f"{value:.1%}" if value is not None else "-"
+
+    print(f"{'symbol':<8}{'method':<7}{'folds':>6}{'days':>6}{'return':>9}{'annual':>9}{'sharpe':>8}"
+          f"{'max DD':>9}{'hit':>7}{'trades':>8}{'B&H':>9}")
+    for r in report["results"]:
+        sharpe = f"{r['sharpe']:.2f}" if r["sharpe"] is not None else "-"
+        print(f"{r['symbol']:<8}{r['method']:<7}{r['folds']:>6}{r['days']:>6}{pct(r['total_return']):>9}"
+              f"{pct(r['annualized_return']):>9}{sharpe:>8}{pct(r['max_drawdown']):>9}{pct(r['hit_rate']):>7}"
+              f"{r['trades']:>8}{pct(r['buy_and_hold_return']):>9}")
+    for error in report["errors"]:
+        print(f"{error['symbol']:<8}{error['method']:<7}  {error['error']}")
+    print(f"{report['elapsed_seconds']:.1f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Batch analysis pipeline for whole watchlists
+"""
+import logging
+import time
+from concurrent.futures import Executor, TimeoutError as FutureTimeout, as_completed
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from app.core.metrics import ML_FALLBACKS
+from app.ml.inference import AutoregressiveForecaster
+
+logger = logging.getLogger(__name__)
+
+
+class BatchAnalyzer:
+    """
+    Analyze many symbols in four stages instead of one full analysis per symbol
+
+    1. Prefetch every history concurrently on the prefetch executor; symbols
+       not loaded within prefetch_timeout seconds are left out.
+    2. Compute indicator columns for all fetched symbols in one grouped pass.
+    3. Forecast every symbol that has a trained model; symbols sharing a
+       model (including everything served by the cross-symbol model) are
+       rolled forward together in one batched tensor, and different models
+       run in parallel on the ML executor.
+    4. Score each forecast with the same rules as analyze_stock_ml.
+
+    Results are yielded as they complete. Symbols without a trained model
+    get the statistical trend forecast: a batch never trains inline.
+    Symbols whose forecast for the current bar and model is already in the
+    predictor's prediction cache skip stages 3 and 4, and new forecasts
+    and analyses are added to it.
+    """
+
+    def __init__(self, predictor, prefetch_executor: Executor, ml_executor: Executor, days: int = 7,
+                 prefetch_timeout: float = 60.0):
+        self.predictor = predictor
+        self.prefetch_executor = prefetch_executor  # Bounded pool for history downloads
+        self.ml_executor = ml_executor
+        self.days = days
+        self.prefetch_timeout = prefetch_timeout
+
+    def run(self, symbols: List[str]) -> Iterator[Dict]:
+        """Yield one analysis dict per symbol that could be analyzed, in completion order"""
+        symbols = self._prefetch(symbols)
+        self.predictor.history_cache.compute_indicators(symbols)
+
+        groups: Dict[int, list] = {}
+        fallback, cached = [], []
+        for symbol in symbols:
+            df = self.predictor.fetch_historical_data(symbol)
+            if df.empty:
+                # Too short for the indicators (or the load failed): trend fallback, no cache key
+                fallback.append((symbol, None, "no_history"))
+                continue
+            entry = self.predictor.model_entry(symbol, df)
+            key = self.predictor.prediction_key(symbol, df, entry)
+            prediction = self.predictor.prediction_cache.get(key, self.days)
+            if prediction is not None:
+                if entry is None:
+                    ML_FALLBACKS.inc(reason="no_model")
+                cached.append((symbol, key, prediction))
+            elif entry is None:
+                fallback.append((symbol, key, "no_model"))
+            else:
+                groups.setdefault(id(entry.model), []).append((symbol, entry, key))
+
+        futures = {
+            self.ml_executor.submit(self._forecast_group, members): members
+            for members in groups.values()
+        }
+
+        # Cached and trend forecasts are cheap: score them while the models run
+        for symbol, key, prediction in cached:
+            analysis = self._analyze_cached(symbol, key, prediction)
+            if analysis:
+                yield analysis
+        for symbol, key, reason in fallback:
+            analysis = self._analyze_fallback(symbol, key, reason)
+            if analysis:
+                yield analysis
+
+        for future in as_completed(futures):
+            members = futures[future]
+            try:
+                forecasts = future.result()
+            except Exception:
+                logger.exception("Error in batched ML prediction")
+                forecasts = {}
+            for symbol, entry, key in members:
+                analysis = self._analyze_lstm(symbol, entry, key, forecasts.get(symbol))
+                if analysis:
+                    yield analysis
+
+    def _prefetch(self, symbols: List[str]) -> List[str]:
+        """Stage 1: load all histories concurrently, keeping input order"""
+        futures = {
+            symbol: self.prefetch_executor.submit(self.predictor.history_cache.get_ohlcv, symbol)
+            for symbol in symbols
+        }
+        deadline = time.monotonic() + self.prefetch_timeout
+        fetched, late = [], 0
+        for symbol, future in futures.items():
+            try:
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+                fetched.append(symbol)
+            except FutureTimeout:
+                # Loads still queued are dropped; running ones end at the provider's rate-limit timeout
+                future.cancel()
+                late += 1
+            except Exception as e:
+                logger.error("Error fetching data for %s: %s", symbol, e)
+        if late:
+            logger.warning("Batch analysis skipped %d symbols not fetched within %gs", late, self.prefetch_timeout)
+        return fetched
+
+    def _forecast_group(self, members: list) -> Dict[str, np.ndarray]:
+        """Stage 3: roll every symbol that shares one model forward in a single batch"""
+        symbols, windows, symbol_ids = [], [], []
+        for symbol, entry, _ in members:
+            df = self.predictor.fetch_historical_data(symbol)
+            window, _ = self.predictor.prepare_data(df, scaler=entry.scaler, last_only=True)
+            if len(window):
+                symbols.append(symbol)
+                windows.append(window[0])
+                symbol_ids.append(entry.symbol_id)
+        if not windows:
+            return {}
+
+        model = members[0][1].model
+        ids = None if symbol_ids[0] is None else np.array(symbol_ids)
+        predictions = AutoregressiveForecaster(model).forecast(np.stack(windows), self.days, ids)
+        return dict(zip(symbols, predictions))
+
+    def _analyze_cached(self, symbol: str, key: tuple, prediction: Dict):
+        """Stage 4 for a cached forecast, reusing its cached analysis if there is one"""
+        analysis = self.predictor.prediction_cache.get_analysis(key, self.days)
+        return analysis if analysis is not None else self._score(symbol, prediction, key)
+
+    def _analyze_lstm(self, symbol: str, entry, key: tuple, scaled_predictions):
+        """Stage 4 for a symbol with a model; falls back to the trend forecast on failure"""
+        if scaled_predictions is None:
+            return self._analyze_fallback(symbol, reason="error")
+        try:
+            df = self.predictor.fetch_historical_data(symbol)
+            prediction = self.predictor._lstm_result(symbol, df, entry, scaled_predictions)
+            self.predictor.prediction_cache.put(key, prediction)
+            return self._score(symbol, prediction, key)
+        except Exception:
+            logger.exception("Error in ML analysis for %s", symbol)
+            return None
+
+    def _analyze_fallback(self, symbol: str, key: tuple = None, reason: str = "no_model"):
+        """Stage 4 with the trend forecast; only no_model forecasts (with a key) are cached"""
+        prediction = self.predictor._fallback_prediction(symbol, self.days, reason)
+        if not prediction:
+            return None
+        if key:
+            self.predictor.prediction_cache.put(key, prediction)
+        return self._score(symbol, prediction, key)
+
+    def _score(self, symbol: str, prediction: Dict, key: tuple = None):
+        try:
+            df = self.predictor.fetch_historical_data(symbol, period="1y")
+            if df.empty:
+                return None
+            analysis = self.predictor._score_analysis(symbol, df, prediction)
+            if key:
+                self.predictor.prediction_cache.put_analysis(key, analysis, self.days)
+            return analysis
+        except Exception:
+            logger.exception("Error in ML analysis for %s", symbol)
+            return None
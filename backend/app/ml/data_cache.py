@@ -0,0 +1,108 @@
+"""
+Shared per-symbol history cache for the ML predictor
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from app.core.metrics import CACHE_REQUESTS
+from app.ml.indicators import IndicatorEngine
+
+# Approximate number of trading days per period; other periods use the full history
+PERIOD_ROWS = {
+    "6mo": 126,
+    "1y": 252,
+    "2y": 504,
+}
+
+
+@dataclass
+class _HistoryEntry:
+    ohlcv: pd.DataFrame
+    fetched_at: datetime
+    indicators: pd.DataFrame = None
+    periods: Dict[str, pd.DataFrame] = field(default_factory=dict)
+
+
+class HistoryCache:
+    """
+    One OHLCV download per symbol per TTL, shared by every predictor entry point
+
+    Indicators are computed once over the full cached history and each
+    period is a tail slice of that frame, so analyze, predict, train and the
+    fallback path all read the same data without refetching it. When a
+    refreshed history only adds bars, the indicator engine extends the
+    previous indicator frame instead of recomputing it. Frames returned
+    from the cache are shared and must not be modified in place.
+    """
+
+    def __init__(self, loader: Callable[[str], pd.DataFrame], ttl: timedelta = timedelta(hours=1)):
+        self.loader = loader  # symbol -> OHLCV frame sorted oldest first
+        self.ttl = ttl
+        self._entries: Dict[str, _HistoryEntry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.indicators = IndicatorEngine()
+
+    def _lock_for(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _entry(self, symbol: str) -> _HistoryEntry:
+        entry = self._entries.get(symbol)
+        if entry is not None and datetime.now() - entry.fetched_at < self.ttl:
+            CACHE_REQUESTS.inc(cache="history", result="hit")
+            return entry
+        CACHE_REQUESTS.inc(cache="history", result="miss")
+
+        # Only one thread downloads a given symbol; the others wait for its result
+        with self._lock_for(symbol):
+            entry = self._entries.get(symbol)
+            if entry is None or datetime.now() - entry.fetched_at >= self.ttl:
+                entry = _HistoryEntry(ohlcv=self.loader(symbol), fetched_at=datetime.now())
+                # An empty history is not cached, so the next call loads again
+                if not entry.ohlcv.empty:
+                    self._entries[symbol] = entry
+        return entry
+
+    def get_ohlcv(self, symbol: str) -> pd.DataFrame:
+        """Full cached OHLCV history for a symbol, oldest first"""
+        return self._entry(symbol.upper()).ohlcv
+
+    def get(self, symbol: str, period: str = "2y") -> pd.DataFrame:
+        """OHLCV plus indicator columns for the requested period, without NaN rows"""
+        entry = self._entry(symbol.upper())
+        frame = entry.periods.get(period)
+        if frame is not None:
+            return frame
+
+        if entry.indicators is None:
+            entry.indicators = self.indicators.compute(symbol.upper(), entry.ohlcv)
+        frame = entry.indicators
+        if period in PERIOD_ROWS:
+            frame = frame.tail(PERIOD_ROWS[period])
+        frame = frame.dropna()
+        entry.periods[period] = frame
+        return frame
+
+    def compute_indicators(self, symbols: List[str]):
+        """Compute indicator columns for every listed symbol that lacks them, in one pass"""
+        entries = {}
+        for symbol in symbols:
+            entry = self._entries.get(symbol.upper())
+            if entry is not None and entry.indicators is None:
+                entries[symbol.upper()] = entry
+        batch = self.indicators.compute_batch({symbol: entry.ohlcv for symbol, entry in entries.items()})
+        for symbol, indicators in batch.items():
+            entries[symbol].indicators = indicators
+
+    def invalidate(self, symbol: str = None):
+        """Forget one symbol, or everything when no symbol is given"""
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(symbol.upper(), None)
+        self.indicators.forget(symbol)
@@ -0,0 +1,99 @@
+"""
+Cross-symbol ("global") LSTM shared by every symbol
+
+One network is trained on windows pooled from many symbols, each scaled
+with its own MinMaxScaler, so a single model (and a single batched
+forward pass) covers a whole universe instead of one model per symbol.
+An optional learned symbol embedding is concatenated to every timestep;
+id 0 stands for symbols the model was not trained on.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+# Registry and training-job key of the shared model (never a valid ticker)
+GLOBAL_MODEL = "*"
+# Subdirectory of ML_MODEL_DIR holding the shared model
+GLOBAL_DIR = "_global"
+
+UNKNOWN_SYMBOL_ID = 0
+# Fraction of training windows relabelled UNKNOWN_SYMBOL_ID, so unseen symbols get a trained embedding
+UNKNOWN_ID_RATE = 0.05
+# Scalers fitted for symbols outside the training universe kept in memory (least recently used
+# dropped first); they are not saved with the model and are refitted after eviction or a restart
+MAX_FITTED_SCALERS = 1024
+
+
+def build_global_model(sequence_length: int, n_features: int, n_symbols: int, embedding_dim: int):
+    """The build_lstm_model stack with a learned per-symbol embedding on every timestep"""
+    from tensorflow.keras import Model
+    from tensorflow.keras.layers import (LSTM, Concatenate, Dense, Dropout, Embedding, Input,
+                                         RepeatVector)
+
+    sequences = Input(shape=(sequence_length, n_features), name="sequences")
+    symbol_ids = Input(shape=(), dtype="int32", name="symbol_ids")
+    embedding = Embedding(n_symbols + 1, embedding_dim)(symbol_ids)
+    # Features first, then the embedding: the NumPy export relies on this order
+    x = Concatenate()([sequences, RepeatVector(sequence_length)(embedding)])
+    x = LSTM(units=50, return_sequences=True)(x)
+    x = Dropout(0.2)(x)
+    x = LSTM(units=50, return_sequences=True)(x)
+    x = Dropout(0.2)(x)
+    x = LSTM(units=50)(x)
+    x = Dropout(0.2)(x)
+    x = Dense(units=25)(x)
+    output = Dense(units=1)(x)
+
+    model = Model([sequences, symbol_ids], output)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+class GlobalModel:
+    """The shared model with the per-symbol scalers and embedding ids it was trained with"""
+
+    def __init__(self, model, scalers: Dict[str, MinMaxScaler], symbols: List[str], embedding_dim: int,
+                 trained_at: str, val_loss: Optional[float] = None):
+        self.model = model
+        self.scalers = dict(scalers)
+        self.symbols = list(symbols)
+        self.embedding_dim = embedding_dim
+        self.trained_at = trained_at
+        self.val_loss = val_loss
+        self._ids = {symbol: index + 1 for index, symbol in enumerate(self.symbols)}
+        self._fitted: "OrderedDict[str, MinMaxScaler]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def symbol_id(self, symbol: str) -> Optional[int]:
+        """Embedding id of a symbol (UNKNOWN_SYMBOL_ID if unseen), or None without an embedding"""
+        if not self.embedding_dim:
+            return None
+        return self._ids.get(symbol.upper(), UNKNOWN_SYMBOL_ID)
+
+    def scaler_for(self, symbol: str, features: np.ndarray) -> MinMaxScaler:
+        """
+        The symbol's training scaler; symbols outside the training universe
+        get one fitted on their own feature rows, as training would have
+        Those are kept for the last MAX_FITTED_SCALERS symbols only and never
+        persisted (scalers.joblib holds the training scalers), so after a
+        restart they are refitted on the history available then.
+        """
+        symbol = symbol.upper()
+        scaler = self.scalers.get(symbol)
+        if scaler is not None:
+            return scaler
+        with self._lock:
+            scaler = self._fitted.get(symbol)
+            if scaler is not None:
+                self._fitted.move_to_end(symbol)
+                return scaler
+        scaler = MinMaxScaler(feature_range=(0, 1)).fit(features)
+        with self._lock:
+            scaler = self._fitted.setdefault(symbol, scaler)
+            self._fitted.move_to_end(symbol)
+            while len(self._fitted) > MAX_FITTED_SCALERS:
+                self._fitted.popitem(last=False)
+        return scaler
@@ -0,0 +1,262 @@
+"""
+Technical indicator features for the LSTM predictor
+
+add_indicators and add_indicators_batch compute the feature columns over a
+whole history with pandas. IndicatorEngine keeps per-symbol rolling state
+so that bars appended to a known history are processed in O(1) each,
+producing exactly the values pandas would produce for the full frame.
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.metrics import STAGE_SECONDS
+
+# Moving-average feature columns and their window lengths
+MA_WINDOWS = {'MA7': 7, 'MA21': 21, 'MA50': 50}
+INDICATOR_COLUMNS = list(MA_WINDOWS) + ['Price_Change', 'Volume_Change']
+
+
+def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the technical indicator columns used as model features"""
+    df = df.copy()
+    df['MA7'] = df['Close'].rolling(window=7).mean()
+    df['MA21'] = df['Close'].rolling(window=21).mean()
+    df['MA50'] = df['Close'].rolling(window=50).mean()
+    df['Price_Change'] = df['Close'].pct_change()
+    df['Volume_Change'] = df['Volume'].pct_change()
+    return df
+
+
+def add_indicators_batch(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    add_indicators for many symbols in one grouped pass
+    Rolling windows restart at every symbol boundary, so each result is
+    identical to calling add_indicators on that symbol's frame alone.
+    """
+    if not frames:
+        return {}
+    combined = pd.concat(frames, names=['Symbol', 'Date'])
+    grouped = combined.groupby(level=0, sort=False)
+    close = grouped['Close']
+    combined['MA7'] = close.rolling(window=7).mean().values
+    combined['MA21'] = close.rolling(window=21).mean().values
+    combined['MA50'] = close.rolling(window=50).mean().values
+    combined['Price_Change'] = close.pct_change().values
+    combined['Volume_Change'] = grouped['Volume'].pct_change().values
+
+    result = {}
+    for symbol, frame in frames.items():
+        indicators = combined.loc[symbol]
+        indicators.index = frame.index
+        result[symbol] = indicators
+    return result
+
+
+class RollingMean:
+    """
+    Fixed-window mean with the same running state as pandas' rolling().mean()
+
+    pandas keeps a Kahan-compensated running sum (separate compensation for
+    adds and removes), counts of observations and negative values, and a
+    run length of identical values. Mirroring every step makes each output
+    bit-for-bit equal to the vectorized result.
+    """
+
+    __slots__ = ("window", "values", "nobs", "neg_ct", "sum_x", "comp_add", "comp_remove", "same", "prev")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same = 0
+        self.prev = None
+
+    def push(self, value: float) -> float:
+        """Add the next value and return the mean of the current window (NaN until it is full)"""
+        if math.isinf(value):
+            value = math.nan  # pandas treats infinities as missing in window functions
+        if self.prev is None:
+            self.prev = value
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+        self.values.append(value)
+        self._add(value)
+
+        if self.nobs < self.window:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.same >= self.nobs:
+            return self.prev
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    def _add(self, value: float):
+        if value != value:
+            return
+        self.nobs += 1
+        y = value - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        self.same = self.same + 1 if value == self.prev else 1
+        self.prev = value
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+        self.nobs -= 1
+        y = -value - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+
+class PctChange:
+    """One-period pct_change with forward fill of missing values, as pandas computes it"""
+
+    __slots__ = ("last",)
+
+    def __init__(self):
+        self.last = math.nan
+
+    def push(self, value: float) -> float:
+        filled = value if value == value else self.last
+        previous, self.last = self.last, filled
+        if previous == 0.0:
+            if filled != filled or filled == 0.0:
+                return math.nan
+            return math.copysign(math.inf, filled) * math.copysign(1.0, previous) - 1
+        return filled / previous - 1
+
+
+class IndicatorState:
+    """Rolling indicator state for one symbol"""
+
+    def __init__(self):
+        self.moving_averages = {column: RollingMean(window) for column, window in MA_WINDOWS.items()}
+        self.price_change = PctChange()
+        self.volume_change = PctChange()
+
+    def push(self, close: float, volume: float) -> List[float]:
+        """Feed one bar and return its values for INDICATOR_COLUMNS"""
+        row = [average.push(close) for average in self.moving_averages.values()]
+        row.append(self.price_change.push(close))
+        row.append(self.volume_change.push(volume))
+        return row
+
+    @classmethod
+    def replay(cls, frame: pd.DataFrame) -> "IndicatorState":
+        """Rebuild the state reached after feeding every bar of frame"""
+        state = cls()
+        for close, volume in zip(frame['Close'].tolist(), frame['Volume'].tolist()):
+            state.push(close, volume)
+        return state
+
+
+class IndicatorEngine:
+    """
+    Per-symbol indicator frames that only process newly appended bars
+
+    The first computation for a symbol is vectorized. When a later history
+    for the symbol extends the last one (same rows, new bars at the end),
+    only the new bars are fed through the rolling state and appended to the
+    previous indicator frame. The rolling state itself is rebuilt from the
+    known history once, on the first append.
+    """
+
+    def __init__(self):
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._states: Dict[str, IndicatorState] = {}
+        self._lock = threading.Lock()
+
+    def compute(self, symbol: str, ohlcv: pd.DataFrame) -> pd.DataFrame:
+        """OHLCV plus indicator columns for a symbol's full history"""
+        symbol = symbol.upper()
+        with self._lock, STAGE_SECONDS.time(stage="indicators"):
+            frame = self._extend(symbol, ohlcv)
+            if frame is None:
+                frame = add_indicators(ohlcv)
+                self._remember(symbol, frame)
+            return frame
+
+    def compute_batch(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """compute for many symbols; histories with no usable state share one grouped pass"""
+        result, cold = {}, {}
+        with self._lock, STAGE_SECONDS.time(stage="indicators"):
+            for symbol, ohlcv in frames.items():
+                frame = self._extend(symbol.upper(), ohlcv)
+                if frame is None:
+                    cold[symbol] = ohlcv
+                else:
+                    result[symbol] = frame
+            for symbol, frame in add_indicators_batch(cold).items():
+                self._remember(symbol.upper(), frame)
+                result[symbol] = frame
+        return result
+
+    def forget(self, symbol: str = None):
+        """Drop state for one symbol, or for all symbols when none is given"""
+        with self._lock:
+            if symbol is None:
+                self._frames.clear()
+                self._states.clear()
+            else:
+                self._frames.pop(symbol.upper(), None)
+                self._states.pop(symbol.upper(), None)
+
+    def _remember(self, symbol: str, frame: pd.DataFrame):
+        self._frames[symbol] = frame
+        self._states.pop(symbol, None)  # Rebuilt from the frame if bars are appended later
+
+    def _extend(self, symbol: str, ohlcv: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Indicator frame for ohlcv built from the previous one, or None if ohlcv does not extend it (lock held)"""
+        previous = self._frames.get(symbol)
+        if previous is None or not self._extends(previous, ohlcv):
+            return None
+        if len(ohlcv) == len(previous):
+            return previous
+
+        state = self._states.get(symbol)
+        if state is None:
+            state = IndicatorState.replay(previous)
+            self._states[symbol] = state
+
+        n = len(previous)
+        new_close = ohlcv['Close'].to_numpy()[n:].tolist()
+        new_volume = ohlcv['Volume'].to_numpy()[n:].tolist()
+        rows = np.array([state.push(close, volume) for close, volume in zip(new_close, new_volume)])
+
+        # Only the new rows are computed; the old indicator values are copied as-is
+        columns = {column: ohlcv[column].to_numpy() for column in ohlcv.columns}
+        for i, column in enumerate(INDICATOR_COLUMNS):
+            columns[column] = np.concatenate([previous[column].to_numpy(), rows[:, i]])
+        frame = pd.DataFrame(columns, index=ohlcv.index)
+        self._frames[symbol] = frame
+        return frame
+
+    @staticmethod
+    def _extends(previous: pd.DataFrame, ohlcv: pd.DataFrame) -> bool:
+        """Whether ohlcv starts with exactly the bars previous was computed from"""
+        n = len(previous)
+        if n == 0 or len(ohlcv) < n or list(previous.columns[:len(ohlcv.columns)]) != list(ohlcv.columns):
+            return False
+        if ohlcv.index[0] != previous.index[0] or ohlcv.index[n - 1] != previous.index[-1]:
+            return False
+        return (ohlcv['Close'].iat[n - 1] == previous['Close'].iat[-1]
+                and ohlcv['Volume'].iat[n - 1] == previous['Volume'].iat[-1])
@@ -0,0 +1,138 @@
+"""
+Autoregressive multi-step inference for the LSTM predictor
+"""
+import sys
+import weakref
+
+import numpy as np
+
+from app.core.metrics import STAGE_SECONDS
+
+# Compiled forward functions, reused for as long as their model is alive
+_forward_cache = weakref.WeakKeyDictionary()
+
+
+def _compiled_forward(model):
+    """
+    Wrap a Keras model call in a tf.function with a batch-agnostic signature
+
+    Calling the model eagerly re-runs the LSTM step loop in Python, and
+    Model.predict sets up a data pipeline on every call; a traced function
+    avoids both. Non-Keras models are called as they are. Every forward
+    takes (sequences, symbol_ids); symbol_ids is None for models without
+    a symbol embedding.
+    """
+    # A Keras model implies TensorFlow is loaded already; never import it just to check
+    tf = sys.modules.get("tensorflow")
+    if tf is None or not isinstance(model, tf.keras.Model):
+        if getattr(model, "has_symbol_embedding", False):
+            return model
+        return lambda x, symbol_ids: model(x)
+
+    try:
+        return _forward_cache[model]
+    except (KeyError, TypeError):
+        pass
+
+    if len(model.inputs) == 2:
+        # Cross-symbol model: [sequences, symbol ids]; unknown symbols use id 0
+        _, length, n_features = model.inputs[0].shape
+        compiled = tf.function(
+            lambda x, ids: model([x, ids], training=False),
+            input_signature=[tf.TensorSpec((None, length, n_features), tf.float32),
+                             tf.TensorSpec((None,), tf.int32)]
+        )
+
+        def forward(x, symbol_ids):
+            ids = np.zeros(len(x), dtype=np.int32) if symbol_ids is None else np.asarray(symbol_ids, dtype=np.int32)
+            return compiled(x, ids)
+    else:
+        _, length, n_features = model.input_shape
+        compiled = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec((None, length, n_features), tf.float32)]
+        )
+
+        def forward(x, symbol_ids):
+            return compiled(x)
+
+    try:
+        _forward_cache[model] = forward
+    except TypeError:
+        pass
+    return forward
+
+
+class SequenceRing:
+    """
+    Fixed-size ring buffer of the last sequence_length feature rows per batch item
+
+    Storage is doubled (every row is written at slot i and i + length) so the
+    current window is always a single slice and no step ever needs
+    np.append or np.roll.
+    """
+
+    def __init__(self, sequences: np.ndarray):
+        batch, length, n_features = sequences.shape
+        self.length = length
+        self.head = 0
+        self._buffer = np.empty((batch, 2 * length, n_features), dtype=np.float32)
+        self._buffer[:, :length] = sequences
+        self._buffer[:, length:] = sequences
+
+    def window(self) -> np.ndarray:
+        """The current (batch, sequence_length, features) window, oldest row first"""
+        return self._buffer[:, self.head:self.head + self.length]
+
+    def push(self, rows: np.ndarray):
+        """Append one (batch, features) row per item, evicting the oldest"""
+        self._buffer[:, self.head] = rows
+        self._buffer[:, self.head + self.length] = rows
+        self.head = (self.head + 1) % self.length
+
+    def last_rows(self) -> np.ndarray:
+        """The most recently pushed (batch, features) rows"""
+        return self._buffer[:, self.head + self.length - 1]
+
+
+class AutoregressiveForecaster:
+    """
+    Rolls a trained model forward one day at a time
+
+    Each step calls the compiled model directly (no Keras predict loop
+    setup) on the whole batch, so forecasting many sequences for the same
+    model costs the same number of calls as forecasting one.
+    """
+
+    def __init__(self, model, target_index: int = 0):
+        self.model = model
+        self._forward = _compiled_forward(model)
+        self.target_index = target_index  # Feature column the model predicts (Close)
+
+    def forecast(self, sequences: np.ndarray, days: int, symbol_ids: np.ndarray = None) -> np.ndarray:
+        """
+        Forecast `days` steps ahead for a (batch, sequence_length, features) array
+        Returns scaled predictions with shape (batch, days). symbol_ids (one
+        per batch item) are passed to cross-symbol models with an embedding.
+        """
+        if sequences.ndim == 2:
+            sequences = sequences[None]
+        ring = SequenceRing(sequences)
+        predictions = np.empty((sequences.shape[0], days), dtype=np.float32)
+
+        with STAGE_SECONDS.time(stage="predict"):
+            for day in range(days):
+                step = self._step(ring.window(), symbol_ids)
+                predictions[:, day] = step
+
+                # Next input row: carry the last row forward with the predicted Close
+                new_rows = ring.last_rows().copy()
+                new_rows[:, self.target_index] = step
+                ring.push(new_rows)
+
+        return predictions
+
+    def _step(self, window: np.ndarray, symbol_ids: np.ndarray = None) -> np.ndarray:
+        """Run a single forward pass and return one prediction per batch item"""
+        output = self._forward(np.ascontiguousarray(window), symbol_ids)
+        return np.asarray(output).reshape(window.shape[0], -1)[:, 0]
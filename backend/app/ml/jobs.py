@@ -0,0 +1,312 @@
+"""
+Background training jobs run in a local process pool
+"""
+import multiprocessing
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import configure_logging, settings
+from app.ml.global_model import GLOBAL_MODEL
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs kept for status polling
+MAX_FINISHED_JOBS = 200
+
+
+class TrainingCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+
+class JobConflict(Exception):
+    """A job for the same symbol is already queued or running"""
+
+    def __init__(self, job: "TrainingJob"):
+        super().__init__(f"A {job.kind} job for {job.symbol} is already {job.status}")
+        self.job = job
+
+
+@dataclass
+class TrainingJob:
+    """Status and progress of one training job"""
+    id: str
+    symbol: str
+    kind: str
+    epochs: int
+    status: str = QUEUED
+    epoch: int = 0
+    loss: Optional[float] = None
+    val_loss: Optional[float] = None
+    submitted_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    detail: Optional[str] = None  # Outcome of an update job (fine-tuned, retrained or up to date)
+    cancel_requested: bool = False
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _init_worker(threads: int):
+    """Set up logging and cap TensorFlow's thread pools so training leaves CPU for inference"""
+    configure_logging()
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def _progress_callback(job_id: str, events, cancel_flags):
+    """Keras callback that streams epoch progress and honours cancellation"""
+    from tensorflow import keras
+
+    class ProgressCallback(keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            events.put((job_id, "epoch", {
+                "epoch": epoch + 1,
+                "loss": float(logs["loss"]) if "loss" in logs else None,
+                "val_loss": float(logs["val_loss"]) if "val_loss" in logs else None,
+            }))
+            if cancel_flags.get(job_id):
+                raise TrainingCancelled()
+
+    return ProgressCallback()
+
+
+def _run_training(job_id: str, symbol: str, epochs: int, events, cancel_flags) -> bool:
+    """Worker entry point: train one symbol and save it to the shared model directory"""
+    from app.ml.predictor import ml_predictor
+
+    # Jobs already handed to the pool cannot be withdrawn; drop them here instead
+    if cancel_flags.get(job_id):
+        raise TrainingCancelled()
+    events.put((job_id, RUNNING, {}))
+    callback = _progress_callback(job_id, events, cancel_flags)
+    return ml_predictor.train_model(symbol, epochs=epochs, callbacks=[callback])
+
+
+def _run_update(job_id: str, symbol: str, epochs: int, events, cancel_flags) -> Optional[str]:
+    """Worker entry point: warm-start update of one symbol's model with its new bars"""
+    from app.ml.predictor import ml_predictor
+
+    if cancel_flags.get(job_id):
+        raise TrainingCancelled()
+    events.put((job_id, RUNNING, {}))
+    callback = _progress_callback(job_id, events, cancel_flags)
+    return ml_predictor.update_model(symbol, epochs=epochs, callbacks=[callback])
+
+
+def _run_global_training(job_id: str, symbols: List[str], epochs: int, embedding_dim: Optional[int],
+                         events, cancel_flags) -> bool:
+    """Worker entry point: train the shared cross-symbol model"""
+    from app.ml.predictor import ml_predictor
+
+    if cancel_flags.get(job_id):
+        raise TrainingCancelled()
+    events.put((job_id, RUNNING, {}))
+    callback = _progress_callback(job_id, events, cancel_flags)
+    return ml_predictor.train_global_model(symbols, epochs=epochs, embedding_dim=embedding_dim,
+                                           callbacks=[callback])
+
+
+class TrainingJobQueue:
+    """
+    Submits training runs to a process pool and tracks their progress
+
+    At most ML_TRAINING_WORKERS jobs train at once, each in its own process
+    with a capped TensorFlow thread pool, so long runs neither hold HTTP
+    requests open nor starve the inference workers. Workers write models to
+    the shared ML_MODEL_DIR; on completion the parent process drops its
+    cached copy so the next prediction loads the new one.
+
+    A symbol has at most one queued or running job (train or update; the
+    shared model counts as symbol GLOBAL_MODEL), so two processes never
+    write the same model files: submitting another raises JobConflict.
+    """
+
+    def __init__(self, max_workers: int = None, on_model_saved: Callable[[str], None] = None):
+        self.max_workers = max_workers or settings.ML_TRAINING_WORKERS
+        self.on_model_saved = on_model_saved
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._events = None
+        self._cancel_flags = None
+
+    def _start(self):
+        """Start the pool and progress channel on first use (lock held)"""
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context("spawn")  # Never fork a process with TensorFlow loaded
+        self._manager = context.Manager()
+        self._events = self._manager.Queue()
+        self._cancel_flags = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(settings.ML_TRAINING_THREADS,)
+        )
+        threading.Thread(target=self._drain_events, name="training-progress", daemon=True).start()
+
+    def submit(self, symbol: str, epochs: int = 50) -> TrainingJob:
+        """Queue a training job for a symbol (JobConflict if it already has one)"""
+        return self._submit(symbol.upper(), "train", epochs, _run_training, symbol.upper(), epochs)
+
+    def submit_update(self, symbol: str, epochs: int = None) -> TrainingJob:
+        """Queue a warm-start update (fine-tune on new bars, full retrain on drift) for a symbol"""
+        epochs = epochs or settings.ML_UPDATE_EPOCHS
+        return self._submit(symbol.upper(), "update", epochs, _run_update, symbol.upper(), epochs)
+
+    def submit_global(self, symbols: List[str], epochs: int = 30, embedding_dim: int = None) -> TrainingJob:
+        """Queue training of the shared model on a universe of symbols (job symbol GLOBAL_MODEL)"""
+        symbols = [symbol.upper() for symbol in symbols]
+        return self._submit(GLOBAL_MODEL, "global", epochs, _run_global_training, symbols, epochs, embedding_dim)
+
+    def active(self, symbol: str) -> Optional[TrainingJob]:
+        """The queued or running job for a symbol, if any"""
+        symbol = symbol.upper()
+        return next((job for job in self._jobs.values()
+                     if job.symbol == symbol and job.status in (QUEUED, RUNNING)), None)
+
+    def _submit(self, symbol: str, kind: str, epochs: int, fn, *args) -> TrainingJob:
+        job = TrainingJob(
+            id=uuid.uuid4().hex,
+            symbol=symbol,
+            kind=kind,
+            epochs=epochs,
+            submitted_at=datetime.now().isoformat()
+        )
+        with self._lock:
+            active = self.active(symbol)
+            if active is not None:
+                raise JobConflict(active)
+            self._start()
+            self._jobs[job.id] = job
+            future = self._executor.submit(fn, job.id, *args, self._events, self._cancel_flags)
+            self._futures[job.id] = future
+            self._prune()
+        future.add_done_callback(lambda f, job_id=job.id: self._finish(job_id, f))
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        """
+        Cancel a job: queued jobs are dropped, running jobs stop after their current epoch
+        Returns None if the job is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in (COMPLETED, FAILED, CANCELLED):
+                return job
+            future = self._futures.get(job_id)
+            if future is not None and future.cancel():
+                job.status = CANCELLED
+                job.finished_at = datetime.now().isoformat()
+            else:
+                job.cancel_requested = True
+                self._cancel_flags[job_id] = True
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                for job_id in self._futures:
+                    self._cancel_flags[job_id] = True
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._manager.shutdown()
+                self._executor = None
+
+    def _drain_events(self):
+        """Apply progress events sent by the workers"""
+        while True:
+            try:
+                job_id, kind, payload = self._events.get()
+            except (EOFError, OSError):
+                return
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            if kind == RUNNING and job.status == QUEUED:
+                job.status = RUNNING
+                job.started_at = datetime.now().isoformat()
+            elif kind == "epoch":
+                job.epoch = payload["epoch"]
+                job.loss = payload["loss"]
+                job.val_loss = payload["val_loss"]
+
+    def _finish(self, job_id: str, future: Future):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.finished_at = datetime.now().isoformat()
+        try:
+            succeeded = future.result()
+        except CancelledError:
+            job.status = CANCELLED
+            return
+        except TrainingCancelled:
+            job.status = CANCELLED
+            return
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            return
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                try:
+                    self._cancel_flags.pop(job_id, None)
+                except (AttributeError, EOFError, OSError):
+                    pass  # Manager already shut down
+
+        if succeeded:
+            job.status = COMPLETED
+            if isinstance(succeeded, str):
+                job.detail = succeeded
+            if self.on_model_saved is not None:
+                self.on_model_saved(job.symbol)
+        else:
+            job.status = FAILED
+            job.error = f"Training failed for {job.symbol}"
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS (lock held)"""
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in (COMPLETED, FAILED, CANCELLED)
+        ]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+def _evict_cached_model(symbol: str):
+    # Nothing is cached if the predictor has not been loaded in this process yet
+    predictor = sys.modules.get("app.ml.predictor")
+    if predictor is not None:
+        predictor.ml_predictor.registry.evict(symbol)
+
+
+# Global training job queue
+training_jobs = TrainingJobQueue(on_model_saved=_evict_cached_model)
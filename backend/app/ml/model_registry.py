@@ -0,0 +1,395 @@
+"""
+Per-symbol registry of trained LSTM models persisted to local disk
+Also holds the shared cross-symbol model (see global_model.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.core.metrics import CACHE_REQUESTS, STAGE_SECONDS
+from app.ml.global_model import GLOBAL_DIR, GLOBAL_MODEL, GlobalModel
+from app.ml.numpy_lstm import FLOAT32, PRECISIONS, NumpyLSTMModel, precision_regression
+
+MODEL_FILE = "model.keras"
+WEIGHTS_FILE = "weights.npz"  # NumPy inference export of MODEL_FILE
+SCALER_FILE = "scaler.joblib"
+SCALERS_FILE = "scalers.joblib"  # Per-symbol scalers of the shared model
+META_FILE = "meta.json"
+
+KERAS = "keras"
+NUMPY = "numpy"
+
+logger = logging.getLogger(__name__)
+
+_SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-^]{1,15}$")
+
+
+def fingerprint_training_data(df: pd.DataFrame, features: List[str]) -> str:
+    """Hash the feature matrix and date range a model is trained on"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(df[features].values, dtype=np.float64).tobytes())
+    if len(df):
+        digest.update(f"{df.index[0]}|{df.index[-1]}|{len(df)}".encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class ModelEntry:
+    """A trained model together with the scaler and data it was fitted on"""
+    symbol: str
+    model: object
+    scaler: object
+    fingerprint: str
+    trained_at: str
+    last_bar: str = ""  # Date of the newest bar the model has been fitted on
+    val_loss: Optional[float] = None  # Validation loss of the last full training run
+    mode: str = "full"  # "full" training, warm-start "update", or the shared "global" model
+    symbol_id: Optional[int] = None  # Embedding id for the shared model, if it has an embedding
+    holdout_from: str = ""  # Target dates of the last full training's validation windows,
+    holdout_to: str = ""  # kept through updates to check their reduced-precision exports
+
+
+class ModelRegistry:
+    """
+    Keeps one trained model per symbol, in memory and on disk.
+
+    Entries are loaded lazily the first time a symbol is requested, so a
+    restarted worker serves existing models without retraining.
+
+    With the "numpy" backend, entries hold a NumpyLSTMModel read from the
+    exported weights and TensorFlow is never imported to serve them; models
+    saved before the export existed are converted once, if TensorFlow is
+    installed. The "keras" backend serves the Keras models themselves.
+    Training always works on the Keras model (see load_keras_model).
+
+    Exports are written at `precision` (float32, float16 or int8) when the
+    reduced copy passes an accuracy check on held-out windows: its MSE may
+    exceed the float32 export's by at most max_mse_increase (relative).
+    Otherwise, and for exports without held-out data to check, float32 is
+    kept.
+    """
+
+    def __init__(self, model_dir: str, backend: str = KERAS, precision: str = FLOAT32,
+                 max_mse_increase: float = 0.05):
+        if backend not in (KERAS, NUMPY):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown weight precision: {precision}")
+        self.model_dir = model_dir
+        self.backend = backend
+        self.precision = precision
+        self.max_mse_increase = max_mse_increase
+        self._entries: Dict[str, ModelEntry] = {}
+        self._global: Optional[GlobalModel] = None
+        self._lock = threading.Lock()
+
+    def _symbol_dir(self, symbol: str) -> str:
+        symbol = symbol.upper()
+        if not _SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol for model storage: {symbol}")
+        return os.path.join(self.model_dir, symbol)
+
+    def get(self, symbol: str) -> Optional[ModelEntry]:
+        """Return the model entry for a symbol, loading it from disk if needed"""
+        symbol = symbol.upper()
+        entry = self._entries.get(symbol)
+        if entry is not None:
+            CACHE_REQUESTS.inc(cache="model", result="hit")
+            return entry
+
+        CACHE_REQUESTS.inc(cache="model", result="miss")
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                with STAGE_SECONDS.time(stage="model_load"):
+                    entry = self._load(symbol)
+                if entry is not None:
+                    self._entries[symbol] = entry
+        return entry
+
+    def save(self, symbol: str, model, scaler, fingerprint: str, last_bar: str = "",
+             val_loss: Optional[float] = None, mode: str = "full", holdout=None,
+             holdout_from: str = "", holdout_to: str = "") -> ModelEntry:
+        """
+        Persist a freshly trained model and make it the active entry for the symbol
+        holdout is an optional (X, y) pair of scaled windows not trained on,
+        used to check a reduced-precision export. holdout_from/holdout_to
+        record the target-date range of the full training's validation
+        windows.
+        """
+        symbol = symbol.upper()
+        path = self._symbol_dir(symbol)
+        os.makedirs(path, exist_ok=True)
+
+        exported = self._export(symbol, model, holdout)
+
+        entry = ModelEntry(
+            symbol=symbol,
+            model=exported if self.backend == NUMPY else model,
+            scaler=scaler,
+            fingerprint=fingerprint,
+            trained_at=datetime.now().isoformat(),
+            last_bar=last_bar,
+            val_loss=val_loss,
+            mode=mode,
+            holdout_from=holdout_from,
+            holdout_to=holdout_to
+        )
+
+        self._write(path, model, exported, scaler, SCALER_FILE, {
+            "symbol": symbol,
+            "fingerprint": fingerprint,
+            "trained_at": entry.trained_at,
+            "last_bar": last_bar,
+            "val_loss": val_loss,
+            "mode": mode,
+            "precision": exported.precision,
+            "holdout_from": holdout_from,
+            "holdout_to": holdout_to
+        })
+        with self._lock:
+            self._entries[symbol] = entry
+
+        return entry
+
+    def save_global(self, model, scalers: Dict, symbols: List[str], embedding_dim: int,
+                    val_loss: Optional[float] = None, holdout=None) -> GlobalModel:
+        """
+        Persist a freshly trained shared model with its per-symbol scalers
+        holdout is an optional (X, y, symbol_ids) triple of held-out windows.
+        """
+        path = os.path.join(self.model_dir, GLOBAL_DIR)
+        os.makedirs(path, exist_ok=True)
+        exported = self._export(GLOBAL_MODEL, model, holdout)
+        shared = GlobalModel(
+            exported if self.backend == NUMPY else model,
+            scalers, symbols, embedding_dim,
+            trained_at=datetime.now().isoformat(),
+            val_loss=val_loss
+        )
+        self._write(path, model, exported, shared.scalers, SCALERS_FILE, {
+            "symbol": GLOBAL_MODEL,
+            "symbols": shared.symbols,
+            "embedding_dim": embedding_dim,
+            "trained_at": shared.trained_at,
+            "val_loss": val_loss,
+            "mode": "global",
+            "precision": exported.precision
+        })
+        with self._lock:
+            self._global = shared
+        return shared
+
+    def _write(self, path: str, model, exported: NumpyLSTMModel, scalers, scaler_file: str, meta: Dict):
+        """Write a model directory through temporary files so a crash never leaves a half-written model"""
+        model_tmp = os.path.join(path, "model.tmp.keras")
+        weights_tmp = os.path.join(path, "weights.tmp.npz")
+        scaler_tmp = os.path.join(path, f"{scaler_file}.tmp")
+        meta_tmp = os.path.join(path, "meta.tmp.json")
+        model.save(model_tmp)
+        exported.save(weights_tmp)
+        joblib.dump(scalers, scaler_tmp)
+        with open(meta_tmp, "w") as f:
+            json.dump(meta, f)
+
+        with self._lock:
+            os.replace(model_tmp, os.path.join(path, MODEL_FILE))
+            os.replace(weights_tmp, os.path.join(path, WEIGHTS_FILE))
+            os.replace(scaler_tmp, os.path.join(path, scaler_file))
+            # Metadata goes last: its presence marks a complete entry
+            os.replace(meta_tmp, os.path.join(path, META_FILE))
+
+    def _export(self, symbol: str, model, holdout) -> NumpyLSTMModel:
+        """NumPy export at the configured precision, or float32 if it fails the held-out check"""
+        full = NumpyLSTMModel.from_keras(model)
+        if self.precision == FLOAT32 or holdout is None or not len(holdout[0]):
+            return full
+
+        reduced = full.with_precision(self.precision)
+        check = precision_regression(full, reduced, *holdout)
+        if check["candidate_mse"] > check["reference_mse"] * (1 + self.max_mse_increase):
+            logger.warning("%s weights for %s fail the accuracy check (MSE %.3e vs %.3e); keeping float32",
+                           self.precision, symbol, check["candidate_mse"], check["reference_mse"])
+            return full
+        return reduced
+
+    def has(self, symbol: str) -> bool:
+        """Check whether a trained model exists for a symbol"""
+        symbol = symbol.upper()
+        if symbol in self._entries:
+            return True
+        try:
+            return os.path.exists(os.path.join(self._symbol_dir(symbol), META_FILE))
+        except ValueError:
+            return False
+
+    def list_symbols(self) -> List[str]:
+        """List all symbols with a persisted model"""
+        if not os.path.isdir(self.model_dir):
+            return sorted(self._entries)
+        on_disk = [
+            name for name in os.listdir(self.model_dir)
+            if name != GLOBAL_DIR and os.path.exists(os.path.join(self.model_dir, name, META_FILE))
+        ]
+        return sorted(set(on_disk) | set(self._entries))
+
+    def describe(self) -> List[Dict]:
+        """Metadata (symbol, fingerprint, trained_at, last_bar, val_loss, mode, precision) of every persisted model"""
+        models = []
+        for symbol in self.list_symbols():
+            try:
+                with open(os.path.join(self._symbol_dir(symbol), META_FILE)) as f:
+                    models.append(json.load(f))
+            except (OSError, ValueError):
+                entry = self._entries.get(symbol)
+                if entry is not None:
+                    models.append({
+                        "symbol": symbol,
+                        "fingerprint": entry.fingerprint,
+                        "trained_at": entry.trained_at,
+                        "last_bar": entry.last_bar,
+                        "val_loss": entry.val_loss,
+                        "mode": entry.mode
+                    })
+        return models
+
+    def describe_global(self) -> Optional[Dict]:
+        """Metadata of the shared model, or None if none has been trained"""
+        try:
+            with open(os.path.join(self.model_dir, GLOBAL_DIR, META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def evict(self, symbol: str):
+        """Drop a symbol's model (or the shared model, for GLOBAL_MODEL) from memory; it stays on disk"""
+        with self._lock:
+            if symbol == GLOBAL_MODEL:
+                self._global = None
+            else:
+                self._entries.pop(symbol.upper(), None)
+
+    def get_global(self) -> Optional[GlobalModel]:
+        """The shared cross-symbol model, loading it from disk if needed"""
+        shared = self._global
+        if shared is not None:
+            return shared
+
+        path = os.path.join(self.model_dir, GLOBAL_DIR)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        with self._lock:
+            if self._global is None:
+                try:
+                    with open(os.path.join(path, META_FILE)) as f:
+                        meta = json.load(f)
+                    with STAGE_SECONDS.time(stage="model_load"):
+                        model = self._load_model(path)
+                    if model is not None:
+                        self._global = GlobalModel(
+                            model,
+                            joblib.load(os.path.join(path, SCALERS_FILE)),
+                            meta.get("symbols", []),
+                            meta.get("embedding_dim", 0),
+                            trained_at=meta.get("trained_at", ""),
+                            val_loss=meta.get("val_loss")
+                        )
+                        logger.info("Loaded shared model for %d symbols (%s backend)",
+                                    len(self._global.symbols), self.backend)
+                except Exception:
+                    logger.exception("Error loading shared model")
+            return self._global
+
+    def global_entry(self, symbol: str, features: np.ndarray) -> Optional[ModelEntry]:
+        """
+        An entry serving a symbol from the shared model, or None if there is none
+        features are the symbol's feature rows, used to fit a scaler for
+        symbols the shared model was not trained on.
+        """
+        shared = self.get_global()
+        if shared is None:
+            return None
+        return ModelEntry(
+            symbol=symbol.upper(),
+            model=shared.model,
+            scaler=shared.scaler_for(symbol, features),
+            fingerprint="",
+            trained_at=shared.trained_at,
+            val_loss=shared.val_loss,
+            mode="global",
+            symbol_id=shared.symbol_id(symbol)
+        )
+
+    def _load(self, symbol: str) -> Optional[ModelEntry]:
+        """Load a persisted entry, returning None if it does not exist"""
+        try:
+            path = self._symbol_dir(symbol)
+        except ValueError:
+            return None
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            model = self._load_model(path)
+            if model is None:
+                return None
+            scaler = joblib.load(os.path.join(path, SCALER_FILE))
+            logger.info("Loaded saved model for %s (trained %s, %s backend)", symbol, meta.get("trained_at"), self.backend)
+            return ModelEntry(
+                symbol=symbol,
+                model=model,
+                scaler=scaler,
+                fingerprint=meta.get("fingerprint", ""),
+                trained_at=meta.get("trained_at", ""),
+                last_bar=meta.get("last_bar", ""),
+                val_loss=meta.get("val_loss"),
+                mode=meta.get("mode", "full"),
+                holdout_from=meta.get("holdout_from", ""),
+                holdout_to=meta.get("holdout_to", "")
+            )
+        except Exception:
+            logger.exception("Error loading model for %s", symbol)
+            return None
+
+    def _load_model(self, path: str):
+        """The serving model for a symbol directory, in this registry's backend"""
+        weights_path = os.path.join(path, WEIGHTS_FILE)
+        if self.backend == NUMPY and os.path.exists(weights_path):
+            return NumpyLSTMModel.load(weights_path)
+
+        try:
+            from tensorflow.keras.models import load_model
+        except ImportError:
+            return None
+        model = load_model(os.path.join(path, MODEL_FILE))
+        if self.backend == KERAS:
+            return model
+
+        # Saved before the NumPy export existed: convert it once (float32, nothing to check against)
+        exported = NumpyLSTMModel.from_keras(model)
+        exported.save(weights_path)
+        return exported
+
+    def load_keras_model(self, symbol: str):
+        """Load a symbol's Keras model from disk (for fine-tuning), or None if there is none"""
+        try:
+            from tensorflow.keras.models import load_model
+        except ImportError:
+            return None
+        model_path = os.path.join(self._symbol_dir(symbol), MODEL_FILE)
+        if not os.path.exists(model_path):
+            return None
+        return load_model(model_path)
@@ -0,0 +1,345 @@
+"""
+TensorFlow-free forward pass for the predictor's LSTM models
+
+Trained Keras models are exported to a small .npz file holding each
+layer's weights and a JSON layer spec. NumpyLSTMModel runs batched
+inference from that file with NumPy alone, so serving processes never
+import TensorFlow; training keeps using Keras in its own processes.
+
+Kernels can be stored and kept resident as float16, or as int8 with one
+symmetric scale per tensor, and are widened to float32 for each call.
+Biases always stay float32.
+
+A cross-symbol model's symbol embedding (concatenated to every timestep
+of the first LSTM's input) is folded into a per-symbol bias table for
+that layer, so it costs one row lookup per call.
+"""
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# 2 added reduced-precision kernels (with *_scale arrays) and symbol bias tables;
+# version 1 files only hold float32 tensors and are still read
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, FORMAT_VERSION)
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+PRECISIONS = (FLOAT32, FLOAT16, INT8)
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "tanh": lambda x: np.tanh(x, out=x),
+    "sigmoid": lambda x: _sigmoid(x, out=x),
+}
+
+
+def _sigmoid(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Logistic sigmoid as 0.5 * tanh(x / 2) + 0.5, which cannot overflow"""
+    out = np.multiply(x, 0.5, out=out)
+    np.tanh(out, out=out)
+    out *= 0.5
+    out += 0.5
+    return out
+
+
+class _Weights:
+    """A kernel stored at float32, float16 or int8 precision"""
+
+    __slots__ = ("values", "scale")
+
+    def __init__(self, values: np.ndarray, scale: float = None):
+        self.values = values
+        self.scale = scale  # int8 only: float value of one quantization step
+
+    @classmethod
+    def encode(cls, weights: np.ndarray, precision: str) -> "_Weights":
+        weights = np.asarray(weights, dtype=np.float32)
+        if precision == FLOAT32:
+            return cls(np.ascontiguousarray(weights))
+        if precision == FLOAT16:
+            return cls(weights.astype(np.float16))
+        if precision == INT8:
+            peak = float(np.abs(weights).max())
+            scale = peak / 127 if peak > 0 else 1.0
+            return cls(np.round(weights / scale).astype(np.int8), scale)
+        raise ValueError(f"Unknown weight precision: {precision}")
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def decode(self) -> np.ndarray:
+        """float32 weights (the stored array itself when already float32)"""
+        if self.values.dtype == np.float32:
+            return self.values
+        weights = self.values.astype(np.float32)
+        if self.scale is not None:
+            weights *= self.scale
+        return weights
+
+
+class _LSTMLayer:
+    """
+    Keras LSTM (tanh activation, sigmoid recurrent activation) forward pass
+
+    Gate columns are stored reordered from Keras' [i, f, c, o] to
+    [i, f, o, c] so the three sigmoid gates are one contiguous slice.
+    With a bias_table, row k is the bias for symbol id k and `bias` is
+    row 0 (unknown symbol).
+    """
+
+    def __init__(self, kernel: _Weights, recurrent_kernel: _Weights, bias: np.ndarray,
+                 return_sequences: bool, bias_table: np.ndarray = None):
+        self.units = recurrent_kernel.values.shape[0]
+        self.kernel = kernel
+        self.recurrent_kernel = recurrent_kernel
+        self.bias = bias if bias_table is None else bias_table[0]
+        self.bias_table = bias_table
+        self.return_sequences = return_sequences
+
+    @staticmethod
+    def reorder_gates(weights: np.ndarray, units: int) -> np.ndarray:
+        """[i, f, c, o] gate blocks (last axis) -> [i, f, o, c]"""
+        i, f, c, o = (weights[..., k * units:(k + 1) * units] for k in range(4))
+        return np.ascontiguousarray(np.concatenate([i, f, o, c], axis=-1), dtype=np.float32)
+
+    def __call__(self, x: np.ndarray, symbol_ids: np.ndarray = None) -> np.ndarray:
+        batch, steps, _ = x.shape
+        units = self.units
+        recurrent_kernel = self.recurrent_kernel.decode()
+        # Input projections for every step in one matmul, time-major so each step is contiguous
+        projected = np.matmul(x.transpose(1, 0, 2), self.kernel.decode())
+        if self.bias_table is not None and symbol_ids is not None:
+            projected += self.bias_table[np.clip(symbol_ids, 0, len(self.bias_table) - 1)]
+        else:
+            projected += self.bias
+
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        gates = np.empty((batch, 4 * units), dtype=np.float32)
+        outputs = np.empty((steps, batch, units), dtype=np.float32) if self.return_sequences else None
+
+        for t in range(steps):
+            np.matmul(h, recurrent_kernel, out=gates)
+            gates += projected[t]
+            _sigmoid(gates[:, :3 * units], out=gates[:, :3 * units])
+            np.tanh(gates[:, 3 * units:], out=gates[:, 3 * units:])
+            input_gate, forget_gate, output_gate, candidate = (
+                gates[:, k * units:(k + 1) * units] for k in range(4)
+            )
+            c *= forget_gate
+            c += input_gate * candidate
+            h = output_gate * np.tanh(c)
+            if outputs is not None:
+                outputs[t] = h
+
+        return outputs.transpose(1, 0, 2) if outputs is not None else h
+
+
+class _DenseLayer:
+    def __init__(self, kernel: _Weights, bias: np.ndarray, activation: str):
+        if activation not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported Dense activation: {activation}")
+        self.kernel = kernel
+        self.bias = bias
+        self.activation = activation
+
+    def __call__(self, x: np.ndarray, symbol_ids: np.ndarray = None) -> np.ndarray:
+        out = np.matmul(x, self.kernel.decode())
+        out += self.bias
+        return _ACTIVATIONS[self.activation](out)
+
+
+class NumpyLSTMModel:
+    """
+    Inference-only copy of a Sequential LSTM/Dense model
+
+    Calling it with a (batch, sequence_length, features) array returns the
+    (batch, units) output of the last layer, like calling the Keras model
+    with training=False (dropout is a no-op at inference and is dropped).
+    Models exported with a symbol embedding also take one symbol id per
+    batch item.
+    """
+
+    def __init__(self, layers: List, input_shape: tuple, precision: str = FLOAT32):
+        self.layers = layers
+        self.input_shape = input_shape
+        self.precision = precision
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the weights"""
+        return sum(tensor.nbytes for layer in self.layers for tensor in _tensors(layer).values())
+
+    def with_precision(self, precision: str) -> "NumpyLSTMModel":
+        """A copy with kernels re-encoded at another precision"""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown weight precision: {precision}")
+        layers = []
+        for layer in self.layers:
+            if isinstance(layer, _LSTMLayer):
+                layers.append(_LSTMLayer(
+                    _Weights.encode(layer.kernel.decode(), precision),
+                    _Weights.encode(layer.recurrent_kernel.decode(), precision),
+                    layer.bias,
+                    layer.return_sequences,
+                    layer.bias_table
+                ))
+            else:
+                layers.append(_DenseLayer(_Weights.encode(layer.kernel.decode(), precision),
+                                          layer.bias, layer.activation))
+        return NumpyLSTMModel(layers, self.input_shape, precision)
+
+    @property
+    def has_symbol_embedding(self) -> bool:
+        return any(getattr(layer, "bias_table", None) is not None for layer in self.layers)
+
+    def __call__(self, x, symbol_ids=None) -> np.ndarray:
+        out = np.asarray(x, dtype=np.float32)
+        if out.ndim == 2:
+            out = out[None]
+        if symbol_ids is not None:
+            symbol_ids = np.asarray(symbol_ids, dtype=np.int64).reshape(-1)
+        for layer in self.layers:
+            out = layer(out, symbol_ids)
+        return out
+
+    def predict(self, x, verbose=0) -> np.ndarray:
+        """Keras-style alias for __call__; x may be [sequences, symbol_ids]"""
+        if isinstance(x, (list, tuple)):
+            return self(*x)
+        return self(x)
+
+    @classmethod
+    def from_keras(cls, model, precision: str = FLOAT32) -> "NumpyLSTMModel":
+        """
+        Convert a trained Keras model built from LSTM, Dropout and Dense layers
+        Also accepts the cross-symbol model from build_global_model, whose
+        Embedding -> RepeatVector output is concatenated after the features.
+        """
+        input_shape = model.input_shape
+        if isinstance(input_shape, list) or isinstance(input_shape[0], (list, tuple)):
+            input_shape = input_shape[0]  # [sequences, symbol ids]
+        embedding = None
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+            if kind == "LSTM":
+                if (config.get("activation") != "tanh" or config.get("recurrent_activation") != "sigmoid"
+                        or config.get("go_backwards") or not config.get("use_bias", True)):
+                    raise ValueError(f"Unsupported LSTM configuration in layer {layer.name}")
+                kernel, recurrent_kernel, bias = weights
+                units = recurrent_kernel.shape[0]
+                bias_table = None
+                if embedding is not None and not layers:
+                    # x @ K = features @ K[:n] + embedding @ K[n:], and the embedding part is per symbol
+                    n_features = input_shape[-1]
+                    bias_table = _LSTMLayer.reorder_gates(bias + embedding @ kernel[n_features:], units)
+                    kernel = kernel[:n_features]
+                layers.append(_LSTMLayer(
+                    _Weights.encode(_LSTMLayer.reorder_gates(kernel, units), precision),
+                    _Weights.encode(_LSTMLayer.reorder_gates(recurrent_kernel, units), precision),
+                    _LSTMLayer.reorder_gates(bias, units),
+                    bool(config.get("return_sequences")),
+                    bias_table
+                ))
+            elif kind == "Dense":
+                kernel = weights[0]
+                bias = weights[1] if len(weights) > 1 else np.zeros(kernel.shape[1], dtype=np.float32)
+                layers.append(_DenseLayer(_Weights.encode(kernel, precision), bias,
+                                          config.get("activation", "linear")))
+            elif kind == "Embedding":
+                embedding = weights[0]
+            elif kind in ("Dropout", "InputLayer", "RepeatVector", "Concatenate"):
+                continue
+            else:
+                raise ValueError(f"Unsupported layer type for NumPy inference: {kind}")
+        return cls(layers, tuple(input_shape), precision)
+
+    def save(self, path: str):
+        """Write the weights and layer spec to an .npz file (atomically)"""
+        spec = {
+            "version": FORMAT_VERSION,
+            "input_shape": list(self.input_shape),
+            "precision": self.precision,
+            "layers": []
+        }
+        arrays = {}
+        for index, layer in enumerate(self.layers):
+            if isinstance(layer, _LSTMLayer):
+                spec["layers"].append({
+                    "type": "lstm",
+                    "return_sequences": layer.return_sequences,
+                    "symbol_bias": layer.bias_table is not None
+                })
+            else:
+                spec["layers"].append({"type": "dense", "activation": layer.activation})
+            for name, tensor in _tensors(layer).items():
+                if isinstance(tensor, _Weights):
+                    arrays[f"{index}_{name}"] = tensor.values
+                    if tensor.scale is not None:
+                        arrays[f"{index}_{name}_scale"] = np.float32(tensor.scale)
+                else:
+                    arrays[f"{index}_{name}"] = tensor
+
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, spec=np.array(json.dumps(spec)), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyLSTMModel":
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data["spec"]))
+            if spec.get("version") not in READABLE_VERSIONS:
+                raise ValueError(f"Unsupported weights format version {spec.get('version')} in {path}")
+
+            def weights(key: str) -> _Weights:
+                scale = float(data[f"{key}_scale"]) if f"{key}_scale" in data.files else None
+                return _Weights(data[key], scale)
+
+            layers = []
+            for index, layer in enumerate(spec["layers"]):
+                if layer["type"] == "lstm":
+                    layers.append(_LSTMLayer(
+                        weights(f"{index}_kernel"),
+                        weights(f"{index}_recurrent_kernel"),
+                        data[f"{index}_bias"],
+                        layer["return_sequences"],
+                        data[f"{index}_bias_table"] if layer.get("symbol_bias") else None
+                    ))
+                else:
+                    layers.append(_DenseLayer(weights(f"{index}_kernel"), data[f"{index}_bias"], layer["activation"]))
+        input_shape = tuple(None if d is None else int(d) for d in spec["input_shape"])
+        return cls(layers, input_shape, spec.get("precision", FLOAT32))
+
+
+def _tensors(layer) -> Dict:
+    """A layer's stored tensors by file key suffix"""
+    if isinstance(layer, _LSTMLayer):
+        tensors = {"kernel": layer.kernel, "recurrent_kernel": layer.recurrent_kernel, "bias": layer.bias}
+        if layer.bias_table is not None:
+            tensors["bias_table"] = layer.bias_table
+        return tensors
+    return {"kernel": layer.kernel, "bias": layer.bias}
+
+
+def precision_regression(reference: NumpyLSTMModel, candidate: NumpyLSTMModel,
+                         X: np.ndarray, y: np.ndarray, symbol_ids: np.ndarray = None) -> Dict[str, float]:
+    """
+    Compare a reduced-precision model with its full-precision reference on held-out windows
+    Returns both models' MSE against y and the largest difference between their outputs.
+    """
+    expected = reference(X, symbol_ids)[:, 0]
+    actual = candidate(X, symbol_ids)[:, 0]
+    return {
+        "reference_mse": float(np.mean((expected - y) ** 2)),
+        "candidate_mse": float(np.mean((actual - y) ** 2)),
+        "max_abs_diff": float(np.abs(actual - expected).max()),
+    }
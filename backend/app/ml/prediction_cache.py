@@ -0,0 +1,101 @@
+"""
+Memoized forecasts and analyses for the ML predictor
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional
+
+from app.core.metrics import CACHE_REQUESTS
+
+
+def forecast_dates(days: int) -> List[str]:
+    """ISO dates of the next `days` calendar days, starting tomorrow"""
+    today = datetime.now()
+    return [(today + timedelta(days=i + 1)).strftime('%Y-%m-%d') for i in range(days)]
+
+
+def _copy(result: dict) -> dict:
+    """A copy of a result dict that shares no lists with it (values are scalars or flat lists)"""
+    return {name: list(value) if isinstance(value, list) else value for name, value in result.items()}
+
+
+@dataclass
+class _PredictionEntry:
+    result: dict  # Longest-horizon prediction computed for the key
+    analyses: Dict[int, dict] = field(default_factory=dict)  # Horizon -> scored analysis
+
+
+class PredictionCache:
+    """
+    LRU cache of prediction results keyed by (symbol, last bar date, model version)
+
+    A daily model's forecast cannot change until a new bar or a new model
+    arrives, and either one produces a different key: superseded entries are
+    never read again and age out of the LRU, so nothing has to be
+    invalidated explicitly. Forecasts are rolled forward one day at a time,
+    so the first k days do not depend on the horizon and the longest
+    forecast stored for a key serves every shorter one by slicing.
+
+    Forecast dates are relative to today, not to the last bar, and are
+    regenerated on every read. Results are copied on the way in and out,
+    lists included, so callers may modify what they store or receive.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries  # 0 disables the cache
+        self._entries: "OrderedDict[Hashable, _PredictionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Optional[_PredictionEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: Hashable, days: int) -> Optional[dict]:
+        """A prediction of `days` days for key, if one at least that long is cached"""
+        entry = self._lookup(key)
+        if entry is None or len(entry.result['predictions']) < days:
+            CACHE_REQUESTS.inc(cache="prediction", result="miss")
+            return None
+        CACHE_REQUESTS.inc(cache="prediction", result="hit")
+        return _copy(dict(entry.result, predictions=entry.result['predictions'][:days], dates=forecast_dates(days)))
+
+    def put(self, key: Hashable, result: Optional[dict]):
+        """Store a prediction unless a longer one is already cached for key"""
+        if not result or self.max_entries <= 0:
+            return
+        result = _copy(result)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = _PredictionEntry(result)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            elif len(result['predictions']) > len(entry.result['predictions']):
+                entry.result = result
+            self._entries.move_to_end(key)
+
+    def get_analysis(self, key: Hashable, days: int = 7) -> Optional[dict]:
+        """The analysis scored from the `days`-day prediction for key, if cached"""
+        entry = self._lookup(key)
+        analysis = entry.analyses.get(days) if entry is not None else None
+        if analysis is None:
+            return None
+        return _copy(dict(analysis, prediction_dates=forecast_dates(len(analysis['prediction_dates']))))
+
+    def put_analysis(self, key: Hashable, analysis: Optional[dict], days: int = 7):
+        """Attach an analysis to key's cached prediction (ignored if the prediction is not cached)"""
+        if not analysis:
+            return
+        analysis = _copy(analysis)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.analyses[days] = analysis
@@ -3,23 +3,51 @@ Machine Learning Stock Price Predictor using LSTM Neural Network
 """
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from alpha_vantage.timeseries import TimeSeries
-import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
 import warnings
 warnings.filterwarnings('ignore')
 
-try:
-    from tensorflow import keras
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import LSTM, Dense, Dropout
-    from tensorflow.keras.callbacks import EarlyStopping
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    print("Warning: TensorFlow not available. Using fallback prediction method.")
+from app.core.config import settings
+from app.core.metrics import ML_FALLBACKS, STAGE_SECONDS
+from app.ml.data_cache import PERIOD_ROWS, HistoryCache
+from app.ml.global_model import UNKNOWN_ID_RATE, UNKNOWN_SYMBOL_ID, build_global_model
+from app.ml.inference import AutoregressiveForecaster
+from app.ml.jobs import JobConflict, training_jobs
+from app.ml.model_registry import ModelRegistry, fingerprint_training_data
+from app.ml.prediction_cache import PredictionCache, forecast_dates
+from app.ml.runtime import tensorflow_available, tensorflow_installed
+from app.ml.sequences import make_sequences
+from app.services.history_store import history_store
+from app.services.market_data import MarketDataProvider, market_data
+
+logger = logging.getLogger(__name__)
+
+# Features used as LSTM inputs; Close must stay first (it is the prediction target)
+FEATURES = ['Close', 'Volume', 'MA7', 'MA21', 'MA50', 'Price_Change', 'Volume_Change']
+
+# (7-day predicted change % it must exceed, action, confidence), checked in order
+ACTION_THRESHOLDS = [
+    (5, 'Strong Buy', 85),
+    (2, 'Buy', 70),
+    (-2, 'Hold', 60),
+    (-5, 'Sell', 70),
+    (-np.inf, 'Strong Sell', 85),
+]
+
+
+# LSTM forecasts are 'High' confidence when their input frame covers the whole 2y period.
+# Indicators are computed before the period is sliced, so that is every symbol with two
+# years of bars; the former `len(df) > 500` could never hold once MA50 warm-up rows were dropped.
+HIGH_CONFIDENCE_ROWS = PERIOD_ROWS["2y"]
+
+
+def _bar_date(df: pd.DataFrame) -> str:
+    """ISO date of the newest bar in a history frame"""
+    return df.index[-1].date().isoformat()
 
 
 class MLStockPredictor:
@@ -27,81 +55,76 @@ class MLStockPredictor:
     Advanced ML-based stock price predictor using LSTM networks
     """
     
-    def __init__(self, sequence_length=60):
+    def __init__(self, sequence_length=60, model_dir: str = None, provider: MarketDataProvider = None):
         self.sequence_length = sequence_length  # Days of historical data to use
         self.scaler = MinMaxScaler(feature_range=(0, 1))
-        self.model = None
-        self.api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "UP4DUV2FAQA27ENY")
-        self.ts = TimeSeries(key=self.api_key, output_format='pandas')
+        self.registry = ModelRegistry(
+            model_dir or settings.ML_MODEL_DIR,
+            backend=settings.ML_INFERENCE_BACKEND,
+            precision=settings.ML_WEIGHT_PRECISION,
+            max_mse_increase=settings.ML_PRECISION_MAX_MSE_INCREASE
+        )
+        self.provider = provider or market_data
+        # One download per symbol per hour, shared by analyze/predict/train/fallback
+        self.history_cache = HistoryCache(self._download_history, ttl=timedelta(hours=1))
+        self.prediction_cache = PredictionCache(settings.ML_PREDICTION_CACHE_SIZE)
+    
+    def _download_history(self, symbol: str) -> pd.DataFrame:
+        """
+        Daily OHLCV history for a symbol, oldest first
+        Appends any new provider bars to the local history store, then reads from it
+        """
+        history_store.sync(symbol, lambda outputsize: self.provider.get_daily(symbol, outputsize))
+        df = history_store.read_frame(symbol)
+        
+        if df.empty:
+            raise ValueError(f"No data available for {symbol}")
+        
+        return df
         
     def fetch_historical_data(self, symbol: str, period: str = "2y") -> pd.DataFrame:
-        """Fetch historical stock data using Alpha Vantage"""
+        """
+        Historical data with technical indicators for a period (6mo, 1y, 2y or full)
+        Served from the shared history cache; the returned frame must not be modified
+        """
         try:
-            # Get full historical data (up to 20 years)
-            data, meta_data = self.ts.get_daily(symbol=symbol, outputsize='full')
-            
-            if data.empty:
-                raise ValueError(f"No data available for {symbol}")
-            
-            # Rename columns to match expected format
-            df = pd.DataFrame({
-                'Open': data['1. open'],
-                'High': data['2. high'],
-                'Low': data['3. low'],
-                'Close': data['4. close'],
-                'Volume': data['5. volume']
-            })
-            
-            # Sort by date (oldest first)
-            df = df.sort_index()
-            
-            # Filter by period if needed (approximate)
-            if period == "6mo":
-                df = df.tail(126)  # ~6 months of trading days
-            elif period == "1y":
-                df = df.tail(252)  # ~1 year of trading days
-            elif period == "2y":
-                df = df.tail(504)  # ~2 years of trading days
-            
-            # Add technical indicators
-            df['MA7'] = df['Close'].rolling(window=7).mean()
-            df['MA21'] = df['Close'].rolling(window=21).mean()
-            df['MA50'] = df['Close'].rolling(window=50).mean()
-            df['Price_Change'] = df['Close'].pct_change()
-            df['Volume_Change'] = df['Volume'].pct_change()
-            
-            # Drop NaN values
-            df = df.dropna()
-            
-            return df
+            return self.history_cache.get(symbol, period)
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {str(e)}")
+            logger.error("Error fetching data for %s: %s", symbol, e)
             return pd.DataFrame()
     
-    def prepare_data(self, df: pd.DataFrame, target_column: str = 'Close'):
-        """Prepare data for LSTM model"""
-        # Select features for training
-        features = ['Close', 'Volume', 'MA7', 'MA21', 'MA50', 'Price_Change', 'Volume_Change']
-        data = df[features].values
-        
-        # Scale the data
-        scaled_data = self.scaler.fit_transform(data)
-        
-        # Create sequences
-        X, y = [], []
-        for i in range(self.sequence_length, len(scaled_data)):
-            X.append(scaled_data[i-self.sequence_length:i])
-            y.append(scaled_data[i, 0])  # Predict Close price
-        
-        X, y = np.array(X), np.array(y)
-        
-        return X, y
+    def prepare_data(self, df: pd.DataFrame, target_column: str = 'Close', scaler: MinMaxScaler = None,
+                     last_only: bool = False):
+        """
+        Prepare data for LSTM model
+        An already fitted scaler is reused as-is; otherwise it is fitted on df.
+        With last_only=True only the latest window is built, for inference.
+        """
+        with STAGE_SECONDS.time(stage="prepare_data"):
+            # Select features for training; float32 end to end, as the models compute in it
+            data = df[FEATURES].to_numpy(dtype=np.float32)
+            
+            # Scale the data
+            if scaler is None:
+                scaler = self.scaler
+            if hasattr(scaler, 'n_features_in_'):
+                if last_only:
+                    # Only the rows of the final window are needed
+                    data = data[-self.sequence_length:]
+                scaled_data = scaler.transform(data)
+            else:
+                scaled_data = scaler.fit_transform(data)
+            
+            # Create sequences as strided views (y is the Close price)
+            return make_sequences(scaled_data, self.sequence_length, last_only=last_only)
     
     def build_lstm_model(self, input_shape):
         """Build LSTM neural network model"""
-        if not TENSORFLOW_AVAILABLE:
+        if not tensorflow_available():
             return None
-            
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+        
         model = Sequential([
             LSTM(units=50, return_sequences=True, input_shape=input_shape),
             Dropout(0.2),
@@ -116,10 +139,13 @@ class MLStockPredictor:
         model.compile(optimizer='adam', loss='mean_squared_error')
         return model
     
-    def train_model(self, symbol: str, epochs: int = 50, batch_size: int = 32):
-        """Train the LSTM model on historical data"""
-        if not TENSORFLOW_AVAILABLE:
-            print("TensorFlow not available. Cannot train model.")
+    def train_model(self, symbol: str, epochs: int = 50, batch_size: int = 32, callbacks: list = None):
+        """
+        Train the LSTM model on historical data
+        Extra Keras callbacks (e.g. progress reporting) can be passed in
+        """
+        if not tensorflow_available():
+            logger.warning("TensorFlow not available. Cannot train model.")
             return False
             
         # Fetch data
@@ -127,8 +153,9 @@ class MLStockPredictor:
         if df.empty:
             return False
         
-        # Prepare data
-        X, y = self.prepare_data(df)
+        # Prepare data with a scaler owned by this symbol's model
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        X, y = self.prepare_data(df, scaler=scaler)
         
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(
@@ -136,115 +163,356 @@ class MLStockPredictor:
         )
         
         # Build model
-        self.model = self.build_lstm_model((X_train.shape[1], X_train.shape[2]))
+        model = self.build_lstm_model((X_train.shape[1], X_train.shape[2]))
         
         # Early stopping to prevent overfitting
+        from tensorflow.keras.callbacks import EarlyStopping
         early_stop = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
         
         # Train model
-        print(f"Training model for {symbol}...")
-        self.model.fit(
+        logger.info("Training model for %s...", symbol)
+        model.fit(
             X_train, y_train,
             epochs=epochs,
             batch_size=batch_size,
             validation_data=(X_test, y_test),
-            callbacks=[early_stop],
+            callbacks=[early_stop] + list(callbacks or []),
             verbose=1
         )
         
+        # The validation loss is the baseline later updates are checked against for drift
+        val_loss = float(model.evaluate(X_test, y_test, verbose=0)) if len(X_test) else None
+        
+        # Persist so the model survives restarts and is only used for this symbol;
+        # updates check their exports on the same validation windows, found by target date
+        holdout_from = df.index[self.sequence_length + len(X_train)].date().isoformat() if len(X_test) else ""
+        self.registry.save(symbol, model, scaler, fingerprint_training_data(df, FEATURES),
+                           last_bar=_bar_date(df), val_loss=val_loss, holdout=(X_test, y_test),
+                           holdout_from=holdout_from, holdout_to=_bar_date(df) if holdout_from else "")
+        
         return True
     
-    def predict_next_days(self, symbol: str, days: int = 7):
-        """Predict stock prices for the next N days"""
+    def update_model(self, symbol: str, epochs: int = None, batch_size: int = 32, callbacks: list = None):
+        """
+        Warm-start a symbol's model on daily bars that arrived since it was trained
+        The saved model and scaler are reused and a copy is fine-tuned for a few
+        epochs on the most recent windows (those ending in the new bars plus
+        recent ones replayed to avoid overfitting a handful of samples). Falls
+        back to a full train_model run when there is no usable model or drift
+        is detected. Returns a short description of what was done, or None if
+        it failed.
+        """
+        if not tensorflow_available():
+            logger.warning("TensorFlow not available. Cannot update model.")
+            return None
+        
+        epochs = epochs or settings.ML_UPDATE_EPOCHS
+        entry = self.registry.get(symbol)
+        df = self.fetch_historical_data(symbol)
+        if df.empty:
+            return None
+        
+        reason = self._full_retrain_reason(entry, df)
+        if reason is None:
+            new_bars = int((df.index > pd.Timestamp(entry.last_bar)).sum())
+            if new_bars == 0:
+                return "up to date"
+            
+            X, y = self.prepare_data(df, scaler=entry.scaler)
+            recent = max(new_bars, settings.ML_UPDATE_WINDOWS)
+            X_recent, y_recent = X[-recent:], y[-recent:]
+            
+            # The registry may serve an exported NumPy copy; fine-tuning needs the Keras model
+            keras_model = self.registry.load_keras_model(symbol)
+            if keras_model is None:
+                reason = "no saved Keras model"
+            else:
+                recent_loss = float(keras_model.evaluate(X_recent, y_recent, verbose=0))
+                if recent_loss > settings.ML_DRIFT_LOSS_RATIO * entry.val_loss:
+                    reason = f"recent loss {recent_loss:.2e} vs validation loss {entry.val_loss:.2e}"
+        
+        if reason is not None:
+            logger.info("Full retrain for %s: %s", symbol, reason)
+            if not self.train_model(symbol, batch_size=batch_size, callbacks=callbacks):
+                return None
+            return f"retrained ({reason})"
+        
+        # A fresh copy from disk: predictions keep using the served model until the update is saved
+        from tensorflow.keras.optimizers import Adam
+        model = keras_model
+        model.compile(optimizer=Adam(learning_rate=settings.ML_UPDATE_LEARNING_RATE), loss='mean_squared_error')
+        
+        logger.info("Fine-tuning model for %s on %d new bars...", symbol, new_bars)
+        model.fit(
+            X_recent, y_recent,
+            epochs=epochs,
+            batch_size=batch_size,
+            callbacks=list(callbacks or []),
+            verbose=1
+        )
+        
+        # Keep the full-training validation loss so drift is measured against the same baseline
+        self.registry.save(symbol, model, entry.scaler, fingerprint_training_data(df, FEATURES),
+                           last_bar=_bar_date(df), val_loss=entry.val_loss, mode="update",
+                           holdout=self._update_holdout(entry, df, X, y, fitted=len(X_recent)),
+                           holdout_from=entry.holdout_from, holdout_to=entry.holdout_to)
+        return f"fine-tuned on {new_bars} new bars"
+    
+    def _update_holdout(self, entry, df: pd.DataFrame, X: np.ndarray, y: np.ndarray, fitted: int):
+        """
+        Held-out windows for checking an update's reduced-precision export
+        The last full training's validation windows (by target date), minus
+        the newest `fitted` windows this update fine-tunes on. None when the
+        model predates that record or nothing is left, and float32 is kept.
+        """
+        if not entry.holdout_from:
+            return None
+        targets = df.index[self.sequence_length:]  # Bar each window predicts
+        keep = np.asarray((targets >= pd.Timestamp(entry.holdout_from)) & (targets <= pd.Timestamp(entry.holdout_to)))
+        keep[len(keep) - fitted:] = False
+        if not keep.any():
+            return None
+        return X[keep], y[keep]
+    
+    def train_global_model(self, symbols: list, epochs: int = 30, batch_size: int = None,
+                           embedding_dim: int = None, callbacks: list = None):
+        """
+        Train one shared LSTM on windows pooled from many symbols
+        Each symbol is scaled with its own MinMaxScaler and split 80/20 in time
+        exactly as train_model does, then all symbols' windows form one
+        dataset. With embedding_dim > 0 the model also learns a vector per
+        symbol. Per-symbol models are left untouched.
+        """
+        if not tensorflow_available():
+            logger.warning("TensorFlow not available. Cannot train model.")
+            return False
+        
+        embedding_dim = settings.ML_GLOBAL_EMBEDDING_DIM if embedding_dim is None else embedding_dim
+        batch_size = batch_size or settings.ML_GLOBAL_BATCH_SIZE
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        
+        # Download histories concurrently; the shared rate limiter paces upstream calls
+        with ThreadPoolExecutor(max_workers=settings.IO_WORKERS) as pool:
+            histories = dict(zip(symbols, pool.map(self.fetch_historical_data, symbols)))
+        
+        trained, scalers, train_parts, test_parts = [], {}, [], []
+        for symbol, df in histories.items():
+            if len(df) <= self.sequence_length + 1:
+                logger.info("Skipping %s: not enough history for the shared model", symbol)
+                continue
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            X, y = self.prepare_data(df, scaler=scaler)
+            ids = np.full(len(X), len(trained) + 1, dtype=np.int32)
+            split = int(len(X) * 0.8)  # Same chronological split as train_model
+            train_parts.append((X[:split], y[:split], ids[:split]))
+            test_parts.append((X[split:], y[split:], ids[split:]))
+            scalers[symbol] = scaler
+            trained.append(symbol)
+        if not trained:
+            return False
+        
+        X_train, y_train, ids_train = (np.concatenate(part) for part in zip(*train_parts))
+        X_test, y_test, ids_test = (np.concatenate(part) for part in zip(*test_parts))
+        
+        if embedding_dim:
+            # Relabel a few windows so symbols outside this universe get a trained embedding
+            unknown = np.random.default_rng(0).random(len(ids_train)) < UNKNOWN_ID_RATE
+            ids_train[unknown] = UNKNOWN_SYMBOL_ID
+            model = build_global_model(self.sequence_length, len(FEATURES), len(trained), embedding_dim)
+            train_inputs, test_inputs = [X_train, ids_train], [X_test, ids_test]
+        else:
+            model = self.build_lstm_model((self.sequence_length, len(FEATURES)))
+            train_inputs, test_inputs = X_train, X_test
+            ids_test = None
+        
+        from tensorflow.keras.callbacks import EarlyStopping
+        early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+        
+        logger.info("Training shared model on %d windows from %d symbols...", len(X_train), len(trained))
+        model.fit(
+            train_inputs, y_train,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_data=(test_inputs, y_test),
+            callbacks=[early_stop] + list(callbacks or []),
+            verbose=1
+        )
+        
+        val_loss = float(model.evaluate(test_inputs, y_test, verbose=0)) if len(X_test) else None
+        self.registry.save_global(model, scalers, trained, embedding_dim, val_loss=val_loss,
+                                  holdout=(X_test, y_test, ids_test))
+        return True
+    
+    def _full_retrain_reason(self, entry, df: pd.DataFrame):
+        """Why an update must retrain from scratch instead of fine-tuning, or None"""
+        if entry is None:
+            return "no saved model"
+        if not entry.last_bar or entry.val_loss is None:
+            return "model has no update metadata"
+        
+        new_rows = df[df.index > pd.Timestamp(entry.last_bar)]
+        if len(new_rows) > settings.ML_UPDATE_MAX_NEW_BARS:
+            return f"{len(new_rows)} new bars"
+        if len(new_rows) + self.sequence_length > len(df):
+            return "not enough history before the new bars"
+        
+        # MinMax scaling extrapolates badly once prices leave the range the model was fitted on
+        if len(new_rows):
+            scaled_close = entry.scaler.transform(new_rows[FEATURES].values)[:, 0]
+            margin = settings.ML_DRIFT_PRICE_MARGIN
+            if scaled_close.min() < -margin or scaled_close.max() > 1 + margin:
+                return "price left the fitted scaler range"
+        return None
+    
+    def model_entry(self, symbol: str, df: pd.DataFrame, scope: str = None):
+        """
+        The model serving a symbol for a scope: "symbol" (its own model),
+        "global" (the shared cross-symbol model) or "auto" (its own model if
+        trained, else the shared one). Defaults to ML_MODEL_SCOPE.
+        """
+        scope = scope or settings.ML_MODEL_SCOPE
+        if scope != "global":
+            entry = self.registry.get(symbol)
+            if entry is not None or scope == "symbol":
+                return entry
+        return self.registry.global_entry(symbol, df[FEATURES].to_numpy(dtype=np.float32))
+    
+    def prediction_key(self, symbol: str, df: pd.DataFrame, entry) -> tuple:
+        """(symbol, last bar date, model version) a forecast from df with entry is valid for"""
+        version = "trend" if entry is None else f"{entry.mode}:{entry.trained_at}"
+        return (symbol.upper(), _bar_date(df), version)
+    
+    def predict_next_days(self, symbol: str, days: int = 7, scope: str = None):
+        """
+        Predict stock prices for the next N days
+        Results are memoized in prediction_cache until a new bar or model
+        arrives; a cached longer forecast also serves shorter horizons.
+        """
+        return self._predict(symbol, days, scope)[1]
+    
+    def _predict(self, symbol: str, days: int, scope: str = None):
+        """predict_next_days returning (prediction key, result); the key is None if nothing was cached"""
+        scope = scope or settings.ML_MODEL_SCOPE
         try:
             df = self.fetch_historical_data(symbol)
             if df.empty:
-                return self._fallback_prediction(symbol, days)
-            
-            if TENSORFLOW_AVAILABLE and self.model is None:
-                # Train model if not already trained
-                self.train_model(symbol, epochs=30)
-            
-            if not TENSORFLOW_AVAILABLE or self.model is None:
-                return self._fallback_prediction(symbol, days)
-            
-            # Prepare recent data for prediction
-            X, _ = self.prepare_data(df)
-            last_sequence = X[-1:]
-            
-            predictions = []
-            current_sequence = last_sequence.copy()
-            
-            for _ in range(days):
-                # Predict next day
-                pred = self.model.predict(current_sequence, verbose=0)
-                predictions.append(pred[0, 0])
-                
-                # Update sequence for next prediction
-                new_row = current_sequence[0, -1].copy()
-                new_row[0] = pred[0, 0]  # Update Close price
-                current_sequence = np.append(current_sequence[:, 1:, :], [[new_row]], axis=1)
-            
-            # Inverse transform predictions
-            predictions = np.array(predictions).reshape(-1, 1)
-            dummy = np.zeros((predictions.shape[0], self.scaler.n_features_in_))
-            dummy[:, 0] = predictions[:, 0]
-            predictions = self.scaler.inverse_transform(dummy)[:, 0]
-            
-            return {
-                'symbol': symbol,
-                'predictions': predictions.tolist(),
-                'dates': [(datetime.now() + timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(days)],
-                'method': 'LSTM Neural Network',
-                'confidence': 'High' if len(df) > 500 else 'Medium'
-            }
-            
-        except Exception as e:
-            print(f"Error in ML prediction: {str(e)}")
-            return self._fallback_prediction(symbol, days)
+                return None, self._fallback_prediction(symbol, days, reason="no_history")
+            
+            # Without a model the trend forecast is served now and the model trains in a job
+            entry = self.model_entry(symbol, df, scope)
+            if entry is None and scope != "global":
+                self._queue_training(symbol)
+            
+            key = self.prediction_key(symbol, df, entry)
+            cached = self.prediction_cache.get(key, days)
+            if cached is not None:
+                if entry is None:
+                    ML_FALLBACKS.inc(reason="no_model")
+                return key, cached
+            
+            if entry is None:
+                result = self._fallback_prediction(symbol, days, reason="no_model")
+                self.prediction_cache.put(key, result)
+                return key, result
+            
+            # Prepare recent data for prediction, scaled like the training data
+            last_sequence, _ = self.prepare_data(df, scaler=entry.scaler, last_only=True)
+            
+            # Roll the model forward day by day, feeding back predicted Close prices
+            symbol_ids = None if entry.symbol_id is None else np.array([entry.symbol_id])
+            predictions = AutoregressiveForecaster(entry.model).forecast(last_sequence, days, symbol_ids)
+            
+            result = self._lstm_result(symbol, df, entry, predictions[0])
+            self.prediction_cache.put(key, result)
+            return key, result
+            
+        except Exception:
+            logger.exception("Error in ML prediction for %s", symbol)
+            return None, self._fallback_prediction(symbol, days, reason="error")
     
-    def _fallback_prediction(self, symbol: str, days: int = 7):
-        """Fallback prediction using statistical methods when ML is not available"""
+    def _queue_training(self, symbol: str):
+        """
+        Queue a training job for a symbol served without a model
+        Only once per symbol: a job that already ran (and failed) is not resubmitted.
+        """
+        if not settings.ML_AUTO_TRAIN or not tensorflow_installed():
+            return
+        symbol = symbol.upper()
+        if any(job.symbol == symbol for job in training_jobs.list()):
+            return
+        try:
+            training_jobs.submit(symbol, epochs=30)
+        except JobConflict:
+            pass
+    
+    def _lstm_result(self, symbol: str, df: pd.DataFrame, entry, scaled_predictions: np.ndarray):
+        """Build a prediction result from a model entry's scaled Close predictions"""
+        days = len(scaled_predictions)
+        scaler = entry.scaler
+        
+        # Inverse transform predictions
+        dummy = np.zeros((days, scaler.n_features_in_))
+        dummy[:, 0] = scaled_predictions
+        predictions = scaler.inverse_transform(dummy)[:, 0]
+        
+        return {
+            'symbol': symbol,
+            'predictions': predictions.tolist(),
+            'dates': forecast_dates(days),
+            'method': 'Global LSTM Neural Network' if entry.mode == 'global' else 'LSTM Neural Network',
+            'confidence': 'High' if len(df) >= HIGH_CONFIDENCE_ROWS else 'Medium'
+        }
+    
+    def _fallback_prediction(self, symbol: str, days: int = 7, reason: str = "no_model"):
+        """
+        Fallback prediction using statistical methods when ML is not available
+        reason (no_history, no_model or error) labels the fallback counter.
+        """
+        ML_FALLBACKS.inc(reason=reason)
         try:
             df = self.fetch_historical_data(symbol, period="6mo")
             if df.empty:
                 return None
             
-            # Calculate trend using linear regression
-            recent_prices = df['Close'].tail(30).values
-            X_trend = np.arange(len(recent_prices)).reshape(-1, 1)
-            
-            # Simple linear regression
-            mean_x = X_trend.mean()
-            mean_y = recent_prices.mean()
-            
-            numerator = ((X_trend.flatten() - mean_x) * (recent_prices - mean_y)).sum()
-            denominator = ((X_trend.flatten() - mean_x) ** 2).sum()
-            slope = numerator / denominator
-            intercept = mean_y - slope * mean_x
-            
-            # Predict future prices
-            last_price = df['Close'].iloc[-1]
-            predictions = []
+            return self._trend_prediction(symbol, df, days)
             
-            for i in range(1, days + 1):
-                pred_value = intercept + slope * (len(recent_prices) + i)
-                # Add some volatility based on historical std
-                volatility = df['Close'].pct_change().std()
-                predictions.append(float(pred_value))
-            
-            return {
-                'symbol': symbol,
-                'predictions': predictions,
-                'dates': [(datetime.now() + timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(days)],
-                'method': 'Statistical Trend Analysis',
-                'confidence': 'Medium'
-            }
-            
-        except Exception as e:
-            print(f"Error in fallback prediction: {str(e)}")
+        except Exception:
+            logger.exception("Error in fallback prediction for %s", symbol)
             return None
     
+    def _trend_prediction(self, symbol: str, df: pd.DataFrame, days: int = 7):
+        """Linear-trend forecast from the last 30 closes of df"""
+        # Calculate trend using linear regression
+        recent_prices = df['Close'].tail(30).values
+        X_trend = np.arange(len(recent_prices)).reshape(-1, 1)
+        
+        # Simple linear regression
+        mean_x = X_trend.mean()
+        mean_y = recent_prices.mean()
+        
+        numerator = ((X_trend.flatten() - mean_x) * (recent_prices - mean_y)).sum()
+        denominator = ((X_trend.flatten() - mean_x) ** 2).sum()
+        slope = numerator / denominator
+        intercept = mean_y - slope * mean_x
+        
+        # Predict future prices
+        last_price = df['Close'].iloc[-1]
+        predictions = []
+        
+        for i in range(1, days + 1):
+            pred_value = intercept + slope * (len(recent_prices) + i)
+            # Add some volatility based on historical std
+            volatility = df['Close'].pct_change().std()
+            predictions.append(float(pred_value))
+        
+        return {
+            'symbol': symbol,
+            'predictions': predictions,
+            'dates': forecast_dates(days),
+            'method': 'Statistical Trend Analysis',
+            'confidence': 'Medium'
+        }
+    
     def analyze_stock_ml(self, symbol: str):
         """
         Comprehensive ML analysis of a stock
@@ -255,74 +523,72 @@ class MLStockPredictor:
             if df.empty:
                 return None
             
-            current_price = df['Close'].iloc[-1]
-            
-            # Get predictions
-            prediction_result = self.predict_next_days(symbol, days=7)
+            # Get predictions; an analysis of the same forecast is reused
+            key, prediction_result = self._predict(symbol, 7)
             if not prediction_result:
                 return None
             
-            predictions = prediction_result['predictions']
-            predicted_price = predictions[-1]  # 7-day prediction
-            
-            # Calculate metrics
-            price_change = predicted_price - current_price
-            price_change_pct = (price_change / current_price) * 100
-            
-            # Determine action based on prediction
-            if price_change_pct > 5:
-                action = 'Strong Buy'
-                confidence = 85
-            elif price_change_pct > 2:
-                action = 'Buy'
-                confidence = 70
-            elif price_change_pct > -2:
-                action = 'Hold'
-                confidence = 60
-            elif price_change_pct > -5:
-                action = 'Sell'
-                confidence = 70
-            else:
-                action = 'Strong Sell'
-                confidence = 85
-            
-            # Calculate volatility
-            volatility = df['Close'].pct_change().std() * 100
-            
-            # Generate reasoning
-            reasons = []
-            if price_change_pct > 0:
-                reasons.append(f"ML model predicts {price_change_pct:.1f}% increase")
-            else:
-                reasons.append(f"ML model predicts {abs(price_change_pct):.1f}% decrease")
-            
-            if volatility > 3:
-                reasons.append("high volatility detected")
-            elif volatility < 1:
-                reasons.append("stable price movement")
+            analysis = self.prediction_cache.get_analysis(key) if key else None
+            if analysis is None:
+                analysis = self._score_analysis(symbol, df, prediction_result)
+                if key:
+                    self.prediction_cache.put_analysis(key, analysis)
+            return analysis
             
-            reasons.append(f"analysis based on {len(df)} days of historical data")
-            
-            return {
-                'symbol': symbol,
-                'name': yf.Ticker(symbol).info.get('longName', symbol),
-                'current_price': float(current_price),
-                'predicted_price': float(predicted_price),
-                'price_change': float(price_change),
-                'price_change_percent': float(price_change_pct),
-                'action': action,
-                'confidence': confidence,
-                'reasoning': ', '.join(reasons).capitalize(),
-                'predictions': prediction_result['predictions'][:7],
-                'prediction_dates': prediction_result['dates'][:7],
-                'method': prediction_result['method'],
-                'volatility': float(volatility),
-                'trend': 'Bullish' if price_change_pct > 0 else 'Bearish'
-            }
-            
-        except Exception as e:
-            print(f"Error in ML analysis for {symbol}: {str(e)}")
+        except Exception:
+            logger.exception("Error in ML analysis for %s", symbol)
             return None
+    
+    def _score_analysis(self, symbol: str, df: pd.DataFrame, prediction_result: dict):
+        """Turn a 7-day prediction into an action, confidence and reasoning"""
+        current_price = df['Close'].iloc[-1]
+        predictions = prediction_result['predictions']
+        predicted_price = predictions[-1]  # 7-day prediction
+        
+        # Calculate metrics
+        price_change = predicted_price - current_price
+        price_change_pct = (price_change / current_price) * 100
+        
+        # Determine action based on prediction
+        action, confidence = next(
+            ((action, confidence) for threshold, action, confidence in ACTION_THRESHOLDS
+             if price_change_pct > threshold),
+            ACTION_THRESHOLDS[-1][1:]
+        )
+        
+        # Calculate volatility
+        volatility = df['Close'].pct_change().std() * 100
+        
+        # Generate reasoning
+        reasons = []
+        if price_change_pct > 0:
+            reasons.append(f"ML model predicts {price_change_pct:.1f}% increase")
+        else:
+            reasons.append(f"ML model predicts {abs(price_change_pct):.1f}% decrease")
+        
+        if volatility > 3:
+            reasons.append("high volatility detected")
+        elif volatility < 1:
+            reasons.append("stable price movement")
+        
+        reasons.append(f"analysis based on {len(df)} days of historical data")
+        
+        return {
+            'symbol': symbol,
+            'name': symbol,
+            'current_price': float(current_price),
+            'predicted_price': float(predicted_price),
+            'price_change': float(price_change),
+            'price_change_percent': float(price_change_pct),
+            'action': action,
+            'confidence': confidence,
+            'reasoning': ', '.join(reasons).capitalize(),
+            'predictions': prediction_result['predictions'][:7],
+            'prediction_dates': prediction_result['dates'][:7],
+            'method': prediction_result['method'],
+            'volatility': float(volatility),
+            'trend': 'Bullish' if price_change_pct > 0 else 'Bearish'
+        }
 
 
 # Global predictor instance
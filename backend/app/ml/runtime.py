@@ -0,0 +1,128 @@
+"""
+Lazy loading of the ML stack and readiness tracking
+
+Importing TensorFlow takes seconds and hundreds of MB, so nothing on the
+API import path does it. The predictor and TensorFlow load on first use,
+or earlier from a background warm-up started at application startup.
+With the NumPy inference backend, serving does not need TensorFlow at all
+and only training loads it.
+"""
+import importlib.util
+import logging
+import threading
+import time
+from typing import Dict
+
+from app.core.config import settings
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_tensorflow = None
+_tensorflow_checked = False
+_state = {
+    "tensorflow": PENDING,
+    "predictor": PENDING,
+    "load_seconds": {},
+    "error": None,
+}
+
+
+def load_tensorflow():
+    """
+    Import TensorFlow on first call and return the module, or None if it is not installed
+    Later calls return the cached result without retrying the import.
+    """
+    global _tensorflow, _tensorflow_checked
+    if _tensorflow_checked:
+        return _tensorflow
+
+    with _lock:
+        if not _tensorflow_checked:
+            _state["tensorflow"] = LOADING
+            started = time.perf_counter()
+            try:
+                import tensorflow
+                _tensorflow = tensorflow
+                _state["tensorflow"] = READY
+            except ImportError:
+                logger.warning("TensorFlow not available. Using fallback prediction method.")
+                _state["tensorflow"] = UNAVAILABLE
+            _state["load_seconds"]["tensorflow"] = round(time.perf_counter() - started, 3)
+            _tensorflow_checked = True
+    return _tensorflow
+
+
+def tensorflow_available() -> bool:
+    """Whether TensorFlow can be used (imports it on first call)"""
+    return load_tensorflow() is not None
+
+
+def tensorflow_installed() -> bool:
+    """Whether TensorFlow is installed, without importing it (for processes that only queue training)"""
+    return _tensorflow is not None or importlib.util.find_spec("tensorflow") is not None
+
+
+def get_predictor():
+    """The shared MLStockPredictor, imported and constructed on first use"""
+    if _state["predictor"] != READY:
+        with _lock:
+            if _state["predictor"] != READY:
+                _state["predictor"] = LOADING
+                started = time.perf_counter()
+                try:
+                    from app.ml import predictor
+                except Exception as e:
+                    _state["predictor"] = FAILED
+                    _state["error"] = str(e)
+                    raise
+                _state["predictor"] = READY
+                _state["load_seconds"]["predictor"] = round(time.perf_counter() - started, 3)
+
+    from app.ml.predictor import ml_predictor
+    return ml_predictor
+
+
+def warm_up():
+    """Load the predictor (and TensorFlow, for the Keras backend) ahead of the first ML request"""
+    try:
+        get_predictor()
+        if settings.ML_INFERENCE_BACKEND == "keras":
+            load_tensorflow()
+    except Exception:
+        logger.exception("ML warm-up failed")
+
+
+def start_warm_up() -> threading.Thread:
+    """Run warm_up in a daemon thread so startup and /health are not delayed"""
+    thread = threading.Thread(target=warm_up, name="ml-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict:
+    """
+    Load state of the ML stack
+    Ready once the predictor is loaded and, for the Keras backend,
+    TensorFlow has either loaded or been found missing (the trend forecast
+    still serves requests then). The NumPy backend never waits for it.
+    """
+    tensorflow_state = _state["tensorflow"]
+    backend = settings.ML_INFERENCE_BACKEND
+    ready = _state["predictor"] == READY and (backend != "keras" or tensorflow_state in (READY, UNAVAILABLE))
+    status = {
+        "ready": ready,
+        "predictor": _state["predictor"],
+        "inference_backend": backend,
+        "tensorflow": tensorflow_state,
+        "load_seconds": dict(_state["load_seconds"]),
+    }
+    if _state["error"]:
+        status["error"] = _state["error"]
+    return status
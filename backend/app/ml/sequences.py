@@ -0,0 +1,36 @@
+"""
+Sequence windowing for LSTM inputs built on strided NumPy views
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_sequences(scaled_data: np.ndarray, sequence_length: int, last_only: bool = False):
+    """
+    Window a (rows, features) array into LSTM sequences without copying
+
+    Returns (X, y) where X[i] holds the sequence_length rows before row
+    i + sequence_length and y[i] is the first feature of that row, matching
+    the shapes of the original append-in-a-loop implementation. X is a
+    read-only view into scaled_data.
+
+    With last_only=True only the most recent window (ending at the last
+    row) is returned as X with shape (1, sequence_length, features), and y
+    is empty. This is the input for forecasting beyond the last known bar.
+    """
+    n_rows, n_features = scaled_data.shape
+    empty_X = np.empty((0, sequence_length, n_features), dtype=scaled_data.dtype)
+    empty_y = np.empty(0, dtype=scaled_data.dtype)
+
+    if last_only:
+        if n_rows < sequence_length:
+            return empty_X, empty_y
+        return scaled_data[None, -sequence_length:, :], empty_y
+
+    if n_rows <= sequence_length:
+        return empty_X, empty_y
+
+    # (rows - seq + 1, 1, seq, features) view; drop the window ending at the last row (it has no target)
+    windows = sliding_window_view(scaled_data, (sequence_length, n_features))[:-1, 0]
+    y = scaled_data[sequence_length:, 0]
+    return windows, y
@@ -0,0 +1,141 @@
+"""
+Shape-preserving downsampling of daily bar columns for charts
+
+Two reductions over history store column arrays (date, open, high, low,
+close, volume), both vectorized over buckets:
+
+- "lttb": Largest-Triangle-Three-Buckets on the close line. Keeps whole
+  bars (the first, the last and one per bucket), so peaks and troughs of
+  the close survive.
+- "ohlc": fixed-width bucket aggregation for candles. Each bucket becomes
+  one bar: first date and open, max high, min low, last close, summed
+  volume.
+
+Sequential LTTB picks each bucket's point relative to the point picked in
+the bucket before. lttb_indices runs that step for all buckets at once,
+anchored on the previous pass's picks, and repeats it for the buckets
+whose anchor moved until nothing changes. The fixed point is exactly the
+sequential result (after k passes the first k buckets are final), and
+price series settle in a handful of passes. Series that oscillate at
+about the bucket width can keep moving picks for hundreds of passes, so
+after LTTB_MAX_PASSES the buckets from the first unsettled one on are
+finished in one sequential sweep, which recomputes only the buckets
+whose anchor changed.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "ohlc")
+
+# Vectorized LTTB passes before falling back to a sequential sweep
+LTTB_MAX_PASSES = 8
+
+
+def _buckets(start: int, stop: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Split [start, stop) into count contiguous buckets of near-equal size; returns (starts, ends)"""
+    edges = start + (np.arange(count + 1) * (stop - start)) // count
+    return edges[:-1], edges[1:]
+
+
+def _padded(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(buckets, max bucket size) index matrix and a mask of the real entries"""
+    width = int((ends - starts).max())
+    index = starts[:, None] + np.arange(width)
+    valid = index < ends[:, None]
+    return np.minimum(index, ends[:, None] - 1), valid
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the n_out points LTTB keeps from (x, y), in order; every index when n_out >= len(x)"""
+    n = len(x)
+    if n_out >= n or n < 3:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # The first and last points are always kept; the rest is split into buckets
+    starts, ends = _buckets(1, n - 1, n_out - 2)
+    sizes = ends - starts
+    # reduceat's last segment runs to the end, so leave out the final point
+    mean_x = np.add.reduceat(x[:-1], starts) / sizes
+    mean_y = np.add.reduceat(y[:-1], starts) / sizes
+    # Third triangle vertex: the next bucket's mean (the last point for the last bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    index, valid = _padded(starts, ends)
+    px, py = x[index], y[index]
+
+    def pick(rows, ax, ay):
+        # Twice the triangle area (anchor, candidate, next mean), in the textbook
+        # operation order so near-ties resolve exactly as in sequential LTTB
+        ax, ay = ax[:, None], ay[:, None]
+        area = np.abs((ax - next_x[rows, None]) * (py[rows] - ay) - (ax - px[rows]) * (next_y[rows, None] - ay))
+        area[~valid[rows]] = -1.0
+        return np.take_along_axis(index[rows], area.argmax(axis=1)[:, None], axis=1)[:, 0]
+
+    def pick_one(row, anchor):
+        # pick for a single bucket, same operation order
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs((ax - next_x[row]) * (py[row] - ay) - (ax - px[row]) * (next_y[row] - ay))
+        area[~valid[row]] = -1.0
+        return index[row, area.argmax()]
+
+    # First pass anchored on each previous bucket's mean, then only the
+    # buckets whose left neighbour's pick changed are recomputed
+    everything = slice(None)
+    picked = pick(everything, np.concatenate(([x[0]], mean_x[:-1])), np.concatenate(([y[0]], mean_y[:-1])))
+    used = np.full(len(starts), -1)
+    used[0] = 0
+    for _ in range(LTTB_MAX_PASSES):
+        current = np.concatenate(([0], picked[:-1]))
+        rows = np.flatnonzero(current != used)
+        if len(rows) == 0:
+            break
+        # Past about half the rows, a full pass is cheaper than gathering them
+        if len(rows) > len(starts) // 2:
+            rows = everything
+        used[rows] = current[rows]
+        picked[rows] = pick(rows, x[current[rows]], y[current[rows]])
+    else:
+        # Still unsettled: every bucket before the first changed anchor is final
+        current = np.concatenate(([0], picked[:-1]))
+        unsettled = np.flatnonzero(current != used)
+        if len(unsettled):
+            anchor = int(current[unsettled[0]])
+            for row in range(int(unsettled[0]), len(starts)):
+                if used[row] != anchor:
+                    used[row] = anchor
+                    picked[row] = pick_one(row, anchor)
+                anchor = int(picked[row])
+    return np.concatenate(([0], picked, [n - 1]))
+
+
+def ohlc_buckets(columns: Dict[str, np.ndarray], n_out: int) -> Dict[str, np.ndarray]:
+    """Aggregate bars into n_out candles (the columns unchanged when there are no more bars than that)"""
+    n = len(columns["date"])
+    if n_out >= n:
+        return columns
+    starts, ends = _buckets(0, n, n_out)
+    return {
+        "date": np.asarray(columns["date"])[starts],
+        "open": np.asarray(columns["open"])[starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": np.asarray(columns["close"])[ends - 1],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+
+def downsample(columns: Dict[str, np.ndarray], max_points: int, method: str = "lttb") -> Dict[str, np.ndarray]:
+    """Reduce history columns to at most max_points bars with the given method"""
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if len(columns["date"]) <= max_points:
+        return columns
+    if method == "ohlc":
+        return ohlc_buckets(columns, max_points)
+    keep = lttb_indices(columns["date"].astype(np.int64), columns["close"], max_points)
+    return {column: np.asarray(values)[keep] for column, values in columns.items()}
@@ -0,0 +1,216 @@
+"""
+Local columnar store for daily OHLCV history
+
+Each symbol is a directory with one raw little-endian array file per column
+(date, open, high, low, close, volume). Files are append-only and read
+through np.memmap, so a date-range read only touches the pages it needs and
+never loads the full history into pandas.
+"""
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+DATE_COLUMN = "date"
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+COLUMN_DTYPES = {
+    DATE_COLUMN: np.dtype("<i8"),  # Days since 1970-01-01
+    **{column: np.dtype("<f8") for column in PRICE_COLUMNS},
+}
+
+# Alpha Vantage daily column names -> store column names
+ALPHA_VANTAGE_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+}
+
+_SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-^]{1,15}$")
+
+# A session's daily bar is published after the US close; allow the provider some slack
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+SESSION_CLOSE = (16, 30)  # Hour and minute, New York time
+
+
+def _to_days(values) -> np.ndarray:
+    """Convert dates to int64 days since the epoch"""
+    return np.asarray(values, dtype="datetime64[D]").astype(np.int64)
+
+
+def last_session(now: Optional[datetime] = None) -> date:
+    """
+    Date of the newest weekday session whose daily bar should be available
+    Today once it is past SESSION_CLOSE in New York, else the weekday
+    before. Exchange holidays are not known here (see HistoryStore.sync).
+    """
+    now = now or datetime.now(MARKET_TIMEZONE)
+    today = np.datetime64(now.date(), "D")
+    if np.is_busday(today) and (now.hour, now.minute) >= SESSION_CLOSE:
+        return now.date()
+    return np.busday_offset(today, -1, roll="forward").astype(date)
+
+
+class HistoryStore:
+    """Append-only, memory-mapped daily bars per symbol"""
+
+    def __init__(self, root: str, sync_interval: float = 900):
+        self.root = root
+        self.sync_interval = sync_interval  # Seconds between upstream checks of a symbol that is behind
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._checked: Dict[str, float] = {}  # Symbol -> monotonic time of its last upstream check
+
+    def _symbol_dir(self, symbol: str) -> str:
+        symbol = symbol.upper()
+        if not _SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol for history storage: {symbol}")
+        return os.path.join(self.root, symbol)
+
+    def _lock_for(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol.upper(), threading.Lock())
+
+    def _column_path(self, symbol: str, column: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), f"{column}.bin")
+
+    def symbols(self):
+        """All symbols with stored history"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if _SYMBOL_PATTERN.match(name) and self.length(name) > 0
+        )
+
+    def length(self, symbol: str) -> int:
+        """Number of complete bars stored for a symbol"""
+        lengths = []
+        for column, dtype in COLUMN_DTYPES.items():
+            path = self._column_path(symbol, column)
+            if not os.path.exists(path):
+                return 0
+            lengths.append(os.path.getsize(path) // dtype.itemsize)
+        # A crash mid-append can leave columns of different lengths; trust the shortest
+        return min(lengths)
+
+    def _column(self, symbol: str, column: str, length: int) -> np.ndarray:
+        if length == 0:
+            return np.empty(0, dtype=COLUMN_DTYPES[column])
+        return np.memmap(self._column_path(symbol, column), dtype=COLUMN_DTYPES[column],
+                         mode="r", shape=(length,))
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        """Date of the newest stored bar, or None if nothing is stored"""
+        length = self.length(symbol)
+        if length == 0:
+            return None
+        days = self._column(symbol, DATE_COLUMN, length)[-1]
+        return np.datetime64(int(days), "D").astype(date)
+
+    def append(self, symbol: str, df: pd.DataFrame) -> int:
+        """
+        Append bars newer than the last stored date
+        df is indexed by date with open/high/low/close/volume columns (any case).
+        Returns the number of bars written.
+        """
+        if df.empty:
+            return 0
+        df = df.rename(columns=str.lower).sort_index()
+        days = _to_days(df.index.values)
+
+        with self._lock_for(symbol):
+            length = self.length(symbol)
+            if length:
+                last = self._column(symbol, DATE_COLUMN, length)[-1]
+                keep = days > last
+                df, days = df[keep], days[keep]
+            if len(days) == 0:
+                return 0
+
+            os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+            columns = {DATE_COLUMN: days}
+            columns.update({column: df[column].to_numpy() for column in PRICE_COLUMNS})
+            for column, values in columns.items():
+                path = self._column_path(symbol, column)
+                # Drop any partial tail left by an interrupted append before writing
+                if os.path.exists(path):
+                    with open(path, "r+b") as f:
+                        f.truncate(length * COLUMN_DTYPES[column].itemsize)
+                with open(path, "ab") as f:
+                    f.write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[column]).tobytes())
+            return len(days)
+
+    def read(self, symbol: str, start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        Read bars with start <= date <= end as read-only column arrays
+        The date column is returned as datetime64[D]; either bound may be None.
+        """
+        length = self.length(symbol)
+        dates = self._column(symbol, DATE_COLUMN, length)
+        lo = 0 if start is None else int(np.searchsorted(dates, _to_days(start), side="left"))
+        hi = length if end is None else int(np.searchsorted(dates, _to_days(end), side="right"))
+
+        result = {DATE_COLUMN: np.asarray(dates[lo:hi]).astype("datetime64[D]")}
+        for column in PRICE_COLUMNS:
+            result[column] = self._column(symbol, column, length)[lo:hi]
+        return result
+
+    def read_frame(self, symbol: str, start=None, end=None) -> pd.DataFrame:
+        """Read a date range as a DataFrame with Open/High/Low/Close/Volume columns"""
+        columns = self.read(symbol, start, end)
+        return pd.DataFrame(
+            {column.capitalize(): np.array(columns[column]) for column in PRICE_COLUMNS},
+            index=pd.DatetimeIndex(columns[DATE_COLUMN], name="date")
+        )
+
+    def sync(self, symbol: str, fetch_daily: Callable[[str], pd.DataFrame]) -> int:
+        """
+        Bring a symbol up to date from a market data provider's daily fetcher
+        fetch_daily(outputsize) returns a frame with open ... volume columns
+        (Alpha Vantage '1. open' style names are accepted too). Only the
+        compact (last 100 bars) series is requested once the symbol has
+        recent history stored.
+
+        Nothing is fetched while the store holds the last completed session.
+        Otherwise a symbol is checked upstream at most once per
+        sync_interval, which also bounds the calls made on exchange holidays,
+        when the expected bar never arrives. Only completed checks count: if
+        fetch_daily raises, the next call tries again.
+        """
+        last = self.last_date(symbol)
+        if last is not None and last >= last_session():
+            return 0
+        symbol = symbol.upper()
+        checked = self._checked.get(symbol)
+        if checked is not None and time.monotonic() - checked < self.sync_interval:
+            return 0
+        # Marked before fetching so concurrent callers do not fetch the same symbol too
+        self._checked[symbol] = time.monotonic()
+
+        # Compact covers ~100 trading days; anything older needs the full series
+        compact_ok = last is not None and np.busday_count(last, date.today()) < 95
+        try:
+            data = fetch_daily("compact" if compact_ok else "full")
+        except Exception:
+            if checked is None:
+                self._checked.pop(symbol, None)
+            else:
+                self._checked[symbol] = checked
+            raise
+        if data is None or data.empty:
+            return 0
+        return self.append(symbol, data.rename(columns=ALPHA_VANTAGE_COLUMNS)[list(PRICE_COLUMNS)])
+
+
+# Shared store used by the market service and the ML predictor
+history_store = HistoryStore(settings.HISTORY_DIR, sync_interval=settings.HISTORY_SYNC_INTERVAL)
@@ -0,0 +1,455 @@
+"""
+Market data providers shared by the market service and the ML predictor
+
+A provider returns quotes as the dicts served by /market/stock and daily
+bars as frames indexed by date with open/high/low/close/volume columns.
+The live provider calls Alpha Vantage under the shared rate limiter; the
+replay provider serves recorded or synthetic data from local files at a
+configurable latency and error rate, for load tests and benchmarks that
+must not use the live quota.
+"""
+import abc
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.core.executors import io_executor, run_in_executor
+from app.core.metrics import RATE_LIMIT_NOTES, STAGE_SECONDS, UPSTREAM_CALLS
+from app.services.rate_limiter import alpha_vantage_limiter
+
+# Longest a daily-bars fetch waits for a rate-limit token (quotes use settings.QUOTE_RATE_LIMIT_WAIT)
+RATE_LIMIT_TIMEOUT = 30
+
+# Bars returned for outputsize="compact", as Alpha Vantage does
+COMPACT_BARS = 100
+
+DAILY_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+_SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-^]{1,15}$")
+
+# Alpha Vantage answers over-quota calls with a "Note" or "Information" message instead of data
+_RATE_LIMIT_MESSAGE = re.compile(r"call frequency|rate limit|requests per day|calls per minute", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataError(Exception):
+    """An upstream call failed (transport error, bad response or injected replay failure)"""
+
+    outcome = "error"  # Outcome label on upstream_calls_total
+
+
+class RateLimitedError(MarketDataError):
+    """The upstream API refused the call because the quota is used up"""
+
+    outcome = "rate_limited"
+
+
+class ThrottledError(MarketDataError):
+    """No rate-limiter token came free in time, so the call was never sent"""
+
+    outcome = "throttled"
+
+
+def _outcome(result) -> str:
+    if result is None or (isinstance(result, pd.DataFrame) and result.empty):
+        return "empty"
+    return "ok"
+
+
+def upstream_call(kind: str):
+    """Decorator timing a provider method (stage upstream_fetch) and counting its outcome"""
+    def decorate(method):
+        def record(provider, started: float, outcome: str):
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="upstream_fetch")
+            UPSTREAM_CALLS.inc(provider=provider.name, kind=kind, outcome=outcome)
+
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await method(self, *args, **kwargs)
+                except Exception as e:
+                    record(self, started, getattr(e, "outcome", "error"))
+                    raise
+                record(self, started, _outcome(result))
+                return result
+        else:
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = method(self, *args, **kwargs)
+                except Exception as e:
+                    record(self, started, getattr(e, "outcome", "error"))
+                    raise
+                record(self, started, _outcome(result))
+                return result
+        return wrapper
+    return decorate
+
+
+class MarketDataProvider(abc.ABC):
+    """Interface implemented by every market data backend"""
+
+    name = "unknown"  # Provider label on upstream metrics
+
+    @abc.abstractmethod
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        """Current quote for a symbol, or None if the provider has no data for it"""
+
+    async def get_quote_async(self, symbol: str) -> Optional[Dict]:
+        """Async get_quote; the default runs get_quote on the I/O executor"""
+        return await run_in_executor(io_executor, self.get_quote, symbol)
+
+    @abc.abstractmethod
+    def get_daily(self, symbol: str, outputsize: str = "compact") -> pd.DataFrame:
+        """Daily bars, "compact" (last 100) or "full", indexed by date"""
+
+    async def aclose(self):
+        """Release pooled connections"""
+
+
+def _rate_limited(symbol: str, message: str) -> RateLimitedError:
+    RATE_LIMIT_NOTES.inc(provider=AlphaVantageProvider.name)
+    logger.warning("Alpha Vantage rate limit for %s: %s", symbol, message)
+    return RateLimitedError(f"Alpha Vantage rate limit for {symbol}: {message}")
+
+
+def parse_global_quote(symbol: str, data: Dict) -> Optional[Dict]:
+    """
+    Convert an Alpha Vantage GLOBAL_QUOTE response into a quote dict
+    Raises RateLimitedError for a "Note" or "Information" response.
+    """
+    # Check for API error messages
+    if "Error Message" in data:
+        logger.error("Alpha Vantage error for %s: %s", symbol, data["Error Message"])
+        return None
+
+    for field in ("Note", "Information"):
+        if field in data:
+            raise _rate_limited(symbol, data[field])
+
+    if "Global Quote" not in data or not data["Global Quote"]:
+        logger.warning("No data returned for %s. Response: %s", symbol, data)
+        return None
+
+    quote = data["Global Quote"]
+
+    # Check if quote is empty
+    if not quote or "05. price" not in quote:
+        logger.warning("Empty quote data for %s", symbol)
+        return None
+
+    current_price = float(quote.get("05. price", 0))
+    open_price = float(quote.get("02. open", 0))
+    change = float(quote.get("09. change", 0))
+    change_percent_str = quote.get("10. change percent", "0%").replace("%", "")
+    change_percent = float(change_percent_str)
+
+    result = {
+        "symbol": symbol.upper(),
+        "name": symbol.upper(),  # Will use symbol as name to save API calls
+        "price": round(current_price, 2),
+        "change": round(change, 2),
+        "changePercent": round(change_percent, 2),
+        "open": round(open_price, 2),
+        "high": round(float(quote.get("03. high", 0)), 2),
+        "low": round(float(quote.get("04. low", 0)), 2),
+        "volume": int(quote.get("06. volume", 0)),
+        "marketCap": None,  # Market cap requires extra API call
+        "timestamp": datetime.now().isoformat()
+    }
+
+    logger.debug("Fetched quote for %s: $%s", symbol, current_price)
+    return result
+
+
+class AlphaVantageProvider(MarketDataProvider):
+    """Live Alpha Vantage data; every call takes a token from the shared rate limiter first"""
+
+    name = "alphavantage"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or os.getenv("ALPHA_VANTAGE_API_KEY", "UP4DUV2FAQA27ENY")
+        self.base_url = "https://www.alphavantage.co/query"
+
+        # Pooled keep-alive connections shared by all quote fetches
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.QUOTE_FETCH_WORKERS)
+        self.session.mount("https://", adapter)
+
+        self._ts = None
+        # Created lazily inside the event loop by get_quote_async
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop = None
+
+    def _quote_params(self, symbol: str) -> Dict:
+        return {
+            "function": "GLOBAL_QUOTE",
+            "symbol": symbol,
+            "apikey": self.api_key
+        }
+
+    @upstream_call("quote")
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        # Wait for the shared rate limiter before calling upstream
+        if not alpha_vantage_limiter.acquire(timeout=settings.QUOTE_RATE_LIMIT_WAIT):
+            raise ThrottledError(f"Rate limiter timeout for {symbol}")
+        response = self.session.get(self.base_url, params=self._quote_params(symbol), timeout=10)
+        return parse_global_quote(symbol, response.json())
+
+    @upstream_call("quote")
+    async def get_quote_async(self, symbol: str) -> Optional[Dict]:
+        if not await alpha_vantage_limiter.acquire_async(timeout=settings.QUOTE_RATE_LIMIT_WAIT):
+            raise ThrottledError(f"Rate limiter timeout for {symbol}")
+        response = await self._get_async_client().get(self.base_url, params=self._quote_params(symbol))
+        return parse_global_quote(symbol, response.json())
+
+    @upstream_call("daily")
+    def get_daily(self, symbol: str, outputsize: str = "compact") -> pd.DataFrame:
+        if self._ts is None:
+            from alpha_vantage.timeseries import TimeSeries
+            self._ts = TimeSeries(key=self.api_key, output_format='pandas')
+        if not alpha_vantage_limiter.acquire(timeout=RATE_LIMIT_TIMEOUT):
+            raise ThrottledError(f"Rate limiter timeout for {symbol} daily bars")
+        try:
+            data = self._ts.get_daily(symbol=symbol, outputsize=outputsize)[0]
+        except ValueError as e:
+            # alpha_vantage raises ValueError with the text of a Note/Information response
+            if _RATE_LIMIT_MESSAGE.search(str(e)):
+                raise _rate_limited(symbol, str(e)) from e
+            raise
+        # '1. open' ... '5. volume' -> open ... volume
+        return data.rename(columns=lambda column: column.split(". ", 1)[-1])[DAILY_COLUMNS]
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Pooled async HTTP client, created on first use in the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=10,
+                limits=httpx.Limits(max_connections=settings.QUOTE_FETCH_WORKERS)
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+def _replay_path(root: str, kind: str, symbol: str, extension: str) -> str:
+    symbol = symbol.upper()
+    if not _SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f"Invalid symbol for replay storage: {symbol}")
+    return os.path.join(root, kind, f"{symbol}.{extension}")
+
+
+@lru_cache(maxsize=8)
+def _business_days(end: date, bars: int) -> pd.DatetimeIndex:
+    # bdate_range(end=..., periods=...) takes ~100 ms, so share it across symbols
+    return pd.bdate_range(end=end, periods=bars, name="date")
+
+
+def synthetic_daily(symbol: str, bars: int = 5000, end: date = None) -> pd.DataFrame:
+    """Deterministic random-walk daily bars for a symbol, ending at the last business day"""
+    rng = np.random.default_rng(zlib.crc32(symbol.upper().encode()))
+    index = _business_days(end or date.today(), bars)
+    close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.018, bars)))
+    open_ = close * (1 + rng.normal(0, 0.005, bars))
+    spread = np.abs(rng.normal(0, 0.01, bars))
+    return pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + spread),
+        "low": np.minimum(open_, close) * (1 - spread),
+        "close": close,
+        "volume": rng.integers(1_000_000, 50_000_000, bars).astype(np.float64),
+    }, index=index)
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded data from local files, or synthetic data when nothing is recorded
+
+    Daily bars are read from <root>/daily/<SYMBOL>.csv and quotes from
+    <root>/quotes/<SYMBOL>.json (the layout RecordingProvider writes).
+    With synthetic=True, symbols without recordings get deterministic
+    random-walk bars and a quote derived from their last two bars. Every
+    call waits `latency` seconds and fails with probability `error_rate`.
+    """
+
+    name = "replay"
+
+    def __init__(self, root: str, latency: float = 0.0, error_rate: float = 0.0,
+                 synthetic: bool = True, seed: int = 0):
+        self.root = root
+        self.latency = latency
+        self.error_rate = error_rate
+        self.synthetic = synthetic
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._daily: Dict[str, pd.DataFrame] = {}
+        self.calls = 0
+
+    def _maybe_fail(self, symbol: str):
+        with self._random_lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise MarketDataError(f"Injected replay failure for {symbol}")
+
+    @upstream_call("quote")
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail(symbol)
+        return self._quote(symbol)
+
+    @upstream_call("quote")
+    async def get_quote_async(self, symbol: str) -> Optional[Dict]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._maybe_fail(symbol)
+        return self._quote(symbol)
+
+    @upstream_call("daily")
+    def get_daily(self, symbol: str, outputsize: str = "compact") -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail(symbol)
+        daily = self._load_daily(symbol)
+        if daily is None:
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+        return daily.tail(COMPACT_BARS) if outputsize == "compact" else daily
+
+    def _load_daily(self, symbol: str) -> Optional[pd.DataFrame]:
+        symbol = symbol.upper()
+        daily = self._daily.get(symbol)
+        if daily is None:
+            path = _replay_path(self.root, "daily", symbol, "csv")
+            if os.path.exists(path):
+                daily = pd.read_csv(path, index_col="date", parse_dates=["date"])[DAILY_COLUMNS]
+            elif self.synthetic:
+                daily = synthetic_daily(symbol)
+            else:
+                return None
+            self._daily[symbol] = daily
+        return daily
+
+    def _quote(self, symbol: str) -> Optional[Dict]:
+        symbol = symbol.upper()
+        path = _replay_path(self.root, "quotes", symbol, "json")
+        if os.path.exists(path):
+            with open(path) as f:
+                quote = json.load(f)
+            return {**quote, "timestamp": datetime.now().isoformat()}
+
+        daily = self._load_daily(symbol)
+        if daily is None or len(daily) < 2:
+            return None
+        last, previous = daily.iloc[-1], daily.iloc[-2]
+        change = last["close"] - previous["close"]
+        return {
+            "symbol": symbol,
+            "name": symbol,
+            "price": round(float(last["close"]), 2),
+            "change": round(float(change), 2),
+            "changePercent": round(float(change / previous["close"] * 100), 2),
+            "open": round(float(last["open"]), 2),
+            "high": round(float(last["high"]), 2),
+            "low": round(float(last["low"]), 2),
+            "volume": int(last["volume"]),
+            "marketCap": None,
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+class RecordingProvider(MarketDataProvider):
+    """Passes calls to another provider and saves each response in the replay layout"""
+
+    def __init__(self, inner: MarketDataProvider, root: str):
+        self.inner = inner
+        self.root = root
+
+    def _write(self, kind: str, symbol: str, extension: str, write):
+        path = _replay_path(self.root, kind, symbol, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _record_quote(self, symbol: str, quote: Optional[Dict]):
+        if quote:
+            def write(path):
+                with open(path, "w") as f:
+                    json.dump(quote, f)
+            self._write("quotes", symbol, "json", write)
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        quote = self.inner.get_quote(symbol)
+        self._record_quote(symbol, quote)
+        return quote
+
+    async def get_quote_async(self, symbol: str) -> Optional[Dict]:
+        quote = await self.inner.get_quote_async(symbol)
+        self._record_quote(symbol, quote)
+        return quote
+
+    def get_daily(self, symbol: str, outputsize: str = "compact") -> pd.DataFrame:
+        daily = self.inner.get_daily(symbol, outputsize)
+        if not daily.empty:
+            path = _replay_path(self.root, "daily", symbol, "csv")
+            if os.path.exists(path):
+                # Keep bars recorded earlier (e.g. a full series before compact refreshes)
+                recorded = pd.read_csv(path, index_col="date", parse_dates=["date"])
+                merged = pd.concat([recorded, daily])
+                daily_to_save = merged[~merged.index.duplicated(keep="last")].sort_index()
+            else:
+                daily_to_save = daily.sort_index()
+            daily_to_save.index.name = "date"
+            self._write("daily", symbol, "csv", lambda tmp: daily_to_save.to_csv(tmp, float_format="%.17g"))
+        return daily
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def create_provider() -> MarketDataProvider:
+    """Provider selected by MARKET_DATA_PROVIDER ("alphavantage" or "replay")"""
+    if settings.MARKET_DATA_PROVIDER == "replay":
+        return ReplayProvider(
+            settings.MARKET_DATA_REPLAY_DIR,
+            latency=settings.MARKET_DATA_REPLAY_LATENCY,
+            error_rate=settings.MARKET_DATA_REPLAY_ERROR_RATE,
+            synthetic=settings.MARKET_DATA_REPLAY_SYNTHETIC
+        )
+    if settings.MARKET_DATA_PROVIDER != "alphavantage":
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {settings.MARKET_DATA_PROVIDER}")
+    provider = AlphaVantageProvider()
+    if settings.MARKET_DATA_RECORD:
+        return RecordingProvider(provider, settings.MARKET_DATA_REPLAY_DIR)
+    return provider
+
+
+# Shared provider used by the market service and the ML predictor
+market_data = create_provider()
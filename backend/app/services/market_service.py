@@ -1,154 +1,345 @@
-from alpha_vantage.timeseries import TimeSeries
-import requests
-import os
+import asyncio
+import logging
+import threading
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
+from app.core.config import settings
+from app.core.executors import io_executor, run_in_executor
+from app.core.profiling import ProfiledThreadPoolExecutor
+from app.services.downsampling import downsample
+from app.services.history_store import history_store
+from app.services.market_data import MarketDataProvider, market_data
+from app.services.quote_cache import QuoteCache
+from app.services.symbol_index import SymbolIndex, load_listing
+
+# Calendar span of each history period; None means all stored history
+HISTORY_PERIODS = {
+    "1d": timedelta(days=1),
+    "5d": timedelta(days=5),
+    "1mo": timedelta(days=31),
+    "3mo": timedelta(days=92),
+    "6mo": timedelta(days=183),
+    "1y": timedelta(days=366),
+    "2y": timedelta(days=731),
+    "5y": timedelta(days=1827),
+    "10y": timedelta(days=3653),
+    "max": None,
+}
+
+# Response field -> history store column; prices are rounded to cents
+HISTORY_FIELDS = (("open", "open"), ("high", "high"), ("low", "low"), ("close", "close"))
+
+logger = logging.getLogger(__name__)
+
+
+def round_cents(values) -> np.ndarray:
+    """
+    Round to two decimals exactly like round(float(x), 2), for whole arrays
+    np.round scales by 100 first, so values within float error of a half
+    cent (344.185 and the like, common in 3-4 decimal quotes) can round the
+    other way. Those are decided against the exact decimal midpoint: by
+    float comparison, or, when the value is the double nearest to the
+    midpoint, by comparing its integer mantissa with the midpoint
+    (half-even on exact ties, as Python does).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near) == 0:
+        return rounded
+    
+    x = values[near]
+    cents = np.floor(scaled[near])
+    midpoint = (2 * cents + 1) / 200  # Nearest double to the exact midpoint
+    up = x > midpoint
+    tie = x == midpoint
+    if tie.any():
+        # x = mantissa * 2**-shift exactly; compare with (2 * cents + 1) / 200 in integers
+        fraction, exponent = np.frexp(x[tie])
+        mantissa = (fraction * 2.0 ** 53).astype(np.int64)
+        shift = 53 - exponent.astype(np.int64)
+        odd = (2 * cents[tie] + 1).astype(np.int64)
+        above = np.sign(mantissa * 200 - np.left_shift(odd, shift))
+        up[tie] = (above > 0) | ((above == 0) & (cents[tie] % 2 == 1))
+    rounded[near] = (cents + up) / 100
+    return rounded
+
+
+def history_payload(columns: Dict[str, np.ndarray]) -> Dict[str, object]:
+    """
+    Columnar history payload from history store column arrays
+    Built with whole-array operations: ISO date strings, prices rounded to two
+    decimals (as round() would) and integer volumes, all as arrays of equal
+    length (plain ndarrays, not the store's memmaps).
+    """
+    payload = {"dates": np.datetime_as_string(columns["date"], unit="D").tolist()}
+    for field, column in HISTORY_FIELDS:
+        payload[field] = round_cents(columns[column])
+    payload["volume"] = np.asarray(columns["volume"]).astype(np.int64)
+    return payload
+
+
+# Popular ETFs used as proxies for the major indices
+MARKET_INDICES = {
+    "SPY": "S&P 500",
+    "QQQ": "NASDAQ-100",
+    "DIA": "DOW JONES"
+}
+
+# Popular stocks to show as "trending" - reduced to 5 to avoid rate limits
+TRENDING_SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
+
+# Reduced list of popular stocks to avoid rate limits
+MOVER_SYMBOLS = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", 
+    "NVDA", "META", "NFLX", "DIS", "BA"
+]
+
+# Popular stocks, indexed ahead of any SYMBOL_LISTING_FILE entries so they rank first
+COMMON_STOCKS = {
+    # Tech Giants
+    "AAPL": "Apple Inc.",
+    "GOOGL": "Alphabet Inc.",
+    "GOOG": "Alphabet Inc. Class C",
+    "MSFT": "Microsoft Corporation",
+    "AMZN": "Amazon.com Inc.",
+    "META": "Meta Platforms Inc.",
+    "NVDA": "NVIDIA Corporation",
+    "TSLA": "Tesla Inc.",
+    "AMD": "Advanced Micro Devices",
+    "INTC": "Intel Corporation",
+    "CRM": "Salesforce Inc.",
+    "ORCL": "Oracle Corporation",
+    "ADBE": "Adobe Inc.",
+    "NFLX": "Netflix Inc.",
+    "AVGO": "Broadcom Inc.",
+    
+    # Financial
+    "JPM": "JPMorgan Chase & Co.",
+    "BAC": "Bank of America Corp",
+    "WFC": "Wells Fargo & Company",
+    "GS": "Goldman Sachs Group",
+    "MS": "Morgan Stanley",
+    "C": "Citigroup Inc.",
+    "BLK": "BlackRock Inc.",
+    "AXP": "American Express Company",
+    "V": "Visa Inc.",
+    "MA": "Mastercard Inc.",
+    "PYPL": "PayPal Holdings Inc.",
+    "BRK.B": "Berkshire Hathaway Inc.",
+    "SQ": "Block Inc.",
+    "COIN": "Coinbase Global Inc.",
+    
+    # Retail & Consumer
+    "WMT": "Walmart Inc.",
+    "COST": "Costco Wholesale Corp",
+    "HD": "The Home Depot Inc.",
+    "TGT": "Target Corporation",
+    "LOW": "Lowe's Companies Inc.",
+    "NKE": "Nike Inc.",
+    "SBUX": "Starbucks Corporation",
+    "MCD": "McDonald's Corporation",
+    "DIS": "The Walt Disney Company",
+    "CMCSA": "Comcast Corporation",
+    
+    # Healthcare & Pharma
+    "JNJ": "Johnson & Johnson",
+    "UNH": "UnitedHealth Group",
+    "PFE": "Pfizer Inc.",
+    "ABBV": "AbbVie Inc.",
+    "TMO": "Thermo Fisher Scientific",
+    "ABT": "Abbott Laboratories",
+    "MRK": "Merck & Co. Inc.",
+    "LLY": "Eli Lilly and Company",
+    "BMY": "Bristol-Myers Squibb",
+    "AMGN": "Amgen Inc.",
+    
+    # Industrial & Manufacturing
+    "BA": "Boeing Company",
+    "GE": "General Electric Company",
+    "CAT": "Caterpillar Inc.",
+    "MMM": "3M Company",
+    "HON": "Honeywell International",
+    "UPS": "United Parcel Service",
+    "FDX": "FedEx Corporation",
+    "LMT": "Lockheed Martin Corp",
+    "RTX": "Raytheon Technologies",
+    
+    # Automotive
+    "F": "Ford Motor Company",
+    "GM": "General Motors Company",
+    "RIVN": "Rivian Automotive Inc.",
+    "LCID": "Lucid Group Inc.",
+    
+    # Energy
+    "XOM": "Exxon Mobil Corporation",
+    "CVX": "Chevron Corporation",
+    "COP": "ConocoPhillips",
+    "SLB": "Schlumberger Limited",
+    "EOG": "EOG Resources Inc.",
+    
+    # Communications & Social
+    "T": "AT&T Inc.",
+    "VZ": "Verizon Communications",
+    "TMUS": "T-Mobile US Inc.",
+    "SNAP": "Snap Inc.",
+    "SPOT": "Spotify Technology",
+    "UBER": "Uber Technologies",
+    "LYFT": "Lyft Inc.",
+    "DASH": "DoorDash Inc.",
+    
+    # Semiconductors
+    "TSM": "Taiwan Semiconductor",
+    "ASML": "ASML Holding N.V.",
+    "QCOM": "QUALCOMM Inc.",
+    "TXN": "Texas Instruments",
+    "MU": "Micron Technology",
+    
+    # Software & Cloud
+    "NOW": "ServiceNow Inc.",
+    "SNOW": "Snowflake Inc.",
+    "DDOG": "Datadog Inc.",
+    "ZM": "Zoom Video Communications",
+    "TEAM": "Atlassian Corporation",
+    "WDAY": "Workday Inc.",
+    "PLTR": "Palantir Technologies",
+    
+    # E-commerce & Payments
+    "SHOP": "Shopify Inc.",
+    "EBAY": "eBay Inc.",
+    "BABA": "Alibaba Group",
+    "PDD": "PDD Holdings Inc.",
+    
+    # Gaming & Entertainment
+    "RBLX": "Roblox Corporation",
+    "EA": "Electronic Arts Inc.",
+    "ATVI": "Activision Blizzard",
+    "TTWO": "Take-Two Interactive",
+    "ROKU": "Roku Inc.",
+    
+    # Consumer Goods
+    "PG": "Procter & Gamble Co.",
+    "KO": "The Coca-Cola Company",
+    "PEP": "PepsiCo Inc.",
+    "PM": "Philip Morris International",
+    "CL": "Colgate-Palmolive Company",
+}
+
 class MarketService:
-    """Service for fetching real-time market data using Alpha Vantage API"""
+    """Service for fetching real-time market data from the configured provider (Alpha Vantage by default)"""
     
-    def __init__(self):
-        self.api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "UP4DUV2FAQA27ENY")
-        self.ts = TimeSeries(key=self.api_key, output_format='pandas')
-        self.base_url = "https://www.alphavantage.co/query"
-        self.cache = {}
-        self.cache_duration = timedelta(minutes=5)  # Cache data for 5 minutes
+    def __init__(self, provider: MarketDataProvider = None):
+        self.provider = provider or market_data
+        self._executor = ProfiledThreadPoolExecutor(
+            max_workers=settings.QUOTE_FETCH_WORKERS,
+            thread_name_prefix="quote-fetch"
+        )
+        
+        # Quotes are fresh for 5 minutes, then served stale for up to 30 while refreshing
+        self.cache = QuoteCache(
+            max_entries=settings.QUOTE_CACHE_SIZE,
+            ttl=timedelta(minutes=5).total_seconds(),
+            stale_ttl=timedelta(minutes=30).total_seconds(),
+            executor=self._executor
+        )
+        
+        # Built on the first search
+        self._symbol_index: Optional[SymbolIndex] = None
+        self._symbol_index_lock = threading.Lock()
     
     def get_stock_price(self, symbol: str) -> Optional[Dict]:
         """Get current price and basic info for a single stock"""
+        symbol = symbol.upper()
+        return self.cache.get(f"{symbol}_quote", lambda: self._fetch_quote(symbol))
+    
+    def _fetch_quote(self, symbol: str) -> Optional[Dict]:
+        """Fetch a quote from the provider, bypassing the cache"""
         try:
-            # Check cache first
-            cache_key = f"{symbol}_quote"
-            if cache_key in self.cache:
-                cached_data, cached_time = self.cache[cache_key]
-                if datetime.now() - cached_time < self.cache_duration:
-                    return cached_data
-            
-            # Get quote data from Alpha Vantage
-            params = {
-                "function": "GLOBAL_QUOTE",
-                "symbol": symbol,
-                "apikey": self.api_key
-            }
-            response = requests.get(self.base_url, params=params, timeout=10)
-            data = response.json()
-            
-            # Check for API error messages
-            if "Error Message" in data:
-                print(f"Alpha Vantage Error for {symbol}: {data['Error Message']}")
-                return None
-            
-            if "Note" in data:
-                print(f"Alpha Vantage Rate Limit: {data['Note']}")
-                return None
-            
-            if "Global Quote" not in data or not data["Global Quote"]:
-                print(f"No data returned for {symbol}. Response: {data}")
-                return None
-            
-            quote = data["Global Quote"]
-            
-            # Check if quote is empty
-            if not quote or "05. price" not in quote:
-                print(f"Empty quote data for {symbol}")
-                return None
-            
-            current_price = float(quote.get("05. price", 0))
-            open_price = float(quote.get("02. open", 0))
-            change = float(quote.get("09. change", 0))
-            change_percent_str = quote.get("10. change percent", "0%").replace("%", "")
-            change_percent = float(change_percent_str)
-            
-            result = {
-                "symbol": symbol.upper(),
-                "name": symbol.upper(),  # Will use symbol as name to save API calls
-                "price": round(current_price, 2),
-                "change": round(change, 2),
-                "changePercent": round(change_percent, 2),
-                "open": round(open_price, 2),
-                "high": round(float(quote.get("03. high", 0)), 2),
-                "low": round(float(quote.get("04. low", 0)), 2),
-                "volume": int(quote.get("06. volume", 0)),
-                "marketCap": None,  # Market cap requires extra API call
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Cache the result
-            self.cache[cache_key] = (result, datetime.now())
-            
-            print(f"Successfully fetched data for {symbol}: ${current_price}")
-            return result
+            return self.provider.get_quote(symbol)
+        except Exception as e:
+            logger.error("Error fetching data for %s: %s", symbol, e)
+            return None
+    
+    async def _fetch_quote_async(self, symbol: str) -> Optional[Dict]:
+        """Async variant of _fetch_quote"""
+        try:
+            return await self.provider.get_quote_async(symbol)
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error fetching data for %s: %s", symbol, e)
             return None
     
     def get_multiple_stocks(self, symbols: List[str]) -> List[Dict]:
-        """Get current prices for multiple stocks"""
-        results = []
-        for i, symbol in enumerate(symbols):
-            data = self.get_stock_price(symbol)
-            if data:
-                results.append(data)
-            # Add small delay between API calls to avoid rate limiting
-            if i < len(symbols) - 1:  # Don't delay after last one
-                import time
-                time.sleep(0.5)  # 500ms delay between calls
-        return results
+        """
+        Get current prices for multiple stocks
+        Fetched concurrently; the shared token bucket keeps calls under the quota
+        """
+        quotes = self._executor.map(self.get_stock_price, symbols)
+        return [data for data in quotes if data]
+    
+    async def get_stock_price_async(self, symbol: str) -> Optional[Dict]:
+        """Async variant of get_stock_price; never blocks the event loop"""
+        symbol = symbol.upper()
+        return await self.cache.get_async(f"{symbol}_quote", lambda: self._fetch_quote_async(symbol))
+    
+    async def get_multiple_stocks_async(self, symbols: List[str]) -> List[Dict]:
+        """Async variant of get_multiple_stocks"""
+        quotes = await asyncio.gather(*(self.get_stock_price_async(symbol) for symbol in symbols))
+        return [data for data in quotes if data]
+    
+    async def aclose(self):
+        """Close the provider's pooled connections (called on application shutdown)"""
+        await self.provider.aclose()
     
     def get_market_indices(self) -> List[Dict]:
         """Get major market indices - using ETFs as proxy"""
-        # Using popular ETFs as proxy for indices
-        indices = {
-            "SPY": "S&P 500",
-            "QQQ": "NASDAQ-100",
-            "DIA": "DOW JONES"
-        }
-        
+        return self._format_indices(self.get_multiple_stocks(list(MARKET_INDICES)))
+    
+    async def get_market_indices_async(self) -> List[Dict]:
+        """Async variant of get_market_indices"""
+        return self._format_indices(await self.get_multiple_stocks_async(list(MARKET_INDICES)))
+    
+    def _format_indices(self, quotes: List[Dict]) -> List[Dict]:
         results = []
-        for symbol, name in indices.items():
-            try:
-                stock_data = self.get_stock_price(symbol)
-                if stock_data:
-                    results.append({
-                        "symbol": symbol,
-                        "name": name,
-                        "value": stock_data["price"],
-                        "change": stock_data["change"],
-                        "changePercent": stock_data["changePercent"],
-                        "timestamp": datetime.now().isoformat()
-                    })
-            except Exception as e:
-                print(f"Error fetching index {symbol}: {str(e)}")
-                continue
+        for stock_data in quotes:
+            results.append({
+                "symbol": stock_data["symbol"],
+                "name": MARKET_INDICES[stock_data["symbol"]],
+                "value": stock_data["price"],
+                "change": stock_data["change"],
+                "changePercent": stock_data["changePercent"],
+                "timestamp": datetime.now().isoformat()
+            })
         
         return results
     
     def get_trending_stocks(self, limit: int = 10) -> List[Dict]:
         """Get trending stocks (using predefined popular stocks)"""
-        # Popular stocks to show as "trending" - reduced to 5 to avoid rate limits
-        popular_symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"
-        ]
-        
         # Only fetch up to 5 stocks to save API calls
-        fetch_limit = min(limit, 5)
-        stocks = self.get_multiple_stocks(popular_symbols[:fetch_limit])
+        stocks = self.get_multiple_stocks(TRENDING_SYMBOLS[:min(limit, 5)])
+        return self._sort_trending(stocks)
+    
+    async def get_trending_stocks_async(self, limit: int = 10) -> List[Dict]:
+        """Async variant of get_trending_stocks"""
+        stocks = await self.get_multiple_stocks_async(TRENDING_SYMBOLS[:min(limit, 5)])
+        return self._sort_trending(stocks)
+    
+    def _sort_trending(self, stocks: List[Dict]) -> List[Dict]:
         # Sort by absolute change percent to show most volatile
         return sorted(stocks, key=lambda x: abs(x.get('changePercent', 0)), reverse=True)
     
     def get_top_gainers_losers(self) -> Dict[str, List[Dict]]:
         """Get top gaining and losing stocks"""
-        # Reduced list of popular stocks to avoid rate limits
-        symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", 
-            "NVDA", "META", "NFLX", "DIS", "BA"
-        ]
-        
-        stocks = self.get_multiple_stocks(symbols)
-        
+        return self._split_movers(self.get_multiple_stocks(MOVER_SYMBOLS))
+    
+    async def get_top_gainers_losers_async(self) -> Dict[str, List[Dict]]:
+        """Async variant of get_top_gainers_losers"""
+        return self._split_movers(await self.get_multiple_stocks_async(MOVER_SYMBOLS))
+    
+    def _split_movers(self, stocks: List[Dict]) -> Dict[str, List[Dict]]:
         # Sort by change percent
         sorted_stocks = sorted(stocks, key=lambda x: x.get('changePercent', 0), reverse=True)
         
@@ -157,224 +348,126 @@ class MarketService:
             "losers": sorted_stocks[-5:]   # Top 5 losers
         }
     
-    def get_stock_history(self, symbol: str, period: str = "1mo") -> List[Dict]:
-        """Get historical price data for a stock"""
+    def get_stock_history(self, symbol: str, period: str = "1mo", format: str = "rows",
+                          max_points: Optional[int] = None, method: str = "lttb"):
+        """
+        Get historical price data for a stock
+        format="rows" returns one dict per bar (oldest first); "columns" returns
+        the history_payload dict of arrays, for FastJSONResponse to encode as is.
+        max_points reduces longer histories with downsample() ("lttb" keeps
+        shape-defining bars of the close line, "ohlc" merges bars into candles).
+        Nothing stored (or an error) gives an empty list or dict.
+        """
         try:
-            # Alpha Vantage doesn't use period strings, use compact for recent data
-            outputsize = "compact"  # Last 100 data points
-            
-            # Get daily data
-            data, meta_data = self.ts.get_daily(symbol=symbol, outputsize=outputsize)
-            
-            history = []
-            for date, row in data.iterrows():
-                history.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "open": round(float(row['1. open']), 2),
-                    "high": round(float(row['2. high']), 2),
-                    "low": round(float(row['3. low']), 2),
-                    "close": round(float(row['4. close']), 2),
-                    "volume": int(row['5. volume'])
-                })
+            columns = self.get_history_columns(symbol, period)
+            if columns is None:
+                return {} if format == "columns" else []
+            if max_points:
+                columns = downsample(columns, max_points, method)
+            payload = history_payload(columns)
+            if format == "columns":
+                return payload
             
-            # Sort by date ascending (oldest first)
-            history.reverse()
-            
-            return history
+            fields = ("date",) + tuple(field for field, _ in HISTORY_FIELDS) + ("volume",)
+            rows = zip(payload["dates"], *(payload[field].tolist() for field in fields[1:]))
+            return [dict(zip(fields, row)) for row in rows]
         except Exception as e:
-            print(f"Error fetching history for {symbol}: {str(e)}")
-            return []
+            logger.error("Error fetching history for %s: %s", symbol, e)
+            return {} if format == "columns" else []
+    
+    def get_history_columns(self, symbol: str, period: str = "1mo") -> Optional[Dict[str, np.ndarray]]:
+        """Sync a symbol's stored history and read one period as column arrays (None if nothing is stored)"""
+        symbol = symbol.upper()
+        
+        # Append any new bars to the local store, then slice the period from it
+        history_store.sync(symbol, self._fetch_daily(symbol))
+        
+        last_date = history_store.last_date(symbol)
+        if last_date is None:
+            return None
+        if period == "ytd":
+            start = datetime(last_date.year, 1, 1).date()
+        else:
+            span = HISTORY_PERIODS.get(period, HISTORY_PERIODS["1mo"])
+            start = None if span is None else last_date - span
+        return history_store.read(symbol, start=start)
     
-    def search_stocks(self, query: str) -> List[Dict]:
-        """Search for stocks by symbol or name"""
+    async def get_stock_history_async(self, symbol: str, period: str = "1mo", format: str = "rows",
+                                      max_points: Optional[int] = None, method: str = "lttb"):
+        """Async variant of get_stock_history; the blocking sync runs on the I/O pool"""
+        return await run_in_executor(io_executor, self.get_stock_history, symbol, period, format,
+                                     max_points, method)
+    
+    def _fetch_daily(self, symbol: str):
+        """Daily bar fetcher for the history store"""
+        return lambda outputsize: self.provider.get_daily(symbol, outputsize)
+    
+    def symbol_index(self) -> SymbolIndex:
+        """Search index over COMMON_STOCKS and SYMBOL_LISTING_FILE, built on first use"""
+        if self._symbol_index is None:
+            with self._symbol_index_lock:
+                if self._symbol_index is None:
+                    index = SymbolIndex(COMMON_STOCKS.items())
+                    if settings.SYMBOL_LISTING_FILE:
+                        try:
+                            index.add(load_listing(settings.SYMBOL_LISTING_FILE))
+                        except (OSError, ValueError) as e:
+                            logger.error("Error loading symbol listing: %s", e)
+                    self._symbol_index = index
+        return self._symbol_index
+    
+    def search_stocks(self, query: str, limit: int = 15, quotes: str = "cache") -> List[Dict]:
+        """
+        Search for stocks by symbol or name
+        quotes="cache" adds quote fields only where a quote is already cached,
+        "fetch" fetches quotes for the matches in one batch (dropping matches
+        without a quote) and "none" returns symbols and names only.
+        """
+        matches = self._search_matches(query, limit, quotes)
+        if quotes == "fetch":
+            fetched = self.get_multiple_stocks([match["symbol"] for match in matches])
+            return self._merge_quotes(matches, fetched, keep_unquoted=False)
+        return self._with_cached_quotes(matches, quotes)
+    
+    async def search_stocks_async(self, query: str, limit: int = 15, quotes: str = "cache") -> List[Dict]:
+        """Async variant of search_stocks"""
+        matches = self._search_matches(query, limit, quotes)
+        if quotes == "fetch":
+            fetched = await self.get_multiple_stocks_async([match["symbol"] for match in matches])
+            return self._merge_quotes(matches, fetched, keep_unquoted=False)
+        return self._with_cached_quotes(matches, quotes)
+    
+    def _search_matches(self, query: str, limit: int, quotes: str) -> List[Dict]:
+        """Ranked index matches; an unlisted symbol-like query is tried directly when fetching"""
         if not query or len(query.strip()) == 0:
             return []
-        
         query = query.strip()
-        results = []
-        
-        # First, try to search as a direct symbol
-        try:
-            # Try the query as a direct ticker symbol
-            stock_data = self.get_stock_price(query.upper())
-            if stock_data:
-                results.append(stock_data)
-        except:
-            pass
-        
-        # If query is less than 3 characters and we found a direct match, return it
-        if len(query) < 3 and results:
-            return results
-        
-        # Search in a comprehensive list of common stocks
-        common_stocks = {
-            # Tech Giants
-            "AAPL": "Apple Inc.",
-            "GOOGL": "Alphabet Inc.",
-            "GOOG": "Alphabet Inc. Class C",
-            "MSFT": "Microsoft Corporation",
-            "AMZN": "Amazon.com Inc.",
-            "META": "Meta Platforms Inc.",
-            "NVDA": "NVIDIA Corporation",
-            "TSLA": "Tesla Inc.",
-            "AMD": "Advanced Micro Devices",
-            "INTC": "Intel Corporation",
-            "CRM": "Salesforce Inc.",
-            "ORCL": "Oracle Corporation",
-            "ADBE": "Adobe Inc.",
-            "NFLX": "Netflix Inc.",
-            "AVGO": "Broadcom Inc.",
-            
-            # Financial
-            "JPM": "JPMorgan Chase & Co.",
-            "BAC": "Bank of America Corp",
-            "WFC": "Wells Fargo & Company",
-            "GS": "Goldman Sachs Group",
-            "MS": "Morgan Stanley",
-            "C": "Citigroup Inc.",
-            "BLK": "BlackRock Inc.",
-            "AXP": "American Express Company",
-            "V": "Visa Inc.",
-            "MA": "Mastercard Inc.",
-            "PYPL": "PayPal Holdings Inc.",
-            "BRK.B": "Berkshire Hathaway Inc.",
-            "SQ": "Block Inc.",
-            "COIN": "Coinbase Global Inc.",
-            
-            # Retail & Consumer
-            "WMT": "Walmart Inc.",
-            "COST": "Costco Wholesale Corp",
-            "HD": "The Home Depot Inc.",
-            "TGT": "Target Corporation",
-            "LOW": "Lowe's Companies Inc.",
-            "NKE": "Nike Inc.",
-            "SBUX": "Starbucks Corporation",
-            "MCD": "McDonald's Corporation",
-            "DIS": "The Walt Disney Company",
-            "CMCSA": "Comcast Corporation",
-            
-            # Healthcare & Pharma
-            "JNJ": "Johnson & Johnson",
-            "UNH": "UnitedHealth Group",
-            "PFE": "Pfizer Inc.",
-            "ABBV": "AbbVie Inc.",
-            "TMO": "Thermo Fisher Scientific",
-            "ABT": "Abbott Laboratories",
-            "MRK": "Merck & Co. Inc.",
-            "LLY": "Eli Lilly and Company",
-            "BMY": "Bristol-Myers Squibb",
-            "AMGN": "Amgen Inc.",
-            
-            # Industrial & Manufacturing
-            "BA": "Boeing Company",
-            "GE": "General Electric Company",
-            "CAT": "Caterpillar Inc.",
-            "MMM": "3M Company",
-            "HON": "Honeywell International",
-            "UPS": "United Parcel Service",
-            "FDX": "FedEx Corporation",
-            "LMT": "Lockheed Martin Corp",
-            "RTX": "Raytheon Technologies",
-            
-            # Automotive
-            "F": "Ford Motor Company",
-            "GM": "General Motors Company",
-            "RIVN": "Rivian Automotive Inc.",
-            "LCID": "Lucid Group Inc.",
-            
-            # Energy
-            "XOM": "Exxon Mobil Corporation",
-            "CVX": "Chevron Corporation",
-            "COP": "ConocoPhillips",
-            "SLB": "Schlumberger Limited",
-            "EOG": "EOG Resources Inc.",
-            
-            # Communications & Social
-            "T": "AT&T Inc.",
-            "VZ": "Verizon Communications",
-            "TMUS": "T-Mobile US Inc.",
-            "SNAP": "Snap Inc.",
-            "SPOT": "Spotify Technology",
-            "UBER": "Uber Technologies",
-            "LYFT": "Lyft Inc.",
-            "DASH": "DoorDash Inc.",
-            
-            # Semiconductors
-            "TSM": "Taiwan Semiconductor",
-            "ASML": "ASML Holding N.V.",
-            "QCOM": "QUALCOMM Inc.",
-            "TXN": "Texas Instruments",
-            "MU": "Micron Technology",
-            
-            # Software & Cloud
-            "NOW": "ServiceNow Inc.",
-            "SNOW": "Snowflake Inc.",
-            "DDOG": "Datadog Inc.",
-            "ZM": "Zoom Video Communications",
-            "TEAM": "Atlassian Corporation",
-            "WDAY": "Workday Inc.",
-            "PLTR": "Palantir Technologies",
-            
-            # E-commerce & Payments
-            "SHOP": "Shopify Inc.",
-            "EBAY": "eBay Inc.",
-            "BABA": "Alibaba Group",
-            "PDD": "PDD Holdings Inc.",
-            
-            # Gaming & Entertainment
-            "RBLX": "Roblox Corporation",
-            "EA": "Electronic Arts Inc.",
-            "ATVI": "Activision Blizzard",
-            "TTWO": "Take-Two Interactive",
-            "ROKU": "Roku Inc.",
-            
-            # Consumer Goods
-            "PG": "Procter & Gamble Co.",
-            "KO": "The Coca-Cola Company",
-            "PEP": "PepsiCo Inc.",
-            "PM": "Philip Morris International",
-            "CL": "Colgate-Palmolive Company",
-        }
-        
-        query_lower = query.lower()
-        query_upper = query.upper()
-        
-        # Search through the common stocks
-        for symbol, name in common_stocks.items():
-            # Skip if already in results
-            if results and results[0]['symbol'] == symbol:
-                continue
-                
-            # Match by symbol or name
-            if (query_upper in symbol or 
-                query_lower in name.lower() or
-                any(word.startswith(query_lower) for word in name.lower().split())):
-                
-                stock_data = self.get_stock_price(symbol)
-                if stock_data:
-                    results.append(stock_data)
-                    
-                # Limit to 15 results
-                if len(results) >= 15:
-                    break
-        
-        # If still no results and query looks like a symbol (short and uppercase-ish)
-        # Try a few variations
-        if not results and len(query) <= 5:
-            variations = [
-                query.upper(),
-                f"{query.upper()}",
-            ]
-            
-            for variant in variations:
-                try:
-                    stock_data = self.get_stock_price(variant)
-                    if stock_data:
-                        results.append(stock_data)
-                        break
-                except:
-                    continue
+        matches = self.symbol_index().search(query, limit)
         
+        # Tickers missing from the index can still be looked up as a direct symbol
+        if (quotes != "none" and len(query) <= 5 and query.replace(".", "").isalnum()
+                and not any(match["symbol"] == query.upper() for match in matches)):
+            direct = {"symbol": query.upper(), "name": query.upper()}
+            if quotes == "fetch" or self.cache.peek(f"{query.upper()}_quote"):
+                matches = [direct] + matches[:limit - 1]
+        return matches
+    
+    def _with_cached_quotes(self, matches: List[Dict], quotes: str) -> List[Dict]:
+        if quotes == "none":
+            return matches
+        cached = [self.cache.peek(f"{match['symbol']}_quote") for match in matches]
+        return self._merge_quotes(matches, [quote for quote in cached if quote], keep_unquoted=True)
+    
+    def _merge_quotes(self, matches: List[Dict], quotes: List[Dict], keep_unquoted: bool) -> List[Dict]:
+        """Overlay quote fields on index matches, keeping the index order and company names"""
+        by_symbol = {quote["symbol"]: quote for quote in quotes}
+        results = []
+        for match in matches:
+            quote = by_symbol.get(match["symbol"])
+            if quote is not None:
+                results.append({**quote, **match})
+            elif keep_unquoted:
+                results.append(dict(match))
         return results
 
 # Singleton instance
@@ -0,0 +1,204 @@
+"""
+Bounded, thread-safe cache for upstream quotes
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.core.metrics import CACHE_REQUESTS
+
+
+class _Flight:
+    """An upstream load in progress that other callers can wait on"""
+
+    def __init__(self, future: "asyncio.Future" = None):
+        self.done = threading.Event()
+        self.future = future  # Set for loads running on an event loop
+        self.result = None
+
+
+class QuoteCache:
+    """
+    LRU cache with per-key single-flight loading and stale-while-revalidate
+
+    - At most max_entries keys are kept; the least recently used is evicted.
+    - Concurrent misses for the same key share one loader call.
+    - Entries older than ttl but younger than stale_ttl are served as-is
+      while one background refresh runs, so requests never block at a TTL
+      boundary.
+    - Loaders returning None (upstream failure) are not cached.
+
+    get() is for threads and get_async() for coroutines; both share the
+    same entries, counters and in-flight loads.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300, stale_ttl: float = 1800,
+                 executor: Optional[Executor] = None, name: str = "quote"):
+        self.name = name  # Cache label on the cache_requests_total metric
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds an entry is fresh
+        self.stale_ttl = stale_ttl  # Seconds an entry may still be served while refreshing
+        self.executor = executor
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._tasks = set()  # Background refresh tasks, referenced until they finish
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]):
+        """Return the cached value for key, loading it with loader() when needed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return value
+                if age < self.stale_ttl and self.executor is not None:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    CACHE_REQUESTS.inc(cache=self.name, result="stale_hit")
+                    flight = self._start_flight(key)
+                    if flight is not None:
+                        self.refreshes += 1
+                        self.executor.submit(self._run_flight, key, loader, flight)
+                    return value
+
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._start_flight(key)
+
+        if leader:
+            return self._run_flight(key, loader, flight)
+        flight.done.wait()
+        return flight.result
+
+    async def get_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """Async variant of get(); loader returns an awaitable and refreshes run as tasks"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return value
+                if age < self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    CACHE_REQUESTS.inc(cache=self.name, result="stale_hit")
+                    flight = self._start_flight(key, loop.create_future())
+                    if flight is not None:
+                        self.refreshes += 1
+                        task = loop.create_task(self._run_flight_async(key, loader, flight))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+                    return value
+
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._start_flight(key, loop.create_future())
+
+        if leader:
+            return await self._run_flight_async(key, loader, flight)
+        if flight.future is not None and flight.future.get_loop() is loop:
+            return await asyncio.shield(flight.future)
+        # The load is running in a thread (or another loop); wait for it off the loop
+        await loop.run_in_executor(None, flight.done.wait)
+        return flight.result
+
+    def peek(self, key: Hashable):
+        """Return a cached value (fresh or stale) without loading or touching counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.stale_ttl:
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, value):
+        """Store a value, evicting least recently used entries beyond the size bound"""
+        with self._lock:
+            self._store(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring cache effectiveness"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _start_flight(self, key: Hashable, future: "asyncio.Future" = None) -> Optional[_Flight]:
+        """Register a load for key unless one is already running (lock held)"""
+        if key in self._inflight:
+            return None
+        flight = _Flight(future)
+        self._inflight[key] = flight
+        return flight
+
+    def _run_flight(self, key: Hashable, loader: Callable[[], Any], flight: _Flight):
+        result = None
+        try:
+            result = loader()
+        finally:
+            with self._lock:
+                if result is not None:
+                    self._store(key, result)
+                self._inflight.pop(key, None)
+            flight.result = result
+            flight.done.set()
+        return result
+
+    async def _run_flight_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]], flight: _Flight):
+        result = None
+        try:
+            result = await loader()
+        finally:
+            with self._lock:
+                if result is not None:
+                    self._store(key, result)
+                self._inflight.pop(key, None)
+            flight.result = result
+            flight.done.set()
+            if not flight.future.done():
+                flight.future.set_result(result)
+        return result
+
+    def _store(self, key: Hashable, value):
+        """Insert or refresh an entry (lock held)"""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,179 @@
+"""
+Server-push quote streaming with one shared poller per symbol
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.services.market_service import market_service
+
+# Fields that change on every fetch and do not by themselves make an update
+VOLATILE_FIELDS = {"timestamp"}
+
+QuoteSource = Callable[[str], Awaitable[Optional[Dict]]]
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One client's view of the hub: a set of symbols and their pending updates
+
+    Updates are coalesced per symbol rather than queued, so a slow client
+    holds at most one pending change set per symbol and always receives
+    the latest values when it catches up.
+    """
+
+    def __init__(self, hub: "QuoteHub"):
+        self.hub = hub
+        self.symbols: Set[str] = set()
+        self._pending: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, symbol: str, fields: Dict):
+        self._pending.setdefault(symbol, {}).update(fields)
+        self._ready.set()
+
+    async def next(self) -> List[Dict]:
+        """Wait for updates; returns one {"symbol": ..., **changed_fields} dict per symbol"""
+        await self._ready.wait()
+        self._ready.clear()
+        pending, self._pending = self._pending, {}
+        return [{"symbol": symbol, **fields} for symbol, fields in pending.items()]
+
+    async def subscribe(self, symbols: Iterable[str]):
+        await self.hub.subscribe(self, symbols)
+
+    async def unsubscribe(self, symbols: Iterable[str]):
+        await self.hub.unsubscribe(self, symbols)
+
+    async def close(self):
+        await self.hub.unsubscribe(self, list(self.symbols))
+
+
+class _SymbolPoller:
+    """Polls one symbol and fans changed fields out to every subscriber"""
+
+    def __init__(self, symbol: str, source: QuoteSource, interval: float):
+        self.symbol = symbol
+        self.source = source
+        self.interval = interval
+        self.subscribers: Set[Subscription] = set()
+        self.last: Optional[Dict] = None
+        self.task: Optional[asyncio.Task] = None
+        self.polls = 0
+
+    async def run(self):
+        while True:
+            try:
+                quote = await self.source(self.symbol)
+            except Exception as e:
+                logger.error("Quote stream error for %s: %s", self.symbol, e)
+                quote = None
+            self.polls += 1
+            if quote:
+                changed = diff_quote(self.last, quote)
+                self.last = quote
+                if changed:
+                    for subscriber in list(self.subscribers):
+                        subscriber.push(self.symbol, changed)
+            await asyncio.sleep(self.interval)
+
+
+def diff_quote(previous: Optional[Dict], current: Dict) -> Dict:
+    """Fields of current that differ from previous (all of them if there is no previous quote)"""
+    if previous is None:
+        return dict(current)
+    changed = {
+        key: value for key, value in current.items()
+        if key not in VOLATILE_FIELDS and previous.get(key) != value
+    }
+    if changed:
+        changed.update({key: current[key] for key in VOLATILE_FIELDS if key in current})
+    return changed
+
+
+class QuoteHub:
+    """
+    Fans quotes out to streaming clients
+
+    Each distinct subscribed symbol gets exactly one polling task, started
+    on the first subscription and cancelled when the last subscriber
+    leaves, so upstream calls scale with the number of symbols rather than
+    the number of connected clients. New subscribers receive the last known
+    quote immediately, then only changed fields.
+    """
+
+    def __init__(self, source: QuoteSource, interval: float = 15.0, max_symbols_per_client: int = 50):
+        self.source = source
+        self.interval = interval
+        self.max_symbols_per_client = max_symbols_per_client
+        self._pollers: Dict[str, _SymbolPoller] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def connect(self) -> Subscription:
+        return Subscription(self)
+
+    @property
+    def symbols(self) -> List[str]:
+        """Symbols currently being polled"""
+        return sorted(self._pollers)
+
+    def poll_count(self) -> int:
+        """Upstream polls made by all pollers so far"""
+        return sum(poller.polls for poller in self._pollers.values())
+
+    async def subscribe(self, subscription: Subscription, symbols: Iterable[str]):
+        symbols = [s.strip().upper() for s in symbols if s and s.strip()]
+        new = [s for s in dict.fromkeys(symbols) if s not in subscription.symbols]
+        if len(subscription.symbols) + len(new) > self.max_symbols_per_client:
+            raise ValueError(f"At most {self.max_symbols_per_client} symbols can be streamed per client")
+
+        async with self._get_lock():
+            for symbol in new:
+                poller = self._pollers.get(symbol)
+                if poller is None:
+                    poller = _SymbolPoller(symbol, self.source, self.interval)
+                    poller.task = asyncio.create_task(poller.run(), name=f"quote-poller-{symbol}")
+                    self._pollers[symbol] = poller
+                poller.subscribers.add(subscription)
+                subscription.symbols.add(symbol)
+                if poller.last is not None:
+                    subscription.push(symbol, dict(poller.last))
+
+    async def unsubscribe(self, subscription: Subscription, symbols: Iterable[str]):
+        async with self._get_lock():
+            for symbol in [s.upper() for s in symbols]:
+                subscription.symbols.discard(symbol)
+                poller = self._pollers.get(symbol)
+                if poller is None:
+                    continue
+                poller.subscribers.discard(subscription)
+                if not poller.subscribers:
+                    poller.task.cancel()
+                    del self._pollers[symbol]
+
+    async def close(self):
+        """Stop every poller (called on application shutdown)"""
+        pollers, self._pollers = list(self._pollers.values()), {}
+        for poller in pollers:
+            poller.task.cancel()
+        await asyncio.gather(*(poller.task for poller in pollers), return_exceptions=True)
+
+
+# Shared hub used by the streaming endpoints; polls go through the quote
+# cache, so polling faster than its TTL costs no extra upstream calls
+quote_hub = QuoteHub(
+    market_service.get_stock_price_async,
+    interval=settings.QUOTE_STREAM_INTERVAL,
+    max_symbols_per_client=settings.QUOTE_STREAM_MAX_SYMBOLS
+)
@@ -0,0 +1,76 @@
+"""
+Token-bucket rate limiting for upstream market data calls
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so
+    short bursts go out immediately while the long-run call rate never
+    exceeds the provider's quota.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, tokens: float) -> float:
+        """Take tokens if available; otherwise return the seconds until they will be"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if they are available right now"""
+        return self._take(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until tokens are available
+        Returns False without taking anything if that would take longer than timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Like acquire, but waits without blocking the event loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+# One bucket for every Alpha Vantage call in the process (quotes, history, search)
+alpha_vantage_limiter = TokenBucket(
+    rate=settings.ALPHA_VANTAGE_CALLS_PER_MINUTE / 60.0,
+    capacity=settings.ALPHA_VANTAGE_BURST
+)
@@ -0,0 +1,194 @@
+"""
+Prebuilt search index over stock symbols and company names
+"""
+import csv
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Prefixes longer than this are looked up by their first MAX_PREFIX characters and verified
+MAX_PREFIX = 12
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['&.][a-z0-9]+)*")
+
+# Header names accepted for the symbol and name columns of a listing file
+SYMBOL_HEADERS = ("symbol", "act symbol", "ticker", "nasdaq symbol")
+NAME_HEADERS = ("name", "security name", "company name", "company")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a company name or query"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def load_listing(path: str) -> List[Tuple[str, str]]:
+    """
+    Read (symbol, name) pairs from a CSV or pipe-delimited listing file
+    Works with Alpha Vantage LISTING_STATUS exports and NASDAQ Trader symbol
+    directories; footer lines such as "File Creation Time" are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = "|" if sample.count("|") > sample.count(",") else ","
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [column.strip().lower() for column in next(reader, [])]
+        symbol_col = next((header.index(h) for h in SYMBOL_HEADERS if h in header), None)
+        name_col = next((header.index(h) for h in NAME_HEADERS if h in header), None)
+        if symbol_col is None or name_col is None:
+            raise ValueError(f"Listing file {path} needs symbol and name columns, got {header}")
+
+        listings = []
+        for row in reader:
+            if len(row) <= max(symbol_col, name_col):
+                continue
+            symbol, name = row[symbol_col].strip().upper(), row[name_col].strip()
+            if symbol and name and not symbol.startswith("FILE CREATION TIME"):
+                listings.append((symbol, name))
+        return listings
+
+
+class SymbolIndex:
+    """
+    Ranked typeahead over (symbol, name) listings
+
+    Every symbol prefix and every name-token prefix maps to a list of
+    listing ids already sorted by rank, so a query only walks the head of
+    a few lists. Substring matches come from a trigram index. Listings
+    added first rank first among equal matches; callers put the most
+    popular symbols first.
+
+    Ranking: exact symbol, then symbol prefix (shorter symbols first), then
+    names whose words start with every query word (earlier words first),
+    then symbol or name substrings.
+    """
+
+    def __init__(self, listings: Iterable[Tuple[str, str]] = ()):
+        self.symbols: List[str] = []
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._tokens: List[List[str]] = []
+        self._symbol_prefixes: Dict[str, List[int]] = {}
+        self._token_prefixes: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._texts: List[Tuple[str, str]] = []
+        self.add(listings)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add(self, listings: Iterable[Tuple[str, str]]):
+        """Add listings; symbols already indexed keep their first name and rank"""
+        symbol_best: Dict[str, Dict[int, Tuple]] = {}
+        token_best: Dict[str, Dict[int, Tuple]] = {}
+        for symbol, name in listings:
+            symbol = symbol.strip().upper()
+            if not symbol or symbol in self._ids:
+                continue
+            listing_id = len(self.symbols)
+            self._ids[symbol] = listing_id
+            self.symbols.append(symbol)
+            self.names.append(name)
+            tokens = tokenize(name)
+            self._tokens.append(tokens)
+
+            lowered = symbol.lower()
+            for end in range(1, min(len(lowered), MAX_PREFIX) + 1):
+                symbol_best.setdefault(lowered[:end], {})[listing_id] = (len(symbol), listing_id)
+            for position, token in enumerate(tokens):
+                for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                    ranks = token_best.setdefault(token[:end], {})
+                    if listing_id not in ranks:
+                        ranks[listing_id] = (position, listing_id)
+
+            texts = (lowered, name.lower())
+            self._texts.append(texts)
+            for text in texts:
+                for i in range(len(text) - 2):
+                    self._trigrams.setdefault(text[i:i + 3], set()).add(listing_id)
+
+        self._merge(self._symbol_prefixes, symbol_best, self._symbol_rank)
+        self._merge(self._token_prefixes, token_best, self._token_rank)
+
+    def _symbol_rank(self, listing_id: int, prefix: str) -> Tuple:
+        return (len(self.symbols[listing_id]), listing_id)
+
+    def _token_rank(self, listing_id: int, prefix: str) -> Tuple:
+        position = next(i for i, token in enumerate(self._tokens[listing_id]) if token.startswith(prefix))
+        return (position, listing_id)
+
+    @staticmethod
+    def _merge(index: Dict[str, List[int]], additions: Dict[str, Dict[int, Tuple]], rank):
+        """Fold newly ranked ids into the sorted per-prefix lists"""
+        for prefix, ranks in additions.items():
+            for listing_id in index.get(prefix, ()):
+                ranks[listing_id] = rank(listing_id, prefix)
+            index[prefix] = sorted(ranks, key=ranks.__getitem__)
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        listing_id = self._ids.get(symbol.strip().upper())
+        return None if listing_id is None else self._result(listing_id)
+
+    def search(self, query: str, limit: int = 15) -> List[Dict]:
+        """Up to limit {"symbol", "name"} matches for a query, best first"""
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        lowered = query.lower()
+        found: List[int] = []
+        seen: Set[int] = set()
+
+        def take(candidates: Iterable[int]) -> bool:
+            """Append unseen candidates; True once the limit is reached"""
+            for listing_id in candidates:
+                if listing_id not in seen:
+                    seen.add(listing_id)
+                    found.append(listing_id)
+                    if len(found) >= limit:
+                        return True
+            return False
+
+        exact = self._ids.get(query.upper())
+        if exact is not None and take([exact]):
+            return self._results(found)
+        if take(self._symbol_prefix_matches(lowered)):
+            return self._results(found)
+        if take(self._name_prefix_matches(tokenize(query))):
+            return self._results(found)
+        take(self._substring_matches(lowered))
+        return self._results(found)
+
+    def _symbol_prefix_matches(self, prefix: str) -> Iterable[int]:
+        for listing_id in self._symbol_prefixes.get(prefix[:MAX_PREFIX], ()):
+            if len(prefix) <= MAX_PREFIX or self.symbols[listing_id].lower().startswith(prefix):
+                yield listing_id
+
+    def _name_prefix_matches(self, words: List[str]) -> Iterable[int]:
+        """Listings whose name has a token starting with each query word, ranked by the first word"""
+        if not words:
+            return
+        first, rest = words[0], words[1:]
+        for listing_id in self._token_prefixes.get(first[:MAX_PREFIX], ()):
+            tokens = self._tokens[listing_id]
+            if len(first) > MAX_PREFIX and not any(token.startswith(first) for token in tokens):
+                continue
+            if all(any(token.startswith(word) for token in tokens) for word in rest):
+                yield listing_id
+
+    def _substring_matches(self, text: str) -> Iterable[int]:
+        if len(text) < 3:
+            return []
+        postings = [self._trigrams.get(text[i:i + 3]) for i in range(len(text) - 2)]
+        if any(p is None for p in postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return (
+            listing_id for listing_id in sorted(candidates)
+            if any(text in field for field in self._texts[listing_id])
+        )
+
+    def _result(self, listing_id: int) -> Dict:
+        return {"symbol": self.symbols[listing_id], "name": self.names[listing_id]}
+
+    def _results(self, ids: List[int]) -> List[Dict]:
+        return [self._result(listing_id) for listing_id in ids]
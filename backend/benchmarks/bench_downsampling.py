@@ -0,0 +1,111 @@
+"""
+Speed and exactness of history downsampling (LTTB and OHLC buckets)
+
+Downsamples synthetic daily histories of several lengths and compares the
+vectorized lttb_indices and ohlc_buckets with straightforward per-bucket
+loop implementations: the picked bars and candles must be identical.
+Reports the best-of timings of both, for a random-walk close and for a
+close oscillating at the LTTB bucket width, the worst case for the
+vectorized passes (it ends in the sequential sweep).
+
+Run from the backend directory:
+    python -m benchmarks.bench_downsampling --bars 1260,5040,12600 --points 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.downsampling import lttb_indices, ohlc_buckets
+from benchmarks.bench_history_serialization import synthetic_bars
+
+SERIES = ("walk", "oscillating")
+
+
+def reference_lttb(x, y, n_out):
+    """Textbook sequential LTTB"""
+    n = len(x)
+
+    def edge(i):
+        # floor(i * every) + 1 with every = (n - 2) / (n_out - 2), in integers so no bar falls between buckets
+        return (i * (n - 2)) // (n_out - 2) + 1
+
+    kept, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edge(i), edge(i + 1)
+        next_lo, next_hi = hi, min(edge(i + 2), n - 1)
+        if next_lo >= next_hi:
+            cx, cy = x[n - 1], y[n - 1]
+        else:
+            cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        best, best_area = lo, -1.0
+        for p in range(lo, hi):
+            area = abs((x[a] - cx) * (y[p] - y[a]) - (x[a] - x[p]) * (cy - y[a]))
+            if area > best_area:
+                best, best_area = p, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return np.array(kept)
+
+
+def reference_ohlc(columns, n_out):
+    n = len(columns["date"])
+    edges = [(i * n) // n_out for i in range(n_out + 1)]
+    bars = [(columns["date"][lo], columns["open"][lo], columns["high"][lo:hi].max(),
+             columns["low"][lo:hi].min(), columns["close"][hi - 1], columns["volume"][lo:hi].sum())
+            for lo, hi in zip(edges[:-1], edges[1:])]
+    return dict(zip(("date", "open", "high", "low", "close", "volume"), map(np.array, zip(*bars))))
+
+
+def oscillating(frame, n_out):
+    """
+    The bars with a flat close swinging by 1 with a period of one LTTB bucket
+    Without a trend, each moved pick moves the next bucket's, and the
+    vectorized passes settle about one bucket at a time.
+    """
+    width = (len(frame) - 2) / (n_out - 2)
+    swing = np.sin(2 * np.pi * np.arange(len(frame)) / width)
+    return frame.assign(close=(100 + swing).round(3))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", default="1260,5040,12600", help="comma-separated history lengths")
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'bars':>6} {'series':>11}  {'lttb':>9} {'loop':>9}  {'ohlc':>9} {'loop':>9}")
+    for bars, series in ((int(value), series) for value in args.bars.split(",") for series in SERIES):
+        frame = synthetic_bars(bars, seed=bars)
+        if series == "oscillating":
+            frame = oscillating(frame, args.points)
+        columns = {"date": frame.index.values.astype("datetime64[D]")}
+        columns.update({column: frame[column].to_numpy() for column in frame.columns})
+        x, y = columns["date"].astype(np.int64), columns["close"]
+
+        assert np.array_equal(lttb_indices(x, y, args.points), reference_lttb(x.astype(float), y, args.points)), \
+            "vectorized LTTB differs from the sequential reference"
+        fast, slow = ohlc_buckets(columns, args.points), reference_ohlc(columns, args.points)
+        assert all(np.array_equal(fast[column], slow[column]) for column in fast), \
+            "OHLC buckets differ from the loop reference"
+
+        print(f"{bars:>6} {series:>11}  "
+              f"{best_of(lambda: lttb_indices(x, y, args.points), args.repeat) * 1000:>7.3f}ms "
+              f"{best_of(lambda: reference_lttb(x.astype(float), y, args.points), 3) * 1000:>7.1f}ms  "
+              f"{best_of(lambda: ohlc_buckets(columns, args.points), args.repeat) * 1000:>7.3f}ms "
+              f"{best_of(lambda: reference_ohlc(columns, args.points), 3) * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
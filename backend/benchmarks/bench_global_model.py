@@ -0,0 +1,111 @@
+"""
+Per-symbol LSTMs vs one shared cross-symbol LSTM
+
+Trains both on the same symbols into a temporary model directory and
+reports training time, resident weight bytes, held-out one-step MSE per
+symbol (each symbol's last 20% of windows, in its own scaled units) and
+the latency of a one-day forward pass over every symbol: N model calls
+for the per-symbol path, one batched call for the shared model.
+
+Needs TensorFlow. Use the replay provider to avoid the Alpha Vantage quota:
+    MARKET_DATA_PROVIDER=replay python -m benchmarks.bench_global_model --symbols 20 --epochs 10
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml.inference import AutoregressiveForecaster
+from app.ml.predictor import MLStockPredictor
+from app.ml.runtime import tensorflow_available
+from app.services.market_service import COMMON_STOCKS
+
+
+def held_out(predictor: MLStockPredictor, symbol: str, entry):
+    """Last 20% of a symbol's windows, scaled with the entry's scaler"""
+    X, y = predictor.prepare_data(predictor.fetch_historical_data(symbol), scaler=entry.scaler)
+    split = int(len(X) * 0.8)
+    return np.ascontiguousarray(X[split:]), y[split:]
+
+
+def one_step_mse(entry, X: np.ndarray, y: np.ndarray) -> float:
+    ids = None if entry.symbol_id is None else np.full(len(X), entry.symbol_id)
+    predictions = AutoregressiveForecaster(entry.model)._step(X, ids)
+    return float(np.mean((predictions - y) ** 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=20, help="first N common stocks")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--embedding-dim", type=int, default=8)
+    args = parser.parse_args()
+    if not tensorflow_available():
+        raise SystemExit("TensorFlow is needed to train the models")
+
+    symbols = list(COMMON_STOCKS)[:args.symbols]
+    with tempfile.TemporaryDirectory() as model_dir:
+        predictor = MLStockPredictor(model_dir=model_dir)
+        for symbol in symbols:
+            predictor.fetch_historical_data(symbol)  # Download outside the timed sections
+
+        started = time.perf_counter()
+        for symbol in symbols:
+            predictor.train_model(symbol, epochs=args.epochs)
+        per_symbol_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predictor.train_global_model(symbols, epochs=args.epochs, embedding_dim=args.embedding_dim)
+        global_seconds = time.perf_counter() - started
+
+        rows, local_bytes = [], 0
+        local_windows, global_windows, global_ids = [], [], []
+        for symbol in symbols:
+            df = predictor.fetch_historical_data(symbol)
+            local = predictor.model_entry(symbol, df, "symbol")
+            shared = predictor.model_entry(symbol, df, "global")
+            if local is None or shared is None:
+                continue
+            local_bytes += getattr(local.model, "nbytes", 0)
+            rows.append((symbol, one_step_mse(local, *held_out(predictor, symbol, local)),
+                         one_step_mse(shared, *held_out(predictor, symbol, shared))))
+            local_windows.append((local, predictor.prepare_data(df, scaler=local.scaler, last_only=True)[0]))
+            global_windows.append(predictor.prepare_data(df, scaler=shared.scaler, last_only=True)[0][0])
+            global_ids.append(shared.symbol_id)
+
+        shared_model = predictor.registry.get_global().model
+        ids = None if global_ids[0] is None else np.array(global_ids)
+        batch = np.stack(global_windows)
+
+        def run_local():
+            for entry, window in local_windows:
+                AutoregressiveForecaster(entry.model)._step(window)
+
+        def run_global():
+            AutoregressiveForecaster(shared_model)._step(batch, ids)
+
+        latencies = {}
+        for name, fn in (("per-symbol", run_local), ("global", run_global)):
+            fn()
+            started = time.perf_counter()
+            for _ in range(10):
+                fn()
+            latencies[name] = (time.perf_counter() - started) / 10
+
+    print(f"{'symbol':<8}{'per-symbol MSE':>16}{'global MSE':>14}")
+    for symbol, local_mse, global_mse in rows:
+        print(f"{symbol:<8}{local_mse:>16.3e}{global_mse:>14.3e}")
+    local_mean = np.mean([r[1] for r in rows])
+    global_mean = np.mean([r[2] for r in rows])
+    print(f"{'mean':<8}{local_mean:>16.3e}{global_mean:>14.3e}")
+    print()
+    print(f"{'':<12}{'train':>10}{'weights':>12}{'forward, all symbols':>24}")
+    print(f"{'per-symbol':<12}{per_symbol_seconds:>9.0f}s{local_bytes / 1024:>9.0f} KB"
+          f"{latencies['per-symbol'] * 1e3:>21.1f}ms")
+    print(f"{'global':<12}{global_seconds:>9.0f}s{getattr(shared_model, 'nbytes', 0) / 1024:>9.0f} KB"
+          f"{latencies['global'] * 1e3:>21.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Encoding cost of /market/history payloads by format and history length
+
+Compares the former row path (DataFrame.iterrows + round(float) per cell,
+encoded by FastAPI's jsonable_encoder and JSONResponse) with the vectorized
+row and columnar payloads encoded by FastJSONResponse, on synthetic daily
+bars in a temporary history store. Also checks that all formats carry the
+same values, including prices on a half cent, where np.round alone would
+differ from round().
+
+Run from the backend directory:
+    python -m benchmarks.bench_history_serialization --years 1,5,20
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.http_metrics import FastJSONResponse
+from app.services.history_store import HistoryStore
+from app.services.market_service import history_payload
+
+
+def synthetic_bars(days: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Random-walk daily bars with prices at three decimals, as Alpha Vantage
+    reports many of them, so about one in ten lands exactly on a half cent
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    spread = close * rng.uniform(0.001, 0.02, days)
+    return pd.DataFrame({
+        "open": np.round(close + rng.normal(0, 0.3, days) * spread, 3),
+        "high": np.round(close + spread, 3),
+        "low": np.round(close - spread, 3),
+        "close": np.round(close, 3),
+        "volume": rng.integers(1_000_000, 50_000_000, days).astype(float),
+    }, index=pd.bdate_range(end="2024-12-31", periods=days))
+
+
+def legacy_rows(data: pd.DataFrame):
+    history = []
+    for date, row in data.iterrows():
+        history.append({
+            "date": date.strftime("%Y-%m-%d"),
+            "open": round(float(row['Open']), 2),
+            "high": round(float(row['High']), 2),
+            "low": round(float(row['Low']), 2),
+            "close": round(float(row['Close']), 2),
+            "volume": int(row['Volume'])
+        })
+    return history
+
+
+def vectorized_rows(payload):
+    fields = ("date", "open", "high", "low", "close", "volume")
+    rows = zip(payload["dates"], *(payload[field].tolist() for field in fields[1:]))
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", default="1,5,20", help="comma-separated history lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store = HistoryStore(tempfile.mkdtemp(prefix="bench_history_"))
+    print(f"{'years':>5} {'bars':>6}  {'legacy rows':>12} {'rows':>9} {'columns':>9}  {'rows KB':>8} {'columns KB':>10} {'half cents':>10}")
+    for years in (int(value) for value in args.years.split(",")):
+        symbol = f"Y{years}"
+        store.append(symbol, synthetic_bars(years * 252, seed=years))
+
+        def legacy():
+            body = legacy_rows(store.read_frame(symbol))
+            return JSONResponse(jsonable_encoder(body)).body
+
+        def rows():
+            return FastJSONResponse(vectorized_rows(history_payload(store.read(symbol)))).body
+
+        def columns():
+            return FastJSONResponse(history_payload(store.read(symbol))).body
+
+        frame = store.read_frame(symbol)
+        half_cents = int(sum((np.abs(frame[column] * 100 % 1 - 0.5) < 1e-6).sum()
+                             for column in ("Open", "High", "Low", "Close")))
+        assert half_cents > 0, "no half-cent prices to check the rounding on"
+
+        legacy_body, rows_body, columns_body = legacy(), rows(), columns()
+        expected = json.loads(legacy_body)
+        assert json.loads(rows_body) == expected, "vectorized rows differ from the legacy rows"
+        decoded = json.loads(columns_body)
+        fields = ("date", "open", "high", "low", "close", "volume")
+        as_columns = {field: [row[field] for row in expected] for field in fields}
+        as_columns["dates"] = as_columns.pop("date")
+        assert decoded == as_columns, "columns differ from the legacy rows"
+
+        print(f"{years:>5} {len(expected):>6}  "
+              f"{best_of(legacy, args.repeat) * 1000:>10.2f}ms "
+              f"{best_of(rows, args.repeat) * 1000:>7.2f}ms "
+              f"{best_of(columns, args.repeat) * 1000:>7.2f}ms  "
+              f"{len(rows_body) / 1024:>8.0f} {len(columns_body) / 1024:>10.0f} {half_cents:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Throughput of the market service against the replay provider
+
+Drives get_multiple_stocks (threads) and get_multiple_stocks_async
+(event loop) with an empty quote cache, using replayed or synthetic data
+at a fixed latency and error rate. No network or Alpha Vantage quota is
+used, and a fixed seed makes runs comparable.
+
+Run from the backend directory:
+    python -m benchmarks.bench_market_data --symbols 200 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.market_data import ReplayProvider
+from app.services.market_service import MarketService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replay-dir", default="./market_replay")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per upstream call")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    for mode in ("threads", "async"):
+        provider = ReplayProvider(args.replay_dir, latency=args.latency,
+                                  error_rate=args.error_rate, seed=args.seed)
+        service = MarketService(provider=provider)
+        started = time.perf_counter()
+        if mode == "threads":
+            quotes = service.get_multiple_stocks(symbols)
+        else:
+            quotes = asyncio.run(service.get_multiple_stocks_async(symbols))
+        elapsed = time.perf_counter() - started
+        print(f"{mode:<8} {len(quotes)}/{len(symbols)} quotes in {elapsed:.2f}s "
+              f"({provider.calls / elapsed:.0f} upstream calls/s, {provider.calls} calls)")
+
+
+if __name__ == "__main__":
+    main()
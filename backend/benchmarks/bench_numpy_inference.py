@@ -0,0 +1,145 @@
+"""
+Benchmark LSTM inference: Keras (TensorFlow) vs the NumPy runtime
+
+Each backend runs in a fresh interpreter that loads the same saved model,
+so peak RSS includes everything that backend imports. Latency is for one
+forward pass and for the 7-day autoregressive forecast used by /predict,
+at batch size 1 (single symbol) and a batch of symbols sharing a model.
+Both backends forecast the same inputs and the run fails if their outputs
+differ by more than --tolerance.
+
+The model is the architecture from build_lstm_model with random weights,
+or a trained one with --model-dir ml_models/AAPL. Without TensorFlow only
+the NumPy backend is measured.
+
+Run from the backend directory:
+    python -m benchmarks.bench_numpy_inference
+    python -m benchmarks.bench_numpy_inference --model-dir ml_models/AAPL --batch 64
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+PROBE = """
+import json, resource, sys, time
+import numpy as np
+started = time.perf_counter()
+from app.ml.inference import AutoregressiveForecaster
+if {backend!r} == "keras":
+    from tensorflow.keras.models import load_model
+    model = load_model({model_path!r})
+else:
+    from app.ml.numpy_lstm import NumpyLSTMModel
+    model = NumpyLSTMModel.load({weights_path!r})
+forecaster = AutoregressiveForecaster(model)
+load_seconds = time.perf_counter() - started
+
+inputs = np.load({inputs_path!r})
+def best(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); times.append(time.perf_counter() - t)
+    return min(times) * 1e3
+
+single, batch = inputs[:1], inputs
+result = {{
+    "load_seconds": load_seconds,
+    "forward_1_ms": best(lambda: forecaster._step(single), 20),
+    "forward_batch_ms": best(lambda: forecaster._step(batch), 10),
+    "forecast_1_ms": best(lambda: forecaster.forecast(single, 7), 10),
+    "forecast_batch_ms": best(lambda: forecaster.forecast(batch, 7), 5),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tensorflow_loaded": "tensorflow" in sys.modules,
+}}
+np.save({output_path!r}, forecaster.forecast(batch, 7))
+print(json.dumps(result))
+"""
+
+
+def prepare_model(directory: str) -> None:
+    """Save a randomly initialised predictor model (model.keras + weights.npz) into directory"""
+    from app.ml.numpy_lstm import NumpyLSTMModel
+    from app.ml.predictor import FEATURES, MLStockPredictor
+
+    predictor = MLStockPredictor(model_dir=directory)
+    model = predictor.build_lstm_model((predictor.sequence_length, len(FEATURES)))
+    model.save(os.path.join(directory, "model.keras"))
+    NumpyLSTMModel.from_keras(model).save(os.path.join(directory, "weights.npz"))
+
+
+def run_backend(backend: str, model_dir: str, inputs_path: str, output_path: str) -> dict:
+    script = PROBE.format(
+        backend=backend,
+        model_path=os.path.join(model_dir, "model.keras"),
+        weights_path=os.path.join(model_dir, "weights.npz"),
+        inputs_path=inputs_path,
+        output_path=output_path,
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise SystemExit(f"{backend} backend failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", help="directory with model.keras and/or weights.npz")
+    parser.add_argument("--batch", type=int, default=64, help="symbols per batched forecast")
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    has_tensorflow = importlib.util.find_spec("tensorflow") is not None
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            if not has_tensorflow:
+                raise SystemExit("TensorFlow is needed to build a model; pass --model-dir with an exported weights.npz")
+            model_dir = tmp
+            prepare_model(model_dir)
+        elif not os.path.exists(os.path.join(model_dir, "weights.npz")):
+            if not has_tensorflow:
+                raise SystemExit(f"{model_dir} has no weights.npz and TensorFlow is not installed to export one")
+            from tensorflow.keras.models import load_model
+            from app.ml.numpy_lstm import NumpyLSTMModel
+            NumpyLSTMModel.from_keras(load_model(os.path.join(model_dir, "model.keras"))).save(
+                os.path.join(model_dir, "weights.npz"))
+
+        from app.ml.numpy_lstm import NumpyLSTMModel
+        _, length, n_features = NumpyLSTMModel.load(os.path.join(model_dir, "weights.npz")).input_shape
+        inputs_path = os.path.join(tmp, "inputs.npy")
+        np.save(inputs_path, np.random.default_rng(0).random((args.batch, length, n_features), dtype=np.float32))
+
+        backends = ["keras", "numpy"] if has_tensorflow and os.path.exists(os.path.join(model_dir, "model.keras")) \
+            else ["numpy"]
+        results, outputs = {}, {}
+        for backend in backends:
+            output_path = os.path.join(tmp, f"{backend}.npy")
+            results[backend] = run_backend(backend, model_dir, inputs_path, output_path)
+            outputs[backend] = np.load(output_path)
+
+    print(f"{'backend':<8}{'load':>8}{'RSS':>9}{'fwd x1':>10}{'fwd x' + str(args.batch):>10}"
+          f"{'7d x1':>10}{'7d x' + str(args.batch):>10}{'TF':>5}")
+    for backend, r in results.items():
+        print(f"{backend:<8}{r['load_seconds']:>7.2f}s{r['max_rss_mb']:>6.0f} MB"
+              f"{r['forward_1_ms']:>8.2f}ms{r['forward_batch_ms']:>8.2f}ms"
+              f"{r['forecast_1_ms']:>8.1f}ms{r['forecast_batch_ms']:>8.1f}ms"
+              f"{'yes' if r['tensorflow_loaded'] else 'no':>5}")
+
+    if "keras" in outputs:
+        difference = float(np.abs(outputs["keras"] - outputs["numpy"]).max())
+        print(f"max |keras - numpy| over {args.batch}x7 forecasts: {difference:.2e}")
+        if difference > args.tolerance:
+            raise SystemExit(f"NumPy forecasts differ from Keras by {difference:.2e} (> {args.tolerance})")
+    if results["numpy"]["tensorflow_loaded"]:
+        raise SystemExit("The NumPy backend imported TensorFlow")
+
+
+if __name__ == "__main__":
+    main()
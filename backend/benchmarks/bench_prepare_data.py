@@ -0,0 +1,53 @@
+"""
+Benchmark LSTM sequence windowing: legacy append loop vs strided view
+
+Run from the backend directory:
+    python -m benchmarks.bench_prepare_data
+"""
+import timeit
+
+import numpy as np
+
+from app.ml.sequences import make_sequences
+
+SEQUENCE_LENGTH = 60
+N_FEATURES = 7
+HISTORIES = {
+    "5,000 rows": 5000,
+    "20 years (~5,040 trading days)": 20 * 252,
+}
+
+
+def legacy_sequences(scaled_data, sequence_length):
+    """The original prepare_data loop, kept here as the baseline"""
+    X, y = [], []
+    for i in range(sequence_length, len(scaled_data)):
+        X.append(scaled_data[i - sequence_length:i])
+        y.append(scaled_data[i, 0])
+    return np.array(X), np.array(y)
+
+
+def best_of(fn, repeat=5, number=5):
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'history':<32}{'legacy':>12}{'strided':>12}{'last only':>12}{'speedup':>10}")
+    for label, rows in HISTORIES.items():
+        scaled = rng.random((rows, N_FEATURES))
+
+        X_old, y_old = legacy_sequences(scaled, SEQUENCE_LENGTH)
+        X_new, y_new = make_sequences(scaled, SEQUENCE_LENGTH)
+        assert X_old.shape == X_new.shape and y_old.shape == y_new.shape
+        assert np.array_equal(X_old, X_new) and np.array_equal(y_old, y_new)
+
+        legacy = best_of(lambda: legacy_sequences(scaled, SEQUENCE_LENGTH))
+        strided = best_of(lambda: make_sequences(scaled, SEQUENCE_LENGTH))
+        last = best_of(lambda: make_sequences(scaled, SEQUENCE_LENGTH, last_only=True))
+        print(f"{label:<32}{legacy * 1e3:>10.2f}ms{strided * 1e6:>10.1f}us"
+              f"{last * 1e6:>10.1f}us{legacy / strided:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
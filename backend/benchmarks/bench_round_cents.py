@@ -0,0 +1,69 @@
+"""
+Exactness and speed of rounding price columns to cents
+
+round_cents must give what round(float(x), 2) gives per value (the
+former per-cell history rounding). This compares it with the plain
+vectorized forms, np.round(x, 2) and np.rint(x * 100) / 100, and with
+the per-value round() loop: values that differ from round() and best-of
+time per column, for quote-like prices at several decimal precisions.
+Exits non-zero if round_cents differs from round() anywhere.
+
+Run from the backend directory:
+    python -m benchmarks.bench_round_cents --bars 5040
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.market_service import round_cents
+
+METHODS = {
+    "round_cents": round_cents,
+    "np.round": lambda values: np.round(values, 2),
+    "np.rint": lambda values: np.rint(values * 100) / 100,
+}
+
+
+def prices(kind: str, bars: int, seed: int = 0) -> np.ndarray:
+    """Random-walk prices as quoted with 3, 4 or 6 decimals, or in eighths"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    if kind == "eighths":
+        return np.round(close * 8) / 8
+    return np.round(close, int(kind[0]))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", type=int, default=5040, help="values per column (5040 is 20 years of bars)")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'prices':>8}  " + "  ".join(f"{name:>20}" for name in METHODS) + f"  {'round() loop':>12}")
+    exact = True
+    for kind in ("3dp", "4dp", "6dp", "eighths"):
+        values = prices(kind, args.bars)
+        expected = np.array([round(float(value), 2) for value in values])
+        cells = []
+        for name, method in METHODS.items():
+            wrong = int(np.count_nonzero(method(values) != expected))
+            exact &= name != "round_cents" or wrong == 0
+            cells.append(f"{best_of(lambda: method(values), args.repeat) * 1000:>7.3f}ms {wrong:>5} off")
+        loop = best_of(lambda: [round(float(value), 2) for value in values], args.repeat)
+        print(f"{kind:>8}  " + "  ".join(f"{cell:>20}" for cell in cells) + f"  {loop * 1000:>10.3f}ms")
+    if not exact:
+        raise SystemExit("round_cents differs from round()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark API import time, memory and time-to-ready
+
+Each module is imported in a fresh interpreter, so numbers are cold-import
+costs. app.main must import without loading TensorFlow; the run fails if
+it does, or if its import exceeds --max-import-seconds.
+
+With --serve, a uvicorn server is started and the time until /health and
+then /ready first answer 200 is measured.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --serve --max-import-seconds 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+MODULES = [
+    "app.main",
+    "app.services.market_service",
+    "app.ml.predictor",
+    "tensorflow",
+]
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tensorflow_loaded": "tensorflow" in sys.modules,
+}}))
+"""
+
+
+def import_cost(module: str) -> dict:
+    """Cold-import a module in a subprocess; returns seconds, peak RSS and whether TF got loaded"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        capture_output=True, text=True, cwd=os.getcwd()
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for(client: httpx.Client, path: str, started: float, timeout: float) -> float:
+    """Poll a path until it returns 200; returns seconds since started"""
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{path} did not answer 200 within {timeout:.0f}s")
+
+
+def serve_timings(port: int, timeout: float) -> dict:
+    """Start uvicorn and time /health and /ready"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            health = wait_for(client, "/health", started, timeout)
+            ready = wait_for(client, "/ready", started, timeout)
+            return {"health": health, "ready": ready, "status": client.get("/ready").json()}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="fail if importing app.main takes longer")
+    parser.add_argument("--serve", action="store_true", help="also time /health and /ready on uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<32}{'import':>10}{'peak RSS':>12}{'loads TF':>10}")
+    for module in MODULES:
+        cost = import_cost(module)
+        if "error" in cost:
+            print(f"{module:<32}  {cost['error']}")
+            continue
+        print(f"{module:<32}{cost['seconds']:>9.2f}s{cost['max_rss_mb']:>10.0f}MB"
+              f"{'yes' if cost['tensorflow_loaded'] else 'no':>10}")
+        if module == "app.main":
+            if cost["tensorflow_loaded"]:
+                failures.append("importing app.main loaded TensorFlow")
+            if args.max_import_seconds is not None and cost["seconds"] > args.max_import_seconds:
+                failures.append(f"app.main import took {cost['seconds']:.2f}s "
+                                f"(budget {args.max_import_seconds:.2f}s)")
+
+    if args.serve:
+        timings = serve_timings(args.port, args.timeout)
+        print(f"\n/health answered after {timings['health']:.2f}s, /ready after {timings['ready']:.2f}s")
+        print(f"load times: {timings['status']['load_seconds']}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark symbol search: legacy linear scan vs prebuilt index
+
+The universe is COMMON_STOCKS plus synthetic listings, so timings show how
+each approach scales with the number of listed symbols. No quotes are
+fetched; this measures the matching step only.
+
+Run from the backend directory:
+    python -m benchmarks.bench_symbol_search
+"""
+import random
+import string
+import time
+import timeit
+
+from app.services.market_service import COMMON_STOCKS
+from app.services.symbol_index import SymbolIndex
+
+UNIVERSES = [0, 10_000, 100_000]
+QUERIES = ["a", "ap", "micro", "bank of", "soft", "TSLA", "zq"]
+WORDS = ["global", "holdings", "capital", "energy", "systems", "bancorp", "pharma", "micro",
+         "digital", "partners", "resources", "group", "trust", "technologies", "industries"]
+
+
+def synthetic_listings(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    listings = {}
+    while len(listings) < count:
+        symbol = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5)))
+        name = " ".join(w.capitalize() for w in rng.sample(WORDS, rng.randint(1, 3))) + " Inc."
+        listings.setdefault(symbol, name)
+    return list(listings.items())
+
+
+def legacy_matches(listings, query):
+    """The original MarketService._match_common_stocks scan, kept here as the baseline"""
+    query_lower = query.lower()
+    query_upper = query.upper()
+    matches = []
+    for symbol, name in listings:
+        if (query_upper in symbol or
+                query_lower in name.lower() or
+                any(word.startswith(query_lower) for word in name.lower().split())):
+            matches.append(symbol)
+    return matches[:15]
+
+
+def best_of(fn, repeat=5, number=20):
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+
+
+def main():
+    print(f"{'universe':>10}{'build':>10}{'legacy/query':>15}{'index/query':>14}{'speedup':>10}")
+    for extra in UNIVERSES:
+        listings = list(COMMON_STOCKS.items()) + synthetic_listings(extra)
+
+        started = time.perf_counter()
+        index = SymbolIndex(listings)
+        build = time.perf_counter() - started
+
+        legacy = best_of(lambda: [legacy_matches(listings, q) for q in QUERIES], number=2) / len(QUERIES)
+        indexed = best_of(lambda: [index.search(q) for q in QUERIES]) / len(QUERIES)
+        print(f"{len(index):>10,}{build * 1e3:>8.0f}ms{legacy * 1e6:>13.0f}us"
+              f"{indexed * 1e6:>12.1f}us{legacy / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
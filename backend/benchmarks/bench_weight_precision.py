@@ -0,0 +1,118 @@
+"""
+Accuracy and memory of reduced-precision LSTM weights (float32 vs float16 vs int8)
+
+Every precision is checked against the float32 export on held-out windows
+(the last 20% of the symbol's training windows), the same check the model
+registry applies before storing a reduced export. Also reported: resident
+bytes per loaded model (measured with tracemalloc over --copies loads),
+models per GB and single-symbol 7-day forecast latency. Exits non-zero if
+a --require'd precision fails the check.
+
+With --model-dir ml_models/AAPL the trained model, its scaler and AAPL's
+history are used. Without it, a model is trained for a few epochs on
+synthetic bars, which needs TensorFlow.
+
+Run from the backend directory:
+    python -m benchmarks.bench_weight_precision --model-dir ml_models/AAPL
+    MARKET_DATA_PROVIDER=replay python -m benchmarks.bench_weight_precision --epochs 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from app.core.config import settings
+from app.ml.inference import AutoregressiveForecaster
+from app.ml.numpy_lstm import FLOAT32, PRECISIONS, NumpyLSTMModel, precision_regression
+from app.ml.predictor import MLStockPredictor
+
+
+def train_synthetic(predictor: MLStockPredictor, symbol: str, epochs: int):
+    """Train a throwaway model on the symbol's history; returns (float32 export, scaler)"""
+    df = predictor.fetch_historical_data(symbol, period="full")
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    X, y = predictor.prepare_data(df, scaler=scaler)
+    model = predictor.build_lstm_model((X.shape[1], X.shape[2]))
+    if model is None:
+        raise SystemExit("TensorFlow is needed to train a model; pass --model-dir with a trained one")
+    split = int(len(X) * 0.8)
+    model.fit(X[:split], y[:split], epochs=epochs, batch_size=32, verbose=0)
+    return NumpyLSTMModel.from_keras(model), scaler
+
+
+def resident_bytes(path: str, copies: int) -> float:
+    """Average bytes allocated per loaded model over several loads"""
+    tracemalloc.start()
+    models = [NumpyLSTMModel.load(path) for _ in range(copies)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del models
+    return size / copies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", help="trained model directory (weights.npz and scaler.joblib)")
+    parser.add_argument("--symbol", default="AAPL", help="history used when training a throwaway model")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--max-mse-increase", type=float, default=settings.ML_PRECISION_MAX_MSE_INCREASE)
+    parser.add_argument("--require", nargs="*", default=["float16"], choices=PRECISIONS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        predictor = MLStockPredictor(model_dir=tmp)
+        if args.model_dir:
+            symbol = os.path.basename(os.path.normpath(args.model_dir)).upper()
+            full = NumpyLSTMModel.load(os.path.join(args.model_dir, "weights.npz")).with_precision(FLOAT32)
+            scaler = joblib.load(os.path.join(args.model_dir, "scaler.joblib"))
+        else:
+            symbol = args.symbol.upper()
+            full, scaler = train_synthetic(predictor, symbol, args.epochs)
+
+        X, y = predictor.prepare_data(predictor.fetch_historical_data(symbol), scaler=scaler)
+        split = int(len(X) * 0.8)
+        X_test, y_test = np.ascontiguousarray(X[split:]), y[split:]
+        window = np.ascontiguousarray(X[-1:])
+
+        print(f"{symbol}: {len(X_test)} held-out windows, float32 export from "
+              f"{'--model-dir' if args.model_dir else f'{args.epochs}-epoch training'}")
+        print(f"{'precision':<10}{'resident':>11}{'file':>10}{'models/GB':>11}{'held-out MSE':>14}"
+              f"{'increase':>10}{'max diff $':>12}{'7d x1':>9}  check")
+        failed = []
+        for precision in PRECISIONS:
+            model = full.with_precision(precision)
+            path = os.path.join(tmp, f"{precision}.npz")
+            model.save(path)
+            resident = resident_bytes(path, args.copies)
+
+            check = precision_regression(full, model, X_test, y_test)
+            increase = check["candidate_mse"] / check["reference_mse"] - 1 if check["reference_mse"] else 0.0
+            # Close is feature 0: scaled differences back to price units
+            max_dollars = check["max_abs_diff"] / scaler.scale_[0]
+            passed = increase <= args.max_mse_increase
+            if not passed and precision in args.require:
+                failed.append(precision)
+
+            forecaster = AutoregressiveForecaster(NumpyLSTMModel.load(path))
+            forecaster.forecast(window, 7)
+            started = time.perf_counter()
+            for _ in range(10):
+                forecaster.forecast(window, 7)
+            latency = (time.perf_counter() - started) / 10
+
+            print(f"{precision:<10}{resident / 1024:>8.0f} KB{os.path.getsize(path) / 1024:>7.0f} KB"
+                  f"{2 ** 30 / resident:>11,.0f}{check['candidate_mse']:>14.3e}{increase:>9.1%}"
+                  f"{max_dollars:>12.4f}{latency * 1e3:>7.1f}ms  {'pass' if passed else 'FAIL'}")
+
+    if failed:
+        raise SystemExit(f"Held-out MSE increase above {args.max_mse_increase:.0%} for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
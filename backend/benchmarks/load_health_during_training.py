@@ -0,0 +1,91 @@
+"""
+Load test: /health latency and throughput while a model trains
+
+Hammers /health with concurrent clients for a baseline window, then queues
+POST /ml/train/{symbol} and keeps measuring until the training job
+finishes. If training blocked the event loop, the "during training"
+percentiles would jump to the training duration.
+
+Against a running server (from the backend directory):
+    python -m benchmarks.load_health_during_training --base-url http://127.0.0.1:8000
+
+Training runs in a separate worker process that fetches its own history,
+so the target server needs Alpha Vantage access, a pre-filled HISTORY_DIR
+or MARKET_DATA_PROVIDER=replay for the symbol being trained.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def hammer(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(client: httpx.AsyncClient, concurrency: int, until) -> dict:
+    """Run concurrent /health clients until the `until` awaitable completes"""
+    stop = asyncio.Event()
+    latencies = []
+    started = time.perf_counter()
+    workers = [asyncio.create_task(hammer(client, stop, latencies)) for _ in range(concurrency)]
+    result = await until
+    stop.set()
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "elapsed": elapsed, "result": result}
+
+
+def report(label: str, run: dict):
+    latencies = sorted(run["latencies"])
+    if not latencies:
+        print(f"{label:<18} no requests completed")
+        return
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    print(f"{label:<18} {len(latencies) / run['elapsed']:>8.0f} req/s  "
+          f"p50 {q[49] * 1e3:>7.1f}ms  p95 {q[94] * 1e3:>7.1f}ms  "
+          f"p99 {q[98] * 1e3:>7.1f}ms  max {latencies[-1] * 1e3:>7.1f}ms")
+
+
+async def train_to_completion(client: httpx.AsyncClient, symbol: str, epochs: int) -> dict:
+    """Queue a training job and poll it until it finishes"""
+    response = await client.post(f"/api/v1/ml/train/{symbol}", params={"epochs": epochs})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        await asyncio.sleep(0.5)
+        job = (await client.get(f"/api/v1/ml/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        baseline = await measure(client, args.concurrency, asyncio.sleep(args.baseline))
+        report("baseline", baseline)
+
+        during = await measure(client, args.concurrency, train_to_completion(client, args.symbol, args.epochs))
+        report("during training", during)
+        job = during["result"]
+        print(f"training job {job['status']} after {during['elapsed']:.1f}s "
+              f"({job['epoch']} epochs, val_loss {job['val_loss']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--symbol", default="AAPL")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--baseline", type=float, default=5.0, help="seconds of baseline load")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load test: upstream quote calls vs number of streaming clients
+
+Runs the quote hub in-process against the local fake quote source, so no
+Alpha Vantage quota is used. Many clients subscribe to overlapping symbol
+sets; upstream calls should track the number of distinct symbols, not the
+number of clients.
+
+Run from the backend directory:
+    python -m benchmarks.load_quote_stream --clients 1000 --symbols 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+from app.services.quote_stream import QuoteHub
+
+
+class FakeQuoteSource:
+    """
+    Local random-walk quotes for load runs without Alpha Vantage
+
+    Counts calls per symbol so callers can check how many upstream
+    requests a number of clients caused.
+    """
+
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._prices: Dict[str, float] = {}
+        self._random = random.Random(seed)
+
+    async def __call__(self, symbol: str) -> Optional[Dict]:
+        self.calls[symbol] = self.calls.get(symbol, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        previous = self._prices.get(symbol, 100.0)
+        price = round(previous * (1 + self._random.gauss(0, 0.002)), 2)
+        self._prices[symbol] = price
+        return {
+            "symbol": symbol,
+            "price": price,
+            "change": round(price - 100.0, 2),
+            "changePercent": round(price - 100.0, 2),
+            "volume": self.calls[symbol] * 1000,
+        }
+
+
+async def client(subscription, symbols, stop: asyncio.Event, counts: dict):
+    await subscription.subscribe(symbols)
+    while not stop.is_set():
+        try:
+            updates = await asyncio.wait_for(subscription.next(), timeout=0.1)
+        except asyncio.TimeoutError:
+            continue
+        counts["messages"] += 1
+        counts["quotes"] += len(updates)
+    await subscription.close()
+
+
+async def run(args):
+    source = FakeQuoteSource(latency=args.latency)
+    hub = QuoteHub(source, interval=args.interval, max_symbols_per_client=args.per_client)
+    universe = [f"SYM{i}" for i in range(args.symbols)]
+    rng = random.Random(0)
+    stop = asyncio.Event()
+    counts = {"messages": 0, "quotes": 0}
+
+    started = time.perf_counter()
+    clients = [
+        asyncio.create_task(client(hub.connect(), rng.sample(universe, args.per_client), stop, counts))
+        for _ in range(args.clients)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*clients)
+    elapsed = time.perf_counter() - started
+    await hub.close()
+
+    upstream = sum(source.calls.values())
+    naive = args.clients * args.per_client * max(1, round(args.duration / args.interval))
+    print(f"{args.clients} clients x {args.per_client} symbols from a universe of {args.symbols}, "
+          f"{elapsed:.1f}s at {args.interval}s poll interval")
+    print(f"upstream calls:       {upstream} ({len(source.calls)} distinct symbols)")
+    print(f"per-client polling:   ~{naive} calls")
+    print(f"pushed:               {counts['messages']} messages, {counts['quotes']} quote updates")
+    print(f"pollers left running: {len(hub.symbols)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--symbols", type=int, default=20, help="size of the symbol universe")
+    parser.add_argument("--per-client", type=int, default=5, help="symbols each client subscribes to")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls per symbol")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency in seconds")
+    parser.add_argument("--duration", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
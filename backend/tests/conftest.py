@@ -0,0 +1,47 @@
+"""
+Shared fixtures: synthetic daily bars and a predictor that never touches the network
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_bars(days: int, seed: int = 0, end: str = "2024-12-31") -> pd.DataFrame:
+    """Random-walk OHLCV bars in the history store's read_frame layout"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    spread = close * rng.uniform(0.001, 0.02, days)
+    return pd.DataFrame({
+        "Open": np.round(close + rng.normal(0, 0.3, days) * spread, 2),
+        "High": np.round(close + spread, 2),
+        "Low": np.round(close - spread, 2),
+        "Close": np.round(close, 2),
+        "Volume": rng.integers(1_000_000, 50_000_000, days).astype(float),
+    }, index=pd.bdate_range(end=end, periods=days))
+
+
+@pytest.fixture
+def bars():
+    return make_bars
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    """
+    An MLStockPredictor with an empty model directory whose histories come
+    from the `histories` dict (symbol -> frame); missing symbols fail to load
+    """
+    from app.ml.data_cache import HistoryCache
+    from app.ml.predictor import MLStockPredictor
+
+    histories = {}
+
+    def load(symbol: str) -> pd.DataFrame:
+        if symbol not in histories:
+            raise ValueError(f"No data available for {symbol}")
+        return histories[symbol]
+
+    predictor = MLStockPredictor(model_dir=str(tmp_path / "models"))
+    predictor.history_cache = HistoryCache(load)
+    predictor.histories = histories
+    return predictor
@@ -0,0 +1,43 @@
+"""
+BatchAnalyzer edge cases: short or missing histories and cached forecasts
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.ml.batch import BatchAnalyzer
+
+
+@pytest.fixture
+def analyzer(predictor):
+    with ThreadPoolExecutor(2) as prefetch, ThreadPoolExecutor(2) as ml:
+        yield BatchAnalyzer(predictor, prefetch, ml, days=7, prefetch_timeout=10.0)
+
+
+def test_short_history_is_skipped_not_fatal(predictor, analyzer, bars):
+    # 30 bars cannot fill MA50, so every indicator row is dropped and the frame is empty
+    predictor.histories.update({"LONG": bars(600, seed=1), "SHORT": bars(30, seed=2)})
+    assert predictor.fetch_historical_data("SHORT").empty
+
+    results = list(analyzer.run(["LONG", "SHORT"]))
+    assert [result["symbol"] for result in results] == ["LONG"]
+    assert len(results[0]["prediction_dates"]) == 7
+
+
+def test_failed_load_is_skipped(predictor, analyzer, bars):
+    predictor.histories["LONG"] = bars(600, seed=1)
+    results = list(analyzer.run(["MISSING", "LONG"]))
+    assert [result["symbol"] for result in results] == ["LONG"]
+
+
+def test_second_run_is_served_from_the_prediction_cache(predictor, analyzer, bars):
+    predictor.histories.update({"A": bars(600, seed=1), "B": bars(600, seed=2)})
+    first = {result["symbol"]: result for result in analyzer.run(["A", "B"])}
+    assert len(predictor.prediction_cache) == 2
+
+    calls = []
+    trend = predictor._fallback_prediction
+    predictor._fallback_prediction = lambda *args, **kwargs: calls.append(args) or trend(*args, **kwargs)
+    second = {result["symbol"]: result for result in analyzer.run(["A", "B"])}
+    assert calls == []
+    assert second == first
@@ -0,0 +1,22 @@
+"""
+HistoryCache: one load per symbol per TTL, empty results retried
+"""
+import pandas as pd
+
+from app.ml.data_cache import HistoryCache
+
+
+def test_loads_once_per_ttl(bars):
+    calls = []
+    cache = HistoryCache(lambda symbol: calls.append(symbol) or bars(300))
+    first = cache.get_ohlcv("aapl")
+    assert cache.get_ohlcv("AAPL") is first
+    assert calls == ["AAPL"]
+
+
+def test_empty_history_is_not_cached(bars):
+    results = [pd.DataFrame(), bars(300)]
+    cache = HistoryCache(lambda symbol: results.pop(0))
+    assert cache.get_ohlcv("AAPL").empty
+    assert len(cache.get_ohlcv("AAPL")) == 300
+    assert not cache.get("AAPL").empty
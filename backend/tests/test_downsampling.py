@@ -0,0 +1,52 @@
+"""
+lttb_indices picks exactly the bars of sequential LTTB, and downsample keeps whole bars
+"""
+import numpy as np
+import pytest
+
+from app.services import downsampling
+from app.services.downsampling import downsample, lttb_indices
+from benchmarks.bench_downsampling import reference_lttb
+
+
+def _series(kind: str, n: int, n_out: int) -> np.ndarray:
+    rng = np.random.default_rng(n)
+    if kind == "walk":
+        return np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.015, n))), 2)
+    if kind == "flat":
+        return np.full(n, 100.0)
+    # Swings with a period of one bucket: the vectorized passes do not settle (sequential sweep)
+    width = (n - 2) / (n_out - 2)
+    return np.round(100 + np.sin(2 * np.pi * np.arange(n) / width), 3)
+
+
+@pytest.mark.parametrize("kind", ["walk", "flat", "oscillating"])
+@pytest.mark.parametrize("n, n_out", [(1260, 300), (5040, 1000), (1000, 3), (997, 331)])
+def test_matches_sequential_lttb(kind, n, n_out):
+    x = np.arange(n, dtype=np.int64) + 19000
+    y = _series(kind, n, n_out)
+    np.testing.assert_array_equal(lttb_indices(x, y, n_out), reference_lttb(x.astype(float), y, n_out))
+
+
+def test_matches_sequential_lttb_without_the_sweep(monkeypatch):
+    # Enough passes for the oscillating series to settle by fixed point alone
+    monkeypatch.setattr(downsampling, "LTTB_MAX_PASSES", 10_000)
+    x = np.arange(1260, dtype=np.int64)
+    y = _series("oscillating", 1260, 300)
+    np.testing.assert_array_equal(lttb_indices(x, y, 300), reference_lttb(x.astype(float), y, 300))
+
+
+def test_short_series_are_kept_whole():
+    np.testing.assert_array_equal(lttb_indices(np.arange(5), np.ones(5), 10), np.arange(5))
+
+
+def test_downsample_keeps_whole_bars(bars):
+    frame = bars(1000)
+    columns = {"date": frame.index.values.astype("datetime64[D]")}
+    columns.update({column.lower(): frame[column].to_numpy() for column in frame.columns})
+    reduced = downsample(columns, 100)
+
+    keep = lttb_indices(columns["date"].astype(np.int64), columns["close"], 100)
+    assert len(reduced["date"]) == 100
+    for column, values in columns.items():
+        np.testing.assert_array_equal(reduced[column], values[keep])
@@ -0,0 +1,94 @@
+"""
+HistoryStore: appends, interrupted-append recovery, memory-mapped reads and upstream sync checks
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.history_store import HistoryStore
+from app.services.market_data import MarketDataError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history"), sync_interval=900)
+
+
+def _assert_stored(store, symbol: str, history: pd.DataFrame):
+    stored = store.read_frame(symbol)
+    np.testing.assert_array_equal(stored.index.values.astype("datetime64[D]"), history.index.values.astype("datetime64[D]"))
+    np.testing.assert_array_equal(stored.to_numpy(), history.to_numpy())
+
+
+def test_append_writes_only_newer_bars(store, bars):
+    history = bars(300)
+    assert store.append("AAPL", history.iloc[:200]) == 200
+    # Overlapping and out of order: only the 100 newer bars are written
+    assert store.append("AAPL", history.iloc[150:].iloc[::-1]) == 100
+    assert store.append("AAPL", history.iloc[:250]) == 0
+    _assert_stored(store, "AAPL", history)
+
+
+def test_partial_tail_is_ignored_and_overwritten(store, bars):
+    history = bars(300)
+    store.append("AAPL", history.iloc[:200])
+    # An append interrupted after one full column and half a value of another
+    with open(os.path.join(store.root, "AAPL", "date.bin"), "ab") as f:
+        f.write(np.int64(99999).tobytes())
+    with open(os.path.join(store.root, "AAPL", "open.bin"), "ab") as f:
+        f.write(b"\x00" * 4)
+    assert store.length("AAPL") == 200
+    assert store.last_date("AAPL") == history.index[199].date()
+
+    assert store.append("AAPL", history) == 100
+    assert store.length("AAPL") == 300
+    _assert_stored(store, "AAPL", history)
+
+
+def test_range_read_is_memory_mapped(store, bars):
+    history = bars(300)
+    store.append("AAPL", history)
+    start, end = history.index[100], history.index[109]
+    columns = store.read("AAPL", start=start.date(), end=end.date())
+
+    assert isinstance(columns["close"], np.memmap)
+    assert not columns["close"].flags.writeable
+    assert columns["date"][0] == np.datetime64(start.date()) and len(columns["date"]) == 10
+    np.testing.assert_array_equal(columns["close"], history["Close"].iloc[100:110].to_numpy())
+    assert len(store.read("AAPL", start=history.index[-1].date() + pd.Timedelta(days=1))["close"]) == 0
+
+
+class DailyFetcher:
+    """fetch_daily stand-in: raises while `failures` is positive, then returns `frame`"""
+
+    def __init__(self, frame: pd.DataFrame, failures: int = 0):
+        self.frame = frame
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, outputsize: str) -> pd.DataFrame:
+        self.calls.append(outputsize)
+        if self.failures:
+            self.failures -= 1
+            raise MarketDataError("Rate limiter timeout")
+        return self.frame
+
+
+def test_failed_fetch_is_retried_on_the_next_sync(store, bars):
+    # Ends a year ago, so the store is behind the last session after the sync too
+    fetch = DailyFetcher(bars(300, end="2023-12-29").rename(columns=str.lower), failures=1)
+    with pytest.raises(MarketDataError):
+        store.sync("AAPL", fetch)
+    assert store.length("AAPL") == 0
+
+    assert store.sync("AAPL", fetch) == 300
+    assert fetch.calls == ["full", "full"]
+
+
+def test_successful_check_waits_for_the_sync_interval(store, bars):
+    fetch = DailyFetcher(bars(300, end="2023-12-29").rename(columns=str.lower))
+    assert store.sync("AAPL", fetch) == 300
+    assert store.sync("AAPL", fetch) == 0
+    assert len(fetch.calls) == 1
@@ -0,0 +1,56 @@
+"""
+IndicatorEngine: incremental updates equal the pandas computation bit for bit
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.indicators import IndicatorEngine, add_indicators, add_indicators_batch
+
+# The missing-value cases exercise pct_change's default forward fill, which pandas warns about
+pytestmark = pytest.mark.filterwarnings("ignore:The default fill_method:FutureWarning")
+
+
+def _assert_identical(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+
+@pytest.fixture
+def awkward_bars(bars):
+    """Bars with the cases pandas special-cases: flat runs, zero and missing volume, a missing close"""
+    frame = bars(400, seed=3)
+    frame.iloc[100:160, frame.columns.get_loc("Close")] = 123.45
+    frame.iloc[200:203, frame.columns.get_loc("Volume")] = 0.0
+    frame.iloc[250, frame.columns.get_loc("Volume")] = np.nan
+    frame.iloc[300, frame.columns.get_loc("Close")] = np.nan
+    return frame
+
+
+def test_appended_bars_match_full_recomputation(awkward_bars):
+    engine = IndicatorEngine()
+    engine.compute("AAPL", awkward_bars.iloc[:60])
+    # One bar at a time through every special case, then a larger block
+    for end in list(range(61, 330)) + [400]:
+        _assert_identical(engine.compute("AAPL", awkward_bars.iloc[:end]), add_indicators(awkward_bars.iloc[:end]))
+    assert "AAPL" in engine._states  # Served incrementally, not recomputed
+
+
+def test_revised_history_is_recomputed(bars):
+    engine = IndicatorEngine()
+    history = bars(300)
+    engine.compute("AAPL", history)
+    revised = history.copy()
+    revised.iloc[-1, revised.columns.get_loc("Close")] += 1.0
+    extended = pd.concat([revised, bars(310).iloc[-10:]])
+    _assert_identical(engine.compute("AAPL", extended), add_indicators(extended))
+
+
+def test_batch_matches_per_symbol_computation(bars):
+    frames = {"A": bars(300, seed=1), "B": bars(80, seed=2), "C": bars(30, seed=3)}
+    for symbol, frame in add_indicators_batch(frames).items():
+        _assert_identical(frame, add_indicators(frames[symbol]))
+
+    engine = IndicatorEngine()
+    engine.compute("A", frames["A"].iloc[:250])
+    for symbol, frame in engine.compute_batch(frames).items():
+        _assert_identical(frame, add_indicators(frames[symbol]))
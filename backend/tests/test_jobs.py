@@ -0,0 +1,40 @@
+"""
+TrainingJobQueue: one active job per symbol
+"""
+import pytest
+
+from app.ml.global_model import GLOBAL_MODEL
+from app.ml.jobs import COMPLETED, QUEUED, RUNNING, JobConflict, TrainingJob, TrainingJobQueue
+
+
+def _queue_with(*jobs: TrainingJob) -> TrainingJobQueue:
+    # Jobs are recorded directly, so no worker process is started
+    queue = TrainingJobQueue(max_workers=1)
+    for job in jobs:
+        queue._jobs[job.id] = job
+    return queue
+
+
+@pytest.mark.parametrize("status", [QUEUED, RUNNING])
+def test_second_job_for_a_symbol_is_rejected(status):
+    running = TrainingJob(id="a", symbol="AAPL", kind="train", epochs=50, status=status)
+    queue = _queue_with(running)
+    assert queue.active("aapl") is running
+
+    for submit in (lambda: queue.submit("aapl"), lambda: queue.submit_update("AAPL")):
+        with pytest.raises(JobConflict) as conflict:
+            submit()
+        assert conflict.value.job is running
+    assert queue.list() == [running]
+    assert queue._executor is None
+
+
+def test_shared_model_has_one_job_at_a_time():
+    queue = _queue_with(TrainingJob(id="g", symbol=GLOBAL_MODEL, kind="global", epochs=30, status=RUNNING))
+    with pytest.raises(JobConflict):
+        queue.submit_global(["AAPL", "MSFT"])
+
+
+def test_finished_jobs_do_not_block():
+    queue = _queue_with(TrainingJob(id="a", symbol="AAPL", kind="train", epochs=50, status=COMPLETED))
+    assert queue.active("AAPL") is None
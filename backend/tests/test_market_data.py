@@ -0,0 +1,52 @@
+"""
+Alpha Vantage responses: rate-limit messages are labelled apart from other errors
+"""
+import pytest
+
+from app.core.metrics import RATE_LIMIT_NOTES, UPSTREAM_CALLS
+from app.services.market_data import AlphaVantageProvider, RateLimitedError, parse_global_quote
+
+NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+        "and 500 calls per day.")
+INFORMATION = "We have detected your API key as XXXX and our standard API rate limit is 25 requests per day."
+
+
+class FailingTimeSeries:
+    """alpha_vantage TimeSeries stand-in: get_daily raises ValueError(message) like the library does"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def get_daily(self, symbol: str, outputsize: str):
+        raise ValueError(self.message)
+
+
+def _daily_calls(outcome: str) -> float:
+    return UPSTREAM_CALLS.value(provider=AlphaVantageProvider.name, kind="daily", outcome=outcome)
+
+
+@pytest.mark.parametrize("field, message", [("Note", NOTE), ("Information", INFORMATION)])
+def test_quote_rate_limit_message_raises(field, message):
+    notes = RATE_LIMIT_NOTES.value(provider=AlphaVantageProvider.name)
+    with pytest.raises(RateLimitedError):
+        parse_global_quote("AAPL", {field: message})
+    assert RATE_LIMIT_NOTES.value(provider=AlphaVantageProvider.name) == notes + 1
+
+
+def test_invalid_symbol_is_not_a_rate_limit():
+    assert parse_global_quote("NOPE", {"Error Message": "Invalid API call."}) is None
+
+
+@pytest.mark.parametrize("message, outcome", [
+    (NOTE, "rate_limited"),
+    (INFORMATION, "rate_limited"),
+    ("Invalid API call. Please retry or visit the documentation for TIME_SERIES_DAILY.", "error"),
+])
+def test_daily_outcome_label(message, outcome):
+    provider = AlphaVantageProvider(api_key="demo")
+    provider._ts = FailingTimeSeries(message)
+    before = _daily_calls(outcome)
+    with pytest.raises((ValueError, RateLimitedError)) as raised:
+        provider.get_daily("AAPL")
+    assert isinstance(raised.value, RateLimitedError) == (outcome == "rate_limited")
+    assert _daily_calls(outcome) == before + 1
@@ -0,0 +1,33 @@
+"""
+Market streaming endpoints: subscriptions are released on every exit path
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import market
+from app.services.quote_stream import QuoteHub
+
+
+async def _quote(symbol: str):
+    return {"symbol": symbol, "price": 100.0}
+
+
+def test_sse_rejects_too_many_symbols_and_closes_the_subscription(monkeypatch):
+    hub = QuoteHub(_quote, interval=60, max_symbols_per_client=2)
+    closed = []
+    unsubscribe = hub.unsubscribe
+
+    async def recording_unsubscribe(subscription, symbols):
+        closed.append(subscription)
+        await unsubscribe(subscription, symbols)
+
+    monkeypatch.setattr(hub, "unsubscribe", recording_unsubscribe)
+    monkeypatch.setattr(market, "quote_hub", hub)
+    app = FastAPI()
+    app.include_router(market.router)
+
+    response = TestClient(app).get("/stream/sse", params={"symbols": "AAPL,MSFT,NVDA"})
+    assert response.status_code == 400
+    assert "At most 2 symbols" in response.json()["detail"]
+    assert len(closed) == 1
+    assert hub.symbols == []
@@ -0,0 +1,42 @@
+"""
+History payload rounding: round_cents equals round(float(x), 2) on every value
+"""
+import numpy as np
+import pytest
+
+from app.services.market_service import history_payload, round_cents
+
+
+@pytest.mark.parametrize("value, expected", [
+    (344.185, 344.19),  # Parsed double lies above the midpoint; np.round gives 344.18
+    (2.675, 2.67),  # Parsed double lies below the midpoint
+    (1.005, 1.0),
+    (0.125, 0.12),  # Exact binary ties round half to even
+    (0.375, 0.38),
+    (100.0, 100.0),
+    (123.4567, 123.46),
+])
+def test_known_half_cents(value, expected):
+    assert round(value, 2) == expected
+    assert round_cents([value])[0] == expected
+
+
+@pytest.mark.parametrize("decimals", [3, 4, 6])
+def test_matches_round_on_quoted_prices(decimals):
+    rng = np.random.default_rng(decimals)
+    values = np.round(np.concatenate([rng.uniform(0.01, 10, 20_000), rng.uniform(10, 5_000, 80_000)]), decimals)
+    expected = np.array([round(float(value), 2) for value in values])
+    np.testing.assert_array_equal(round_cents(values), expected)
+    if decimals < 6:
+        # What round_cents is for: plain np.round disagrees on some half cents
+        assert np.count_nonzero(np.round(values, 2) != expected) > 0
+
+
+def test_payload_columns(bars):
+    frame = bars(10).rename(columns=str.lower)
+    columns = {"date": frame.index.values.astype("datetime64[D]")}
+    columns.update({column: frame[column].to_numpy() for column in frame.columns})
+    payload = history_payload(columns)
+    assert payload["dates"][-1] == "2024-12-31"
+    assert payload["volume"].dtype == np.int64
+    np.testing.assert_array_equal(payload["close"], [round(float(value), 2) for value in frame["close"]])
@@ -0,0 +1,146 @@
+"""
+NumpyLSTMModel against a float64 reference LSTM on Keras-layout weights
+
+The layers below expose what from_keras reads from a Keras model (class
+name, get_config, get_weights, gate blocks in Keras' [i, f, c, o] order),
+so the conversion's gate reordering and symbol-embedding bias folding are
+checked without TensorFlow.
+"""
+import numpy as np
+import pytest
+
+from app.ml.numpy_lstm import NumpyLSTMModel
+
+SEQUENCE_LENGTH = 60
+N_FEATURES = 8
+UNITS = 50
+TOLERANCE = 1e-5
+
+
+class _KerasLayer:
+    def __init__(self, name: str, weights=(), **config):
+        self.name = name
+        self._weights = [np.asarray(w) for w in weights]
+        self._config = config
+
+    def get_config(self):
+        return dict(self._config)
+
+    def get_weights(self):
+        return list(self._weights)
+
+
+def _layer(kind: str):
+    return type(kind, (_KerasLayer,), {})
+
+
+LSTM, Dense, Dropout, Embedding, RepeatVector, Concatenate = (
+    _layer(kind) for kind in ("LSTM", "Dense", "Dropout", "Embedding", "RepeatVector", "Concatenate")
+)
+
+
+class _KerasModel:
+    def __init__(self, layers, input_shape):
+        self.layers = layers
+        self.input_shape = input_shape
+
+
+def _lstm(rng, name: str, n_in: int, return_sequences: bool):
+    # Roughly Glorot-scaled, like trained weights; the biases keep the gates off-center
+    scale = 1 / np.sqrt(n_in + UNITS)
+    weights = (rng.normal(0, scale, (n_in, 4 * UNITS)),
+               rng.normal(0, scale, (UNITS, 4 * UNITS)),
+               rng.normal(0, 0.5, 4 * UNITS))
+    return LSTM(name, weights, activation="tanh", recurrent_activation="sigmoid",
+                return_sequences=return_sequences, use_bias=True)
+
+
+def _stack(rng, n_in: int):
+    """The predictor's LSTM(50) x3 / Dense(25) / Dense(1) stack, with dropouts"""
+    return [
+        _lstm(rng, "lstm", n_in, True), Dropout("dropout"),
+        _lstm(rng, "lstm_1", UNITS, True), Dropout("dropout_1"),
+        _lstm(rng, "lstm_2", UNITS, False), Dropout("dropout_2"),
+        Dense("dense", (rng.normal(0, 0.3, (UNITS, 25)), rng.normal(0, 0.1, 25)), activation="linear"),
+        Dense("dense_1", (rng.normal(0, 0.3, (25, 1)), rng.normal(0, 0.1, 1)), activation="linear"),
+    ]
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def reference_forward(layers, x: np.ndarray) -> np.ndarray:
+    """float64 forward pass straight from the Keras weights and gate order"""
+    out = x.astype(np.float64)
+    for layer in layers:
+        kind = type(layer).__name__
+        if kind == "LSTM":
+            kernel, recurrent_kernel, bias = (w.astype(np.float64) for w in layer.get_weights())
+            h = np.zeros((out.shape[0], UNITS))
+            c = np.zeros((out.shape[0], UNITS))
+            steps = []
+            for t in range(out.shape[1]):
+                z = out[:, t] @ kernel + h @ recurrent_kernel + bias
+                i, f, g, o = (z[:, k * UNITS:(k + 1) * UNITS] for k in range(4))
+                c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+                h = _sigmoid(o) * np.tanh(c)
+                steps.append(h)
+            out = np.stack(steps, axis=1) if layer.get_config()["return_sequences"] else h
+        elif kind == "Dense":
+            kernel, bias = (w.astype(np.float64) for w in layer.get_weights())
+            out = out @ kernel + bias
+    return out
+
+
+def test_matches_float64_reference():
+    rng = np.random.default_rng(0)
+    layers = _stack(rng, N_FEATURES)
+    model = NumpyLSTMModel.from_keras(_KerasModel(layers, (None, SEQUENCE_LENGTH, N_FEATURES)))
+    x = rng.uniform(0, 1, (16, SEQUENCE_LENGTH, N_FEATURES)).astype(np.float32)
+
+    expected = reference_forward(layers, x)
+    actual = model(x)
+    assert actual.dtype == np.float32
+    assert actual.shape == expected.shape == (16, 1)
+    assert np.abs(actual - expected).max() < TOLERANCE
+
+
+def test_symbol_embedding_folds_into_bias_table(tmp_path):
+    rng = np.random.default_rng(1)
+    n_symbols, embedding_dim = 5, 4
+    table = rng.normal(0, 0.5, (n_symbols + 1, embedding_dim))
+    stack = _stack(rng, N_FEATURES + embedding_dim)
+    layers = [Embedding("embedding", (table,)), RepeatVector("repeat_vector"), Concatenate("concatenate")] + stack
+    model = NumpyLSTMModel.from_keras(_KerasModel(layers, [(None, SEQUENCE_LENGTH, N_FEATURES), (None,)]))
+    assert model.has_symbol_embedding
+
+    x = rng.uniform(0, 1, (n_symbols + 1, SEQUENCE_LENGTH, N_FEATURES)).astype(np.float32)
+    ids = np.arange(n_symbols + 1)  # 0 is the unknown-symbol row
+    # What the Keras graph computes: the symbol's embedding concatenated after every timestep's features
+    repeated = np.repeat(table[ids][:, None, :], SEQUENCE_LENGTH, axis=1)
+    expected = reference_forward(stack, np.concatenate([x, repeated], axis=-1))
+    assert np.abs(model(x, ids) - expected).max() < TOLERANCE
+    assert np.abs(model.predict([x, ids]) - expected).max() < TOLERANCE
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = NumpyLSTMModel.load(path)
+    assert loaded.has_symbol_embedding
+    np.testing.assert_array_equal(loaded(x, ids), model(x, ids))
+
+
+@pytest.mark.parametrize("precision, tolerance", [("float16", 5e-3), ("int8", 5e-2)])
+def test_reduced_precision_round_trip(tmp_path, precision, tolerance):
+    rng = np.random.default_rng(2)
+    layers = _stack(rng, N_FEATURES)
+    model = NumpyLSTMModel.from_keras(_KerasModel(layers, (None, SEQUENCE_LENGTH, N_FEATURES)))
+    reduced = model.with_precision(precision)
+    assert reduced.nbytes < model.nbytes
+
+    path = str(tmp_path / f"{precision}.npz")
+    reduced.save(path)
+    loaded = NumpyLSTMModel.load(path)
+    x = rng.uniform(0, 1, (8, SEQUENCE_LENGTH, N_FEATURES)).astype(np.float32)
+    np.testing.assert_array_equal(loaded(x), reduced(x))
+    assert np.abs(loaded(x) - model(x)).max() < tolerance
@@ -0,0 +1,84 @@
+"""
+PredictionCache: horizon slicing, keying on bar and model version, isolation of cached results
+"""
+from app.ml.prediction_cache import PredictionCache, forecast_dates
+
+KEY = ("AAPL", "2024-12-31", "full:2024-12-01T00:00:00")
+
+
+def _prediction(days: int) -> dict:
+    return {"symbol": "AAPL", "predictions": [100.0 + day for day in range(days)],
+            "dates": forecast_dates(days), "method": "LSTM Neural Network", "confidence": "High"}
+
+
+def _analysis(prediction: dict) -> dict:
+    return {"symbol": "AAPL", "action": "Buy", "predictions": prediction["predictions"][:7],
+            "prediction_dates": prediction["dates"][:7]}
+
+
+def test_longest_forecast_serves_shorter_horizons():
+    cache = PredictionCache()
+    cache.put(KEY, _prediction(30))
+    week = cache.get(KEY, 7)
+    assert week["predictions"] == [100.0 + day for day in range(7)]
+    assert week["dates"] == forecast_dates(7)
+    assert cache.get(KEY, 31) is None
+
+    # A shorter forecast never replaces a longer one
+    cache.put(KEY, _prediction(5))
+    assert len(cache.get(KEY, 30)["predictions"]) == 30
+
+
+def test_new_bar_or_model_is_a_different_key():
+    cache = PredictionCache()
+    cache.put(KEY, _prediction(7))
+    assert cache.get(("AAPL", "2025-01-02", KEY[2]), 7) is None
+    assert cache.get(("AAPL", KEY[1], "update:2024-12-31T00:00:00"), 7) is None
+    assert cache.get(KEY, 7) is not None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    keys = [("A", "d", "v"), ("B", "d", "v"), ("C", "d", "v")]
+    cache.put(keys[0], _prediction(7))
+    cache.put(keys[1], _prediction(7))
+    cache.get(keys[0], 7)
+    cache.put(keys[2], _prediction(7))
+    assert len(cache) == 2
+    assert cache.get(keys[1], 7) is None
+    assert cache.get(keys[0], 7) is not None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.put(KEY, _prediction(7))
+    assert cache.get(KEY, 7) is None
+
+
+def test_callers_cannot_corrupt_cached_results():
+    cache = PredictionCache()
+    prediction = _prediction(7)
+    cache.put(KEY, prediction)
+    prediction["predictions"].append(-1.0)
+
+    served = cache.get(KEY, 7)
+    served["predictions"][0] = -1.0
+    served["extra"] = True
+    assert cache.get(KEY, 7)["predictions"] == [100.0 + day for day in range(7)]
+
+    analysis = _analysis(_prediction(7))
+    cache.put_analysis(KEY, analysis)
+    analysis["predictions"].clear()
+    first = cache.get_analysis(KEY)
+    first["predictions"].append(-1.0)
+    first["prediction_dates"].append("2099-01-01")
+    second = cache.get_analysis(KEY)
+    assert second["predictions"] == [100.0 + day for day in range(7)]
+    assert second["prediction_dates"] == forecast_dates(7)
+    assert "extra" not in second
+
+
+def test_analysis_needs_a_cached_prediction():
+    cache = PredictionCache()
+    cache.put_analysis(KEY, _analysis(_prediction(7)))
+    assert cache.get_analysis(KEY) is None
@@ -0,0 +1,47 @@
+"""
+MLStockPredictor serving path: no inline training, one queued job per symbol
+"""
+import pytest
+
+import app.ml.predictor as predictor_module
+
+
+def test_symbol_without_model_gets_trend_forecast_and_queues_training(predictor, bars, monkeypatch):
+    predictor.histories["AAPL"] = bars(600, seed=1)
+    submitted = []
+    monkeypatch.setattr(predictor_module, "tensorflow_installed", lambda: True)
+    monkeypatch.setattr(predictor_module.training_jobs, "submit",
+                        lambda symbol, epochs: submitted.append((symbol, epochs)))
+    monkeypatch.setattr(predictor_module.training_jobs, "list", lambda: [])
+    monkeypatch.setattr(predictor, "train_model", lambda *args, **kwargs: pytest.fail("trained inline"))
+
+    result = predictor.predict_next_days("aapl", days=5)
+    assert result["method"] == "Statistical Trend Analysis"
+    assert len(result["predictions"]) == 5
+    assert submitted == [("AAPL", 30)]
+
+
+def test_no_job_without_tensorflow_or_when_disabled(predictor, bars, monkeypatch):
+    predictor.histories["AAPL"] = bars(600, seed=1)
+    submitted = []
+    monkeypatch.setattr(predictor_module.training_jobs, "submit", lambda *args, **kwargs: submitted.append(args))
+    monkeypatch.setattr(predictor_module, "tensorflow_installed", lambda: False)
+    predictor.predict_next_days("AAPL")
+    monkeypatch.setattr(predictor_module, "tensorflow_installed", lambda: True)
+    monkeypatch.setattr(predictor_module.settings, "ML_AUTO_TRAIN", False)
+    predictor.predict_next_days("AAPL", days=3)
+    assert submitted == []
+
+
+def test_confidence_follows_two_years_of_history(predictor, bars):
+    from sklearn.preprocessing import MinMaxScaler
+
+    from app.ml.model_registry import ModelEntry
+
+    predictor.histories.update({"OLD": bars(800, seed=1), "NEW": bars(400, seed=2)})
+    scaler = MinMaxScaler().fit(predictor.fetch_historical_data("OLD")[predictor_module.FEATURES])
+    entry = ModelEntry(symbol="OLD", model=None, scaler=scaler, fingerprint="", trained_at="")
+    old, new = predictor.fetch_historical_data("OLD"), predictor.fetch_historical_data("NEW")
+    assert len(old) == predictor_module.HIGH_CONFIDENCE_ROWS
+    assert predictor._lstm_result("OLD", old, entry, [0.5] * 3)["confidence"] == "High"
+    assert predictor._lstm_result("NEW", new, entry, [0.5] * 3)["confidence"] == "Medium"
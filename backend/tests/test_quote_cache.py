@@ -0,0 +1,76 @@
+"""
+QuoteCache: single-flight loading and LRU eviction
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.quote_cache import QuoteCache
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = QuoteCache()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return {"price": 1.0}
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get, "AAPL_quote", loader) for _ in range(8)]
+        _wait_for(lambda: cache.misses == 8)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.get("AAPL_quote", loader) is results[0]
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_async_misses_share_one_load():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 1.0}
+
+    async def main():
+        cache = QuoteCache()
+        return await asyncio.gather(*(cache.get_async("AAPL_quote", loader) for _ in range(8)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_failed_load_is_not_cached():
+    cache = QuoteCache()
+    results = [None, {"price": 1.0}]
+    assert cache.get("AAPL_quote", lambda: results.pop(0)) is None
+    assert cache.get("AAPL_quote", lambda: results.pop(0)) == {"price": 1.0}
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QuoteCache(max_entries=2)
+    cache.get("A", lambda: "a")
+    cache.get("B", lambda: "b")
+    cache.get("A", lambda: "reloaded")  # Hit: A becomes the most recently used
+    cache.set("C", "c")
+
+    assert len(cache) == 2
+    assert cache.peek("B") is None
+    assert cache.peek("A") == "a"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,86 @@
+"""
+Quote hub fan-out: one upstream poll per symbol and interval, changed fields only
+"""
+import asyncio
+from typing import Dict, List
+
+from app.services.quote_stream import QuoteHub
+
+INTERVAL = 0.2
+SUBSCRIBERS = 25
+
+
+class ScriptedQuotes:
+    """Serves a fixed sequence of quotes per symbol (the last one repeats) and counts calls"""
+
+    def __init__(self, script: List[Dict]):
+        self.script = script
+        self.calls: Dict[str, int] = {}
+
+    async def __call__(self, symbol: str) -> Dict:
+        count = self.calls.get(symbol, 0)
+        self.calls[symbol] = count + 1
+        return dict(self.script[min(count, len(self.script) - 1)], symbol=symbol)
+
+
+SCRIPT = [
+    {"price": 100.0, "volume": 1000, "timestamp": "t0"},
+    {"price": 101.5, "volume": 1000, "timestamp": "t1"},
+    {"price": 101.5, "volume": 1000, "timestamp": "t2"},  # Only the timestamp moves: no update
+    {"price": 101.5, "volume": 2500, "timestamp": "t3"},
+]
+
+
+async def _next_all(subscriptions):
+    return await asyncio.wait_for(asyncio.gather(*(s.next() for s in subscriptions)), timeout=5 * INTERVAL)
+
+
+def test_subscribers_share_one_poll_and_receive_changed_fields():
+    async def run():
+        source = ScriptedQuotes(SCRIPT)
+        hub = QuoteHub(source, interval=INTERVAL)
+        subscriptions = [hub.connect() for _ in range(SUBSCRIBERS)]
+        for subscription in subscriptions:
+            await subscription.subscribe(["aapl"])
+        assert hub.symbols == ["AAPL"]
+
+        first = await _next_all(subscriptions)
+        assert source.calls == {"AAPL": 1}
+        assert all(updates == [{"symbol": "AAPL", "price": 100.0, "volume": 1000, "timestamp": "t0"}]
+                   for updates in first)
+
+        second = await _next_all(subscriptions)
+        assert source.calls == {"AAPL": 2}
+        assert all(updates == [{"symbol": "AAPL", "price": 101.5, "timestamp": "t1"}] for updates in second)
+
+        # The third poll changes nothing but the timestamp, so the next push is the fourth poll's
+        third = await _next_all(subscriptions)
+        assert source.calls == {"AAPL": 4}
+        assert all(updates == [{"symbol": "AAPL", "volume": 2500, "timestamp": "t3"}] for updates in third)
+        assert hub.poll_count() == 4
+
+        for subscription in subscriptions:
+            await subscription.close()
+        assert hub.symbols == []
+        await hub.close()
+
+    asyncio.run(run())
+
+
+def test_late_subscriber_gets_last_quote_without_extra_poll():
+    async def run():
+        source = ScriptedQuotes(SCRIPT)
+        hub = QuoteHub(source, interval=INTERVAL)
+        early = hub.connect()
+        await early.subscribe(["MSFT"])
+        await _next_all([early])
+
+        late = hub.connect()
+        await late.subscribe(["MSFT"])
+        assert await asyncio.wait_for(late.next(), timeout=INTERVAL / 2) == [
+            {"symbol": "MSFT", "price": 100.0, "volume": 1000, "timestamp": "t0"}
+        ]
+        assert source.calls == {"MSFT": 1}
+        await hub.close()
+
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+"""
+SymbolIndex ranking: exact symbol, symbol prefix, name-word prefix, then substring
+"""
+from app.services.symbol_index import SymbolIndex
+
+LISTINGS = [
+    ("GAPH", "Golden Apple Holdings"),
+    ("A", "Agilent Technologies"),
+    ("AAPL", "Apple Inc"),
+    ("AA", "Alcoa Corp"),
+    ("APLE", "Apple Hospitality REIT"),
+    ("PAPL", "Pineapple Energy"),
+    ("MSFT", "Microsoft Corp"),
+]
+
+
+def _symbols(index: SymbolIndex, query: str, limit: int = 15):
+    return [match["symbol"] for match in index.search(query, limit)]
+
+
+def test_exact_symbol_then_shorter_prefixes_first():
+    index = SymbolIndex(LISTINGS)
+    # Symbols first, then names with a word starting with the query
+    assert _symbols(index, "a") == ["A", "AA", "AAPL", "APLE", "GAPH"]
+    assert _symbols(index, "aa") == ["AA", "AAPL"]
+    assert _symbols(index, "a", limit=2) == ["A", "AA"]
+
+
+def test_name_matches_rank_earlier_words_first_then_substrings():
+    index = SymbolIndex(LISTINGS)
+    # "Apple" is the first word of AAPL and APLE but the second of GAPH; PAPL only contains it
+    assert _symbols(index, "apple") == ["AAPL", "APLE", "GAPH", "PAPL"]
+    assert _symbols(index, "apple hos") == ["APLE"]
+    assert _symbols(index, "corp") == ["AA", "MSFT"]
+    assert _symbols(index, "zzz") == []
+
+
+def test_added_listings_merge_into_the_ranking():
+    index = SymbolIndex(LISTINGS)
+    index.add([("AP", "Ap Systems"), ("AAPL", "Renamed")])
+    assert _symbols(index, "a") == ["A", "AA", "AP", "AAPL", "APLE", "GAPH"]
+    assert index.get("aapl") == {"symbol": "AAPL", "name": "Apple Inc"}
+    assert len(index) == len(LISTINGS) + 1
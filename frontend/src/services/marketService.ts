@@ -70,7 +70,7 @@ class MarketService {
   }
 
   async searchStocks(query: string): Promise<StockData[]> {
-    const response = await api.get(`/market/search?q=${encodeURIComponent(query)}`);
+    const response = await api.get(`/market/search?q=${encodeURIComponent(query)}&quotes=fetch`);
     return response.data.results;
   }
 }